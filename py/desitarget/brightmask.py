@@ -22,8 +22,6 @@ import numpy.lib.recfunctions as rfn
 from glob import glob
 from astropy.coordinates import SkyCoord
 from astropy import units as u
-from matplotlib.patches import Polygon
-from matplotlib.collections import PatchCollection
 from . import __version__ as desitarget_version
 from desitarget import io
 from desitarget.internal import sharedmem
@@ -31,12 +29,9 @@ from desitarget.targetmask import desi_mask, targetid_mask
 from desitarget.targets import encode_targetid
 from desitarget.geomask import circles, cap_area, circle_boundaries
 from desitarget.geomask import ellipses, ellipse_boundary, is_in_ellipse
+from desitarget.geomask import get_bricks
 from desitarget.cuts import _psflike
-from desiutil import depend, brick
-# ADM fake the matplotlib display so it doesn't die on allocated nodes.
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt    # noqa: E402
+from desiutil import depend
 
 # ADM factor by which the "in" radius is smaller than the "near" radius
 # ADM and vice-versa.
@@ -149,7 +144,7 @@ def collect_bright_stars(bands, maglim, numproc=4,
 
 def collect_bright_sources(bands, maglim, numproc=4,
                            rootdirname='/global/project/projectdirs/cosmo/data/legacysurvey/dr5/sweep/5.0',
-                           outfilename=None):
+                           outfilename=None, incremental=False):
     """Extract a structure from the sweeps containing all bright sources in a given band to a given magnitude limit.
 
     Parameters
@@ -169,17 +164,32 @@ def collect_bright_sources(bands, maglim, numproc=4,
         /global/project/projectdirs/cosmo/data/legacysurvey/dr5/sweep/dr5.0.
     outfilename : :class:`str`, optional, defaults to not writing anything to file
         (FITS) File name to which to write the output structure of bright sources.
+    incremental : :class:`bool`, optional, defaults to ``False``
+        If ``True`` (and `outfilename` is passed), append the bright sources from
+        each file to `outfilename` as they are collected, rather than holding all
+        of the bright sources in memory.
 
     Returns
     -------
-    :class:`recarray`
+    :class:`recarray` or :class:`int`
         The structure of bright sources from the sweeps limited in the passed band(s) to the
-        passed maglim(s).
+        passed maglim(s). If `incremental` is ``True``, the number of bright sources written
+        to `outfilename` is returned instead.
+
+    Notes
+    -----
+        - Only the flux columns are read for every source. The full rows are only read
+          for sources that are brighter than `maglim`.
     """
     # ADM set up default logger.
     from desiutil.log import get_logger
     log = get_logger()
 
+    if incremental and outfilename is None:
+        msg = 'outfilename must be passed if incremental is True'
+        log.critical(msg)
+        raise ValueError(msg)
+
     # ADM use io.py to retrieve list of sweeps or tractor files.
     infiles = io.list_sweepfiles(rootdirname)
     if len(infiles) == 0:
@@ -208,17 +218,18 @@ def collect_bright_sources(bands, maglim, numproc=4,
     # ADM function to grab the bright sources from a given file.
     def _get_bright_sources(filename):
         """Retrieves bright sources from a sweeps/Tractor file"""
-        objs = io.read_tractor(filename)
-        # ADM write the fluxes as an array instead of as named columns.
+        # ADM first, only read the flux columns...
+        fluxes = io.read_tractor(filename, columns=list(bandnames))
 
         # ADM Retain rows for which ANY band is brighter than maglim.
-        ok = np.zeros(objs[bandnames[0]].shape, dtype=bool)
+        ok = np.zeros(fluxes[bandnames[0]].shape, dtype=bool)
         for i, bandname in enumerate(bandnames):
-            ok |= (objs[bandname] > fluxlim[i])
+            ok |= (fluxes[bandname] > fluxlim[i])
 
+        # ADM ...then only read the full rows for the bright sources.
         w = np.where(ok)
         if len(w[0]) > 0:
-            return objs[w]
+            return io.read_tractor(filename, rows=w[0])
 
     # ADM counter for how many files have been processed.
     # ADM critical to use np.ones because a numpy scalar allows in place modifications.
@@ -228,6 +239,15 @@ def collect_bright_sources(bands, maglim, numproc=4,
     t0 = time()
     log.info('Collecting bright sources from sweeps...')
 
+    # ADM if writing incrementally, open a temporary output file (that
+    # ADM is only renamed to outfilename on success) and count sources.
+    if incremental:
+        tmpfilename = outfilename + '.tmp'
+        if os.path.isfile(tmpfilename):
+            os.remove(tmpfilename)
+        outy = fitsio.FITS(tmpfilename, 'rw')
+    nsources = np.zeros((), dtype='i8')
+
     def _update_status(result):
         """wrapper function for the critical reduction operation,
         that occurs on the main parallel process."""
@@ -237,6 +257,14 @@ def collect_bright_sources(bands, maglim, numproc=4,
             log.info('{}/{} files; {:.1f} files/sec; {:.1f} total mins elapsed'
                      .format(nfiles, totfiles, rate, elapsed/60.))
         nfiles[...] += 1  # this is an in-place modification
+        # ADM if requested, append the bright sources to the output file.
+        if incremental and result is not None:
+            if nsources == 0:
+                outy.write(result)
+            else:
+                outy[-1].append(result)
+            nsources[...] += len(result)
+            return None
         return result
 
     # ADM did we ask to parallelize, or not?
@@ -249,6 +277,17 @@ def collect_bright_sources(bands, maglim, numproc=4,
         for file in infiles:
             sourcestruc.append(_update_status(_get_bright_sources(file)))
 
+    # ADM if we wrote the sources as we went, we're done.
+    if incremental:
+        outy.close()
+        if nsources == 0:
+            os.remove(tmpfilename)
+            raise IOError('There are no sources brighter than {} in {} in files in {} with which to make a mask'
+                          .format(str(maglim), bands, rootdirname))
+        os.rename(tmpfilename, outfilename)
+        log.info('Wrote {} bright sources to {}'.format(nsources, outfilename))
+        return int(nsources)
+
     # ADM note that if there were no bright sources in a file then
     # ADM the _get_bright_sources function will have returned NoneTypes
     # ADM so we need to filter those out.
@@ -594,6 +633,15 @@ def plot_mask(mask, limits=None, radius="IN_RADIUS", show=True):
     from desiutil.log import get_logger, DEBUG
     log = get_logger(DEBUG)
 
+    # ADM import matplotlib here, as it's slow to import and only
+    # ADM needed for plotting. Fake the display so it doesn't die on
+    # ADM allocated nodes.
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Polygon
+    from matplotlib.collections import PatchCollection
+
     # ADM make this work even for a single mask.
     mask = np.atleast_1d(mask)
 
@@ -899,7 +947,7 @@ def append_safe_targets(targs, sourcemask, nside=None, drbricks=None):
     safes["DESI_TARGET"] |= desi_mask.BAD_SKY
 
     # ADM add the brick information for the SAFE/BADSKY targets.
-    b = brick.Bricks(bricksize=0.25)
+    b = get_bricks()
     safes["BRICKID"] = b.brickid(safes["RA"], safes["DEC"])
     safes["BRICKNAME"] = b.brickname(safes["RA"], safes["DEC"])
 
@@ -983,9 +1031,168 @@ def set_target_bits(targs, sourcemask):
     return desi_target
 
 
+def masks_near_hp(sourcemask, nside, pixnum, maxrad=None):
+    """Indexes of bright source masks that could touch a HEALPixel.
+
+    Parameters
+    ----------
+    sourcemask : :class:`recarray`
+        A recarray containing a bright source mask as made by, e.g.
+        :mod:`desitarget.brightmask.make_bright_star_mask` or
+        :mod:`desitarget.brightmask.make_bright_source_mask`.
+    nside : :class:`int`
+        (NESTED) HEALPixel nside.
+    pixnum : :class:`int`
+        A single HEALPixel at `nside`.
+    maxrad : :class:`float`, optional, defaults to the largest ``NEAR_RADIUS``
+        The halo (in ARCSECONDS) around `pixnum` within which to retain
+        mask centers.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        The indexes of `sourcemask` for masks whose centers lie within
+        `maxrad` of the boundary of `pixnum`.
+
+    Notes
+    -----
+        - The boundary is approximated by a circle centered on the pixel
+          of radius `healpy.max_pixrad()`, so this returns a superset of
+          the masks that touch the pixel.
+    """
+    if maxrad is None:
+        maxrad = np.max(sourcemask["NEAR_RADIUS"])
+
+    # ADM the halo in radians, padded by 1% to guard against the
+    # ADM flat-sky approximation used for elliptical masks.
+    halo = hp.max_pixrad(nside) + np.radians(1.01*maxrad/3600.)
+
+    # ADM the angular distance between the pixel center and each mask.
+    pixvec = hp.pix2vec(nside, pixnum, nest=True)
+    maskvec = hp.ang2vec(np.radians(90-sourcemask["DEC"]),
+                         np.radians(sourcemask["RA"]))
+    cossep = np.dot(maskvec, pixvec)
+
+    return np.where(cossep >= np.cos(np.minimum(halo, np.pi)))[0]
+
+
+def set_target_bits_hp(targs, sourcemask, nside, numproc=4, outdir=None):
+    """Apply a bright source mask to targets distributed across HEALPixels.
+
+    Parameters
+    ----------
+    targs : :class:`recarray`
+        A recarray of targets as made by, e.g., :mod:`desitarget.cuts.select_targets`.
+    sourcemask : :class:`recarray`
+        A recarray containing a bright source mask as made by, e.g.
+        :mod:`desitarget.brightmask.make_bright_star_mask` or
+        :mod:`desitarget.brightmask.make_bright_source_mask`.
+    nside : :class:`int`
+        (NESTED) HEALPixel nside at which to shard the targets.
+    numproc : :class:`int`, optional, defaults to 4
+        Number of processes over which to parallelize.
+    outdir : :class:`str`, optional, defaults to ``None``
+        If passed, write the masked targets in each HEALPixel to a file
+        "masked-targets-hp-X.fits" in this directory, where X is the
+        pixel number. As for :func:`mask_targets`, SAFE (BADSKY)
+        locations that are in a mask are not written.
+
+    Returns
+    -------
+        an ndarray of the updated desi_target bit that includes bright source
+        information. This is identical to the output of :func:`set_target_bits`.
+
+    Notes
+    -----
+        - Each HEALPixel of targets is only tested against masks within a
+          halo sized to the largest ``NEAR_RADIUS`` in `sourcemask`, which
+          always includes every mask that could flag a target in the pixel.
+    """
+    # ADM set up default logger.
+    from desiutil.log import get_logger
+    log = get_logger()
+
+    t0 = time()
+
+    # ADM the HEALPixel of each target, sorted so that the targets in
+    # ADM each pixel are contiguous.
+    theta, phi = np.radians(90-targs["DEC"]), np.radians(targs["RA"])
+    pixels = hp.ang2pix(nside, theta, phi, nest=True)
+    ii = np.argsort(pixels, kind="stable")
+    pixnums, starts = np.unique(pixels[ii], return_index=True)
+    indexes = np.split(ii, starts[1:])
+    nallpix = len(pixnums)
+
+    # ADM the largest radius of any mask sets the halo for every pixel.
+    maxrad = np.max(sourcemask["NEAR_RADIUS"])
+
+    log.info('Masking targets in {} HEALPixels at nside={}...t={:.1f}s'
+             .format(nallpix, nside, time()-t0))
+
+    def _set_target_bits_in_pixel(ipix):
+        """Apply the bright source mask to the targets in one HEALPixel"""
+        pixnum, ii = pixnums[ipix], indexes[ipix]
+        pixtargs = targs[ii]
+        imask = masks_near_hp(sourcemask, nside, pixnum, maxrad=maxrad)
+        if len(imask) > 0:
+            dt = set_target_bits(pixtargs, sourcemask[imask])
+        else:
+            dt = pixtargs["DESI_TARGET"].copy()
+        if outdir is not None:
+            done = pixtargs.copy()
+            done["DESI_TARGET"] = dt
+            # ADM remove any SAFE locations that are in bright masks.
+            w = np.where(((done["DESI_TARGET"] & desi_mask.BAD_SKY) == 0) |
+                         ((done["DESI_TARGET"] & desi_mask.IN_BRIGHT_OBJECT) == 0))
+            hdr = fitsio.FITSHDR()
+            hdr['FILENSID'] = nside
+            hdr['FILENEST'] = True
+            hdr['FILEHPX'] = [pixnum]
+            outfile = os.path.join(outdir, 'masked-targets-hp-{}.fits'.format(pixnum))
+            fitsio.write(outfile, done[w], extname='TARGETS', header=hdr, clobber=True)
+        return [ii, dt]
+
+    # ADM this is just to count pixels in _update_status.
+    npix = np.zeros((), dtype='i8')
+
+    def _update_status(result):
+        """wrapper function for the critical reduction operation,
+        that occurs on the main parallel process"""
+        if npix % 50 == 0 and npix > 0:
+            elapsed = time() - t0
+            rate = npix / elapsed
+            log.info('{}/{} pixels; {:.1f} pix/sec; {:.1f} total mins elapsed'
+                     .format(npix, nallpix, rate, elapsed/60.))
+        npix[...] += 1    # this is an in-place modification.
+        return result
+
+    # - Parallel process pixels.
+    if numproc > 1:
+        pool = sharedmem.MapReduce(np=numproc)
+        with pool:
+            # ADM pixels with more targets take longer, and pixels with
+            # ADM few targets are cheap enough to send in batches.
+            results = pool.map(_set_target_bits_in_pixel, np.arange(nallpix),
+                               reduce=_update_status, chunksize=16,
+                               costs=[len(ii) for ii in indexes])
+    else:
+        results = []
+        for ipix in range(nallpix):
+            results.append(_update_status(_set_target_bits_in_pixel(ipix)))
+
+    # ADM reassemble the bits in the original order of the targets.
+    desi_target = targs["DESI_TARGET"].copy()
+    for ii, dt in results:
+        desi_target[ii] = dt
+
+    log.info('Done masking {} HEALPixels...t={:.1f}s'.format(nallpix, time()-t0))
+
+    return desi_target
+
+
 def mask_targets(targs, inmaskfile=None, nside=None, bands="GRZ", maglim=[10, 10, 10], numproc=4,
                  rootdirname='/global/project/projectdirs/cosmo/data/legacysurvey/dr3.1/sweep/3.1',
-                 outfilename=None, drbricks=None):
+                 outfilename=None, drbricks=None, nsideshard=None, sharddir=None):
     """Add bits for if objects are in a bright mask, and SAFE (BADSKY) locations, to a target set.
 
     Parameters
@@ -1020,6 +1227,13 @@ def mask_targets(targs, inmaskfile=None, nside=None, bands="GRZ", maglim=[10, 10
     drbricks : :class:`~numpy.ndarray`, optional
         A rec array containing at least the "release", "ra", "dec" and "nobjs" columns from a survey bricks file
         This is typically used for testing only.
+    nsideshard : :class:`int`, optional, defaults to ``None``
+        If passed, split the targets into HEALPixels at this (NESTED) nside and
+        mask each pixel separately, in parallel across `numproc` processes.
+        The output is identical to the default (serial) masking.
+    sharddir : :class:`str`, optional, defaults to ``None``
+        If passed (along with `nsideshard`), also write the masked targets for
+        each HEALPixel to a separate file in this directory.
 
     Returns
     -------
@@ -1031,6 +1245,7 @@ def mask_targets(targs, inmaskfile=None, nside=None, bands="GRZ", maglim=[10, 10
     -----
         - See `Tech Note 2346`_ for more details about SAFE (BADSKY) locations.
         - Runs in about 10 minutes for 20M targets and 50k masks (roughly maglim=10).
+        - See :func:`set_target_bits_hp` for details of the `nsideshard` mode.
     """
 
     # ADM set up default logger.
@@ -1065,7 +1280,11 @@ def mask_targets(targs, inmaskfile=None, nside=None, bands="GRZ", maglim=[10, 10
     log.info('Generated {} SAFE (BADSKY) locations...t={:.1f}s'.format(len(targs)-ntargsin, time()-t0))
 
     # ADM update the bits depending on whether targets are in a mask.
-    dt = set_target_bits(targs, sourcemask)
+    if nsideshard is None:
+        dt = set_target_bits(targs, sourcemask)
+    else:
+        dt = set_target_bits_hp(targs, sourcemask, nsideshard,
+                                numproc=numproc, outdir=sharddir)
     done = targs.copy()
     done["DESI_TARGET"] = dt
 
@@ -4,13 +4,11 @@ desitarget.cmx.cmx_targetmask
 
 This looks more like a script than an actual module.
 """
-from desiutil.bitmask import BitMask
-from desitarget.targetmask import load_mask_bits
+import sys
+from desitarget.targetmask import _MaskModule
 
-_bitdefs = load_mask_bits("cmx")
-try:
-    cmx_mask = BitMask('cmx_mask', _bitdefs)
-    cmx_obsmask = BitMask('cmx_obsmask', _bitdefs)
-except TypeError:
-    cmx_mask = object()
-    cmx_obsmask = object()
+# ADM the BitMasks (and the yaml file) are only loaded when first used.
+_maskprefix = "cmx"
+_masknames = {'cmx_mask': 'cmx_mask', 'cmx_obsmask': 'cmx_obsmask'}
+
+sys.modules[__name__].__class__ = _MaskModule
@@ -2131,7 +2131,8 @@ def select_targets(infiles, numproc=4, qso_selection='randomforest',
                    nside=None, pixlist=None, bundlefiles=None, filespersec=0.12,
                    extra=None, radecbox=None, radecrad=None, mask=True,
                    tcnames=["ELG", "QSO", "LRG", "MWS", "BGS", "STD"],
-                   survey='main', resolvetargs=True):
+                   survey='main', resolvetargs=True, skipfailures=False,
+                   timeout=None, failfile=None):
     """Process input files in parallel to select targets.
 
     Parameters
@@ -2193,6 +2194,18 @@ def select_targets(infiles, numproc=4, qso_selection='randomforest',
     resolvetargs : :class:`boolean`, optional, defaults to ``True``
         If ``True``, resolve targets into northern targets in northern regions
         and southern targets in southern regions.
+    skipfailures : :class:`boolean`, optional, defaults to ``False``
+        If ``True``, and `numproc` > 1, retry any input file that fails
+        exactly once and, if it fails again, skip it (logging the error)
+        rather than halting the run.
+    timeout : :class:`float`, optional, defaults to ``None``
+        If passed, and `numproc` > 1, any input file that takes longer
+        than this many seconds fails (and, with `skipfailures`, is then
+        retried and skipped). See
+        :meth:`~desitarget.internal.sharedmem.MapReduce.map` for caveats.
+    failfile : :class:`str`, optional, defaults to ``None``
+        If passed, with `skipfailures`, write a manifest of any skipped
+        input files to `failfile` (see :func:`~desitarget.io.write_failures`).
 
     Returns
     -------
@@ -2333,13 +2346,29 @@ def select_targets(infiles, numproc=4, qso_selection='randomforest',
 
     # - Parallel process input files
     if numproc > 1:
+        # ADM use file sizes as a hint to process the largest files first.
+        costs = [os.path.getsize(fn) for fn in infiles]
         pool = sharedmem.MapReduce(np=numproc)
         with pool:
             if sandbox:
                 log.info("You're in the sandbox...")
-                targets = pool.map(_select_sandbox_targets_file, infiles, reduce=_update_status)
+                targets = pool.map(_select_sandbox_targets_file, infiles,
+                                   reduce=_update_status, costs=costs,
+                                   retries=int(skipfailures),
+                                   skip=skipfailures, timeout=timeout)
             else:
-                targets = pool.map(_select_targets_file, infiles, reduce=_update_status)
+                targets = pool.map(_select_targets_file, infiles,
+                                   reduce=_update_status, costs=costs,
+                                   retries=int(skipfailures),
+                                   skip=skipfailures, timeout=timeout)
+        # ADM report any files that failed, to be rerun in isolation.
+        failures = pool.failures
+        for f in failures:
+            log.error("Skipped {} after {} attempt(s): {}".format(
+                f["item"], f["attempts"], f["error"]))
+        targets = [t for t in targets if t is not None]
+        log.info('Mean (min) process utilization: {:.0%} ({:.0%})'.format(
+            np.mean(pool.stats["utilization"]), np.min(pool.stats["utilization"])))
     else:
         targets = list()
         if sandbox:
@@ -2349,6 +2378,11 @@ def select_targets(infiles, numproc=4, qso_selection='randomforest',
         else:
             for x in infiles:
                 targets.append(_update_status(_select_targets_file(x)))
+        failures = []
+
+    # ADM record any skipped files alongside the output.
+    if skipfailures and failfile is not None:
+        io.write_failures(failfile, failures)
 
     # ADM it's possible that somebody could pass an arangment of HEALPixels
     # ADM that contain no targets, in which case exit (somewhat) gracefully.
@@ -12,7 +12,6 @@ import sys
 import numpy as np
 import numpy.lib.recfunctions as rfn
 import fitsio
-import requests
 import pickle
 from glob import glob
 from time import time
@@ -23,7 +22,6 @@ from desitarget.io import check_fitsio_version
 from desitarget.internal import sharedmem
 from desitarget.geomask import hp_in_box, add_hp_neighbors
 from desitarget.geomask import hp_beyond_gal_b, nside2nside
-from desimodel.footprint import radec2pix
 from astropy.coordinates import SkyCoord
 from astropy import units as u
 from astropy.io import ascii
@@ -193,7 +191,9 @@ def scrape_gaia(url="http://cdn.gea.esac.esa.int/Gaia/gdr2/gaia_source/csv/", nf
         log.info('Making Gaia directory for storing CSV files')
         os.makedirs(csvdir)
 
-    # ADM pull back the index.html from the url.
+    # ADM pull back the index.html from the url (requests is imported
+    # ADM here as it's only needed for downloads and is slow to import).
+    import requests
     index = requests.get(url)
 
     # ADM retrieve any file name that starts with GaiaSource.
@@ -248,6 +248,7 @@ def gaia_csv_to_fits(numproc=4):
         - if numproc==1, use the serial code instead of the parallel code.
         - Runs in 1-3 hours (depending on node) with numproc=32 for 60,000 files.
     """
+    from desimodel.footprint import radec2pix
     # ADM the resolution at which the Gaia HEALPix files should be stored.
     nside = _get_gaia_nside()
 
@@ -372,6 +373,7 @@ def gaia_fits_to_healpix(numproc=4):
         - if numproc==1, use the serial code instead of the parallel code.
         - Runs in about 1-3 hours with numproc=32 for 60,000 files.
     """
+    from desimodel.footprint import radec2pix
     # ADM the resolution at which the Gaia HEALPix files should be stored.
     nside = _get_gaia_nside()
 
@@ -583,6 +585,7 @@ def read_gaia_file(filename, header=False, addobjid=False):
     -----
         - A better location for this might be in `desitarget.io`?
     """
+    from desimodel.footprint import radec2pix
     # ADM check for an epic fail on the the version of fitsio.
     check_fitsio_version()
 
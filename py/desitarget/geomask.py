@@ -13,6 +13,8 @@ from __future__ import (absolute_import, division)
 import numpy as np
 import fitsio
 from time import time
+from functools import lru_cache
+from scipy.spatial import cKDTree
 
 from astropy.coordinates import SkyCoord
 from astropy import units as u
@@ -1346,6 +1348,83 @@ def is_in_gal_box(objs, lbbox, radec=False):
     return ii
 
 
+@lru_cache(maxsize=4)
+def get_bricks(bricksize=0.25):
+    """A (cached) instance of the :class:`desiutil.brick.Bricks` class.
+
+    Parameters
+    ----------
+    bricksize : :class:`float`, optional, defaults to 0.25
+        Brick size in degrees.
+
+    Returns
+    -------
+    :class:`desiutil.brick.Bricks`
+        Brick look-up class for `bricksize`.
+
+    Notes
+    -----
+        - Building the brick look-up tables takes over a second, so this
+          is deferred until bricks are needed rather than done when a
+          module is imported, which keeps command-line scripts (and spawned
+          worker processes) quick to start.
+    """
+    return brick.Bricks(bricksize=bricksize)
+
+
+def radec_to_xyz(ras, decs):
+    """Unit vectors for RA/Dec.
+
+    Parameters
+    ----------
+    ras : :class:`~numpy.ndarray`
+        Right Ascensions (degrees).
+    decs : :class:`~numpy.ndarray`
+        Declinations (degrees).
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        An N x 3 array of Cartesian unit vectors.
+    """
+    theta, phi = np.radians(90-decs), np.radians(ras)
+
+    return np.vstack([np.sin(theta)*np.cos(phi), np.sin(theta)*np.sin(phi),
+                      np.cos(theta)]).T
+
+
+@lru_cache(maxsize=64)
+def read_hpx_tree(filename, columns=None):
+    """Read a HEALPixel-split catalog file and a KD-tree of its locations.
+
+    Parameters
+    ----------
+    filename : :class:`str`
+        File name of a HEALPixel-split catalog file (e.g. Gaia or URAT)
+        that has columns "RA" and "DEC".
+    columns : :class:`tuple`, optional, defaults to ``None``
+        The columns to read. ``None`` means all columns.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        The data in `filename`.
+    :class:`~scipy.spatial.cKDTree`
+        A KD-tree of the unit vectors (see :func:`radec_to_xyz()`) of the
+        locations in `filename`.
+
+    Notes
+    -----
+        - Cached (per-process) because neighboring HEALPixels share files,
+          so treat the returned data as read-only.
+    """
+    if columns is not None:
+        columns = list(columns)
+    data = fitsio.read(filename, columns=columns)
+
+    return data, cKDTree(radec_to_xyz(data["RA"], data["DEC"]))
+
+
 def radec_match_to(matchto, objs, sep=1., radec=False, return_sep=False):
     """Match objects to a catalog list on RA/Dec.
 
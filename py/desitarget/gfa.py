@@ -9,28 +9,33 @@ import numpy as np
 import os.path
 import glob
 import os
+import re
+import json
 from time import time
+from functools import lru_cache
 import healpy as hp
 
+import astropy.units as u
+from astropy.coordinates import SkyCoord
+
 import desimodel.focalplane
 import desimodel.io
-from desimodel.footprint import is_point_in_desi
+from desimodel.footprint import is_point_in_desi, radec2pix
 
 import desitarget.io
+from desitarget import __version__ as desitarget_version
 from desitarget.internal import sharedmem
-from desitarget.gaiamatch import read_gaia_file, find_gaia_files_beyond_gal_b
-from desitarget.gaiamatch import find_gaia_files_tiles, find_gaia_files_box
-from desitarget.gaiamatch import find_gaia_files_hp
-from desitarget.uratmatch import match_to_urat
+from desitarget.gaiamatch import read_gaia_file, find_gaia_files_tiles
+from desitarget.gaiamatch import _get_gaia_dir, _get_gaia_nside
+from desitarget.uratmatch import match_to_urat, uratdatamodel
+from desitarget.uratmatch import _get_urat_dir, _get_urat_nside
 from desitarget.targets import encode_targetid, resolve
-from desitarget.geomask import is_in_gal_box, is_in_box, is_in_hp
+from desitarget.geomask import is_in_box, is_in_hp
 from desitarget.geomask import bundle_bricks, sweep_files_touch_hp
+from desitarget.geomask import add_hp_neighbors, get_bricks
 
-from desiutil import brick
 from desiutil.log import get_logger
 
-# ADM set up the Legacy Surveys bricks object.
-bricks = brick.Bricks(bricksize=0.25)
 # ADM set up the default DESI logger.
 log = get_logger()
 
@@ -156,6 +161,157 @@ def gaia_gfas_from_sweep(filename, maglim=18.):
     return gfas
 
 
+@lru_cache(maxsize=1)
+def _icrs_to_galactic():
+    """The rotation matrix from ICRS to Galactic Cartesian coordinates.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        A 3x3 matrix, M, such that M.dot(xyz) is in Galactic coordinates.
+    """
+    # ADM the images of the ICRS unit vectors are the columns of M.
+    c = SkyCoord([0., 90., 0.]*u.degree, [0., 0., 90.]*u.degree)
+
+    return c.galactic.cartesian.xyz.value
+
+
+def galactic_b(ra, dec):
+    """Galactic latitude for ICRS coordinates via a cached rotation matrix.
+
+    Parameters
+    ----------
+    ra : :class:`~numpy.ndarray` or `float`
+        Right Ascension (degrees).
+    dec : :class:`~numpy.ndarray` or `float`
+        Declination (degrees).
+
+    Returns
+    -------
+    :class:`~numpy.ndarray` or `float`
+        The Galactic latitude, b (degrees).
+
+    Notes
+    -----
+        - Agrees with the astropy `SkyCoord.galactic` frame transform
+          to within ~1e-12 degrees, at a fraction of the cost.
+    """
+    ra, dec = np.radians(ra), np.radians(dec)
+    m = _icrs_to_galactic()[2]
+    z = np.cos(dec)*(m[0]*np.cos(ra) + m[1]*np.sin(ra)) + m[2]*np.sin(dec)
+
+    return np.degrees(np.arcsin(np.clip(z, -1., 1.)))
+
+
+@lru_cache(maxsize=16)
+def _gaia_pixel_status(mindec, mingalb, nside, pixlist, step=16):
+    """Cached version of :func:`gaia_pixel_status()` (`pixlist` a tuple).
+    """
+    gnside = _get_gaia_nside()
+    gpix = np.arange(hp.nside2npix(gnside))
+
+    # ADM sample the edges of each pixel, add the center, and find the
+    # ADM extremes of Dec and Galactic b for each pixel.
+    vecs = hp.boundaries(gnside, gpix, step=step, nest=True)
+    vecs = np.concatenate(
+        [vecs, np.array(hp.pix2vec(gnside, gpix, nest=True)).T[..., None]],
+        axis=-1)
+    z = vecs[:, 2]
+    zgal = np.einsum('i,jik->jk', _icrs_to_galactic()[2], vecs)
+    decmin, decmax = [np.degrees(np.arcsin(f(z, axis=-1))) for f in (np.min, np.max)]
+    bmin, bmax = [np.degrees(np.arcsin(np.clip(f(zgal, axis=-1), -1., 1.)))
+                  for f in (np.min, np.max)]
+    # ADM the (only) interior extremes are at the poles.
+    for sign in 1, -1:
+        pole = hp.vec2pix(gnside, 0., 0., sign, nest=True)
+        galpole = hp.vec2pix(gnside, *(sign*_icrs_to_galactic()[2]), nest=True)
+        if sign == 1:
+            decmax[pole], bmax[galpole] = 90., 90.
+        else:
+            decmin[pole], bmin[galpole] = -90., -90.
+    # ADM pad the extremes to allow for curvature between samples.
+    pad = np.degrees(hp.max_pixrad(gnside)) / step
+
+    # ADM Dec constraint.
+    decin = decmin - pad >= mindec
+    decout = decmax + pad < mindec
+
+    # ADM Galactic latitude constraint, on |b|.
+    if mingalb > 1e-9:
+        absbmin = np.where((bmin < 0) & (bmax > 0), 0.,
+                           np.minimum(np.abs(bmin), np.abs(bmax)))
+        absbmax = np.maximum(np.abs(bmin), np.abs(bmax))
+        galin = absbmin - pad >= mingalb
+        galout = absbmax + pad < mingalb
+    else:
+        galin, galout = np.ones_like(decin), np.zeros_like(decout)
+
+    # ADM HEALPixel constraint, which is exact for NESTED pixels.
+    hpin, hpout = np.ones_like(decin), np.zeros_like(decout)
+    if pixlist is not None:
+        if gnside >= nside:
+            parent = gpix // (gnside//nside)**2
+            hpin = np.isin(parent, pixlist)
+            hpout = ~hpin
+        else:
+            nchild = (nside//gnside)**2
+            children = gpix[:, None]*nchild + np.arange(nchild)
+            inchild = np.isin(children, pixlist)
+            hpin, hpout = np.all(inchild, axis=1), ~np.any(inchild, axis=1)
+
+    status = np.full(len(gpix), -1, dtype='i1')
+    status[decin & galin & hpin] = 1
+    status[decout | galout | hpout] = 0
+
+    return status
+
+
+def gaia_pixel_status(mindec=-30., mingalb=10., nside=None, pixlist=None):
+    """Classify Gaia HEALPixels as in, out of, or on the edge of a footprint.
+
+    Parameters
+    ----------
+    mindec : :class:`float`, optional, defaults to -30
+        Minimum declination (o) to include for output Gaia objects.
+    mingalb : :class:`float`, optional, defaults to 10
+        Closest latitude to Galactic plane for output Gaia objects
+        (e.g. send 10 to limit to areas beyond -10o <= b < 10o).
+    nside : :class:`int`, optional, defaults to `None`
+        (NESTED) HEALPix `nside` to use with `pixlist`.
+    pixlist : :class:`list` or `int`, optional, defaults to `None`
+        Only include sources in a set of (NESTED) HEALpixels at the
+        supplied `nside`.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        For each (NESTED) HEALPixel at the nside of the Gaia files, 1 if
+        every location in the pixel satisfies the constraints, 0 if no
+        location does, and -1 if the pixel straddles a boundary.
+
+    Notes
+    -----
+        - Results are cached, so repeat calls are free.
+        - Only pixels that are -1 need per-object geometric checks.
+        - The classification is conservative: pixels within a small
+          margin of a boundary are classified as -1.
+    """
+    if pixlist is not None:
+        pixlist = tuple(np.atleast_1d(pixlist).tolist())
+
+    return _gaia_pixel_status(mindec, mingalb, nside, pixlist)
+
+
+def _gaia_file_pixel(infile):
+    """The HEALPixel of a Gaia healpix file, or ``None`` if unknown.
+    """
+    match = re.match(r'healpix-(\d+)\.fits$', os.path.basename(infile))
+    if match is None:
+        return None
+
+    return int(match.group(1))
+
+
 def gaia_in_file(infile, maglim=18, mindec=-30., mingalb=10.,
                  nside=None, pixlist=None, addobjid=False):
     """Retrieve the Gaia objects from a HEALPixel-split Gaia file.
@@ -190,7 +346,25 @@ def gaia_in_file(infile, maglim=18, mindec=-30., mingalb=10.,
     -----
        - A "Gaia healpix file" here is as made by, e.g.
          :func:`~desitarget.gaiamatch.gaia_fits_to_healpix()`
+       - The file's HEALPixel is classified with
+         :func:`gaia_pixel_status()`, so files that are entirely outside
+         of the constraints are not read, and per-object geometric
+         checks are only run for files that straddle a boundary.
     """
+    # ADM initiate the GFA data model.
+    dt = gfadatamodel.dtype.descr
+    if addobjid:
+        for tup in ('GAIA_BRICKID', '>i4'), ('GAIA_OBJID', '>i4'):
+            dt.append(tup)
+
+    # ADM classify the file's pixel against the geometric constraints.
+    status = -1
+    pix = _gaia_file_pixel(infile)
+    if pix is not None:
+        status = gaia_pixel_status(mindec, mingalb, nside, pixlist)[pix]
+    if status == 0:
+        return np.zeros(0, dtype=dt)
+
     # ADM read in the Gaia file and limit to the passed magnitude.
     objs = read_gaia_file(infile, addobjid=addobjid)
     ii = objs['GAIA_PHOT_G_MEAN_MAG'] < maglim
@@ -201,19 +375,28 @@ def gaia_in_file(infile, maglim=18, mindec=-30., mingalb=10.,
         objs.dtype.names = [radec if col == "GAIA_"+radec else col
                             for col in objs.dtype.names]
 
-    # ADM initiate the GFA data model.
-    dt = gfadatamodel.dtype.descr
-    if addobjid:
-        for tup in ('GAIA_BRICKID', '>i4'), ('GAIA_OBJID', '>i4'):
-            dt.append(tup)
+    # ADM only check the geometry of each object if the file's pixel
+    # ADM straddles a boundary.
+    if status == -1:
+        # ADM limit by HEALPixel first as that's the fastest.
+        if pixlist is not None:
+            inhp = is_in_hp(objs, nside, pixlist)
+            objs = objs[inhp]
+        # ADM limit by Dec first to speed transform to Galactic coordinates.
+        decgood = is_in_box(objs, [0., 360., mindec, 90.])
+        objs = objs[decgood]
+        # ADM now limit to requesed Galactic latitude range.
+        if mingalb > 1e-9:
+            b = galactic_b(objs["RA"], objs["DEC"])
+            objs = objs[(b < -mingalb) | (b >= mingalb)]
 
     gfas = np.zeros(len(objs), dtype=dt)
     # ADM make sure all columns initially have "ridiculous" numbers
     gfas[...] = -99.
     for col in gfas.dtype.names:
-        if isinstance(gfas[col][0].item(), (bytes, str)):
+        if gfas[col].dtype.kind == 'S':
             gfas[col] = 'U'
-        if isinstance(gfas[col][0].item(), int):
+        if gfas[col].dtype.kind == 'i':
             gfas[col] = -1
     # ADM some default special cases. Default to REF_EPOCH of Gaia DR2,
     # ADM make RA/Dec very precise for Gaia measurements.
@@ -229,19 +412,7 @@ def gaia_in_file(infile, maglim=18, mindec=-30., mingalb=10.,
     gfas["TYPE"] = gaia_morph(gfas)
 
     # ADM populate the BRICKID columns.
-    gfas["BRICKID"] = bricks.brickid(gfas["RA"], gfas["DEC"])
-
-    # ADM limit by HEALPixel first as that's the fastest.
-    if pixlist is not None:
-        inhp = is_in_hp(gfas, nside, pixlist)
-        gfas = gfas[inhp]
-    # ADM limit by Dec first to speed transform to Galactic coordinates.
-    decgood = is_in_box(gfas, [0., 360., mindec, 90.])
-    gfas = gfas[decgood]
-    # ADM now limit to requesed Galactic latitude range.
-    if mingalb > 1e-9:
-        bbad = is_in_gal_box(gfas, [0., 360., -mingalb, mingalb])
-        gfas = gfas[~bbad]
+    gfas["BRICKID"] = get_bricks().brickid(gfas["RA"], gfas["DEC"])
 
     return gfas
 
@@ -288,12 +459,12 @@ def all_gaia_in_tiles(maglim=18, numproc=4, allsky=False,
     """
     # ADM grab paths to Gaia files in the sky or the DESI footprint.
     if allsky:
-        infilesbox = find_gaia_files_box([0, 360, mindec, 90])
-        infilesgalb = find_gaia_files_beyond_gal_b(mingalb)
-        infiles = list(set(infilesbox).intersection(set(infilesgalb)))
-        if pixlist is not None:
-            infileshp = find_gaia_files_hp(nside, pixlist, neighbors=False)
-            infiles = list(set(infiles).intersection(set(infileshp)))
+        # ADM only files with pixels that aren't entirely outside of
+        # ADM the geometric constraints need to be read.
+        status = gaia_pixel_status(mindec, mingalb, nside, pixlist)
+        hpxdir = os.path.join(_get_gaia_dir(), 'healpix')
+        infiles = [os.path.join(hpxdir, 'healpix-{:05d}.fits'.format(pix))
+                   for pix in np.where(status != 0)[0]]
     else:
         infiles = find_gaia_files_tiles(tiles=tiles, neighbors=False)
     nfiles = len(infiles)
@@ -343,48 +514,50 @@ def add_urat_pms(objs, numproc=4):
     Parameters
     ----------
     objs : :class:`~numpy.ndarray`
-        Array of objects to update. Must include the columns "PMRA",
-        "PMDEC", "REF_ID" (unique per object) "URAT_ID" and "URAT_SEP".
+        Array of objects to update. Must include the columns "RA"
+        and "DEC".
     numproc : :class:`int`, optional, defaults to 4
         The number of parallel processes to use.
 
     Returns
     -------
     :class:`~numpy.ndarray`
-        The input array with the "PMRA", PMDEC", "URAT_ID" and "URAT_SEP"
-        columns updated to include URAT information.
+        The URAT information for each object, in the same order as `objs`,
+        formatted as for :func:`~desitarget.uratmatch.match_to_urat()`,
+        which includes the columns "PMRA", PMDEC", "URAT_ID" and
+        "URAT_SEP".
 
     Notes
     -----
-       - Order is retained using "REF_ID": The input and output
-         arrays should have the same order.
+        - Objects are matched in groups of nearby objects, which are
+          dispatched in sky order so that each process can reuse the
+          (cached) URAT files shared between neighboring groups.
+        - Each group writes its results straight into a (shared) output
+          array by index, so the input order is retained without sorting.
     """
-    # ADM check REF_ID is indeed unique for each object.
-    assert len(objs["REF_ID"]) == len(np.unique(objs["REF_ID"]))
-
-    # ADM record the original REF_IDs so we can match back to them.
-    origids = objs["REF_ID"]
-
     # ADM loosely group the input objects on the sky. NSIDE=16 seems
     # ADM to nicely balance sample sizes for matching, with the code
     # ADM being quicker for clumped objects because of file I/O.
     theta, phi = np.radians(90-objs["DEC"]), np.radians(objs["RA"])
     pixels = hp.ang2pix(16, theta, phi, nest=True)
 
-    # ADM reorder objects (and pixels themselves) based on pixel number.
-    ii = np.argsort(pixels)
-    objs, pixels = objs[ii], pixels[ii]
+    # ADM the indexes of the objects in each pixel are slices of the
+    # ADM indexes sorted by pixel number.
+    srt = np.argsort(pixels, kind='stable')
+    _, starts, cnts = np.unique(pixels[srt], return_index=True,
+                                return_counts=True)
+    nallpix = len(starts)
 
-    # ADM create pixel-split sub-lists of the objects.
-    # ADM here, np.diff marks the transition to the next pixel number.
-    splitobjs = np.split(objs, np.where(np.diff(pixels))[0]+1)
-    nallpix = len(splitobjs)
+    # ADM preallocate the (shared) output array.
+    dt = uratdatamodel.dtype.descr + [("URAT_SEP", ">f4")]
+    urats = sharedmem.empty(len(objs), dtype=dt)
 
     # ADM function to run on each of the HEALPix-split input objs.
-    def _get_urat_matches(splitobj):
-        '''wrapper on match_to_urat() for rec array (matchrad=0.5")'''
-        # ADM also return the REF_ID to track the objects.
-        return [match_to_urat(splitobj, matchrad=0.5), splitobj["REF_ID"]]
+    def _get_urat_matches(i):
+        '''wrapper on match_to_urat() for one pixel (matchrad=0.5")'''
+        ii = srt[starts[i]:starts[i]+cnts[i]]
+        urats[ii] = match_to_urat(objs[ii], matchrad=0.5)
+        return
 
     # ADM this is just to count pixels in _update_status.
     npix = np.zeros((), dtype='i8')
@@ -401,31 +574,214 @@ def add_urat_pms(objs, numproc=4):
         npix[...] += 1    # this is an in-place modification.
         return result
 
-    # - Parallel process pixels.
+    # - Parallel process pixels, in (NESTED) sky order, in contiguous
+    # - batches so that each process works on neighboring pixels.
     if numproc > 1:
+        chunksize = max(nallpix // (4*numproc), 1)
         pool = sharedmem.MapReduce(np=numproc)
         with pool:
-            urats = pool.map(_get_urat_matches, splitobjs, reduce=_update_status)
+            pool.map(_get_urat_matches, range(nallpix),
+                     reduce=_update_status, chunksize=chunksize)
     else:
-        urats = []
-        for splitobj in splitobjs:
-            urats.append(_update_status(_get_urat_matches(splitobj)))
+        for i in range(nallpix):
+            _update_status(_get_urat_matches(i))
 
-    # ADM remember to grab the REFIDs as well as the URAT matches.
-    refids = np.concatenate(np.array(urats)[:, 1])
-    urats = np.concatenate(np.array(urats)[:, 0])
+    return np.array(urats)
 
-    # ADM sort the output to match the input, on REF_ID.
-    ii = np.zeros_like(refids)
-    ii[np.argsort(origids)] = np.argsort(refids)
-    assert np.all(refids[ii] == origids)
 
-    return urats[ii]
+def _file_version(fn):
+    """The name, size in bytes and modification time (ns) of a file.
+
+    Parameters
+    ----------
+    fn : :class:`str`
+        Full path to a file.
+
+    Returns
+    -------
+    :class:`list`
+        `fn`, its size and its modification time, with a size and time
+        of -1 if `fn` doesn't exist.
+    """
+    if not os.path.exists(fn):
+        return [fn, -1, -1]
+    st = os.stat(fn)
+
+    return [fn, st.st_size, st.st_mtime_ns]
+
+
+def gfa_pixel_manifest(pix, sweepfiles, maglim=18, mindec=-30, mingalb=10,
+                       addurat=True):
+    """The inputs on which the GFAs in one Gaia HEALPixel depend.
+
+    Parameters
+    ----------
+    pix : :class:`int`
+        A (NESTED) HEALPixel at the nside of the Gaia files.
+    sweepfiles : :class:`list`
+        The sweep files that touch `pix`.
+    maglim : :class:`float`, optional, defaults to 18
+        Magnitude limit for GFAs in Gaia G-band.
+    mindec : :class:`float`, optional, defaults to -30
+        Minimum declination (o) for output sources that do NOT match
+        an object in `sweepfiles`.
+    mingalb : :class:`float`, optional, defaults to 10
+        Closest latitude to Galactic plane for output sources that
+        do NOT match an object in `sweepfiles`.
+    addurat : :class:`bool`, optional, defaults to ``True``
+        If ``True`` then proper motions are added from URAT.
+
+    Returns
+    -------
+    :class:`dict`
+        The desitarget version, the values of `maglim`, `mindec`,
+        `mingalb`, and the name, size and modification time of the
+        Gaia file for `pix`, each of the `sweepfiles`, and (only if
+        `addurat` is ``True``) the URAT files for `pix` and its
+        neighbors.
+
+    Notes
+    -----
+        - The GFAs in `pix` only need to be recomputed if this changes.
+    """
+    gaiafile = os.path.join(_get_gaia_dir(), 'healpix',
+                            'healpix-{:05d}.fits'.format(pix))
+    manifest = {"desitarget": desitarget_version, "maglim": float(maglim),
+                "mindec": float(mindec), "mingalb": float(mingalb),
+                "gaia": _file_version(gaiafile),
+                "sweeps": [_file_version(fn) for fn in sorted(sweepfiles)],
+                "urat": None}
+    # ADM objects are matched to URAT in their pixel and its neighbors.
+    # ADM the URAT and Gaia files share the same HEALPixel nside.
+    if addurat:
+        hpxdir = os.path.join(_get_urat_dir(), 'healpix')
+        upix = add_hp_neighbors(_get_urat_nside(), pix)
+        manifest["urat"] = [_file_version(
+            os.path.join(hpxdir, 'healpix-{:05d}.fits'.format(p)))
+            for p in sorted(upix)]
+
+    return manifest
+
+
+def _gfas_from_cache(infiles, cachedir, maglim=18, numproc=4, nside=None,
+                     pixlist=None, mindec=-30, mingalb=10, addurat=True,
+                     skipfailures=False, timeout=None, failfile=None):
+    """:func:`select_gfas()` assembled from a cache of Gaia HEALPixels.
+
+    Parameters
+    ----------
+    infiles : :class:`list`
+        A list of input filenames (sweep files).
+    cachedir : :class:`str`
+        Directory for the cache of GFAs in each Gaia HEALPixel.
+    maglim, numproc, nside, pixlist, mindec, mingalb, addurat, skipfailures,
+    timeout, failfile
+        As for :func:`select_gfas()`.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        As for :func:`select_gfas()`, sorted by REF_ID.
+
+    Notes
+    -----
+        - Each Gaia HEALPixel is cached in `cachedir` as
+          gfas-hp-xxxxx.npz, alongside a manifest of its inputs from
+          :func:`gfa_pixel_manifest()`. Only pixels with a missing or
+          outdated manifest are recomputed (with :func:`select_gfas()`).
+    """
+    t0 = time()
+    gnside = _get_gaia_nside()
+
+    # ADM the sweep files that touch each Gaia HEALPixel.
+    sweepsperpix = [[] for pix in range(hp.nside2npix(gnside))]
+    if len(infiles) > 0:
+        filesperpixel, _, _ = sweep_files_touch_hp(gnside, 0, infiles)
+        for pix, fns in enumerate(filesperpixel):
+            sweepsperpix[pix] = fns
+
+    # ADM Gaia HEALPixels that aren't outside of the geometric
+    # ADM constraints or that are touched by a sweep file...
+    pixels = gaia_pixel_status(mindec, mingalb, nside, pixlist) != 0
+    pixels |= np.array([len(fns) > 0 for fns in sweepsperpix])
+    # ADM ...that overlap the requested HEALPixels.
+    if pixlist is not None:
+        pixels &= gaia_pixel_status(-90., 0., nside, pixlist) != 0
+    pixels = np.where(pixels)[0]
+
+    # ADM load any cached pixels with up-to-date manifests.
+    manifests, gfasperpix, stale = {}, {}, []
+    for pix in pixels:
+        manifests[pix] = json.dumps(gfa_pixel_manifest(
+            pix, sweepsperpix[pix], maglim=maglim, mindec=mindec,
+            mingalb=mingalb, addurat=addurat), sort_keys=True)
+        cfn = os.path.join(cachedir, 'gfas-hp-{:05d}.npz'.format(pix))
+        if os.path.exists(cfn):
+            with np.load(cfn) as cached:
+                if str(cached["manifest"]) == manifests[pix]:
+                    gfasperpix[pix] = cached["data"]
+                    continue
+        stale.append(pix)
+    log.info('Read {} of {} Gaia HEALPixels from the cache in {}...t = {:.1f} mins'
+             .format(len(gfasperpix), len(pixels), cachedir, (time()-t0)/60))
+
+    # ADM recompute the remaining pixels and add them to the cache.
+    if len(stale) > 0:
+        gfas = select_gfas(infiles, maglim=maglim, numproc=numproc,
+                           nside=gnside, pixlist=stale, mindec=mindec,
+                           mingalb=mingalb, addurat=addurat,
+                           skipfailures=skipfailures, timeout=timeout,
+                           failfile=failfile)
+        gpix = radec2pix(gnside, gfas["RA"], gfas["DEC"])
+        ii = np.argsort(gpix, kind="stable")
+        gfas, gpix = gfas[ii], gpix[ii]
+        starts = np.searchsorted(gpix, stale, side="left")
+        ends = np.searchsorted(gpix, stale, side="right")
+        for pix, start, end in zip(stale, starts, ends):
+            gfasperpix[pix] = gfas[start:end]
+            # ADM a pixel could be missing skipped files, so don't cache.
+            if skipfailures:
+                continue
+            cfn = os.path.join(cachedir, 'gfas-hp-{:05d}.npz'.format(pix))
+            try:
+                os.makedirs(cachedir, exist_ok=True)
+                # ADM write to a temporary file and rename, so that
+                # ADM the cache is never left partially written.
+                tmpfn = '{}.tmp{}'.format(cfn, os.getpid())
+                with open(tmpfn, 'wb') as f:
+                    np.savez(f, data=gfasperpix[pix], manifest=manifests[pix])
+                os.replace(tmpfn, cfn)
+            except OSError as e:
+                log.warning("Can't cache HEALPixel {} in {}: {}".format(
+                    pix, cachedir, e))
+        log.info('Recomputed {} Gaia HEALPixels...t = {:.1f} mins'
+                 .format(len(stale), (time()-t0)/60))
+    elif skipfailures and failfile is not None:
+        # ADM no files were processed, so none were skipped.
+        desitarget.io.write_failures(failfile, [])
+
+    gfas = np.concatenate([np.zeros(0, dtype=gfadatamodel.dtype)] +
+                          [gfasperpix[pix] for pix in pixels])
+
+    # ADM an object can be in two pixels if its sweeps and Gaia positions
+    # ADM straddle a pixel boundary. As in select_gfas(), retain sweeps
+    # ADM information (Gaia-only objects have RELEASE of -1).
+    ii = np.argsort(gfas["RELEASE"] <= 0, kind="stable")
+    _, ind = np.unique(gfas["REF_ID"][ii], return_index=True)
+    gfas = gfas[ii[ind]]
+
+    # ADM restrict to only GFAs in a set of HEALPixels, if requested.
+    if pixlist is not None:
+        ii = is_in_hp(gfas, nside, pixlist)
+        gfas = gfas[ii]
+
+    return gfas
 
 
 def select_gfas(infiles, maglim=18, numproc=4, nside=None,
                 pixlist=None, bundlefiles=None, extra=None,
-                mindec=-30, mingalb=10, addurat=True):
+                mindec=-30, mingalb=10, addurat=True, skipfailures=False,
+                cachedir=None, timeout=None, failfile=None):
     """Create a set of GFA locations using Gaia and matching to sweeps.
 
     Parameters
@@ -460,6 +816,22 @@ def select_gfas(infiles, maglim=18, numproc=4, nside=None,
         catalog where Gaia is missing proper motions. Requires that
         the :envvar:`URAT_DIR` is set and points to data downloaded and
         formatted by, e.g., :func:`~desitarget.uratmatch.make_urat_files`.
+    skipfailures : :class:`boolean`, optional, defaults to ``False``
+        If ``True``, and `numproc` > 1, retry any input file that fails
+        exactly once and, if it fails again, skip it (logging the error)
+        rather than halting the run.
+    cachedir : :class:`str`, optional, defaults to ``None``
+        If passed, cache GFAs in each Gaia HEALPixel in this directory
+        and only recompute pixels for which inputs (e.g. `maglim`, or
+        the Gaia, URAT or sweep files) have changed since the last run.
+    timeout : :class:`float`, optional, defaults to ``None``
+        If passed, and `numproc` > 1, any input file that takes longer
+        than this many seconds fails (and, with `skipfailures`, is then
+        retried and skipped). See
+        :meth:`~desitarget.internal.sharedmem.MapReduce.map` for caveats.
+    failfile : :class:`str`, optional, defaults to ``None``
+        If passed, with `skipfailures`, write a manifest of any skipped
+        input files to `failfile` (see :func:`~desitarget.io.write_failures`).
 
     Returns
     -------
@@ -473,6 +845,10 @@ def select_gfas(infiles, maglim=18, numproc=4, nside=None,
         - If numproc==1, use the serial code instead of parallel code.
         - If numproc > 4, then numproc=4 is enforced for (just those)
           parts of the code that are I/O limited.
+        - If `cachedir` is passed, the output is sorted by REF_ID. See
+          :func:`gfa_pixel_manifest()` for the inputs that are tracked.
+          With `skipfailures`, recomputed pixels aren't added to the
+          cache, as they could be missing skipped input files.
     """
     # ADM the code can have memory issues for nside=2 with large numproc.
     if nside is not None and nside < 4 and numproc > 8:
@@ -498,7 +874,8 @@ def select_gfas(infiles, maglim=18, numproc=4, nside=None,
 
     # ADM if the pixlist option was sent, we'll need to
     # ADM know which HEALPixels touch each file.
-    if pixlist is not None:
+    filesperpixel = []
+    if pixlist is not None and len(infiles) > 0:
         filesperpixel, _, _ = sweep_files_touch_hp(
             nside, pixlist, infiles)
 
@@ -510,9 +887,20 @@ def select_gfas(infiles, maglim=18, numproc=4, nside=None,
                       prefix='gfas', surveydirs=surveydirs, extra=extra)
         return
 
+    # ADM assemble the GFAs from the cache, if requested.
+    if cachedir is not None:
+        return _gfas_from_cache(infiles, cachedir, maglim=maglim,
+                                numproc=numproc, nside=nside, pixlist=pixlist,
+                                mindec=mindec, mingalb=mingalb,
+                                addurat=addurat, skipfailures=skipfailures,
+                                timeout=timeout, failfile=failfile)
+
     # ADM restrict to input files in a set of HEALPixels, if requested.
     if pixlist is not None:
-        infiles = list(set(np.hstack([filesperpixel[pix] for pix in pixlist])))
+        # ADM (no files touch pixels beyond those in filesperpixel).
+        infiles = list(set([fn for pix in np.atleast_1d(pixlist)
+                            if pix < len(filesperpixel)
+                            for fn in filesperpixel[pix]]))
         if len(infiles) == 0:
             log.info('ZERO sweep files in passed pixel list!!!')
         log.info("Processing files in (nside={}, pixel numbers={}) HEALPixels"
@@ -544,19 +932,31 @@ def select_gfas(infiles, maglim=18, numproc=4, nside=None,
         return result
 
     # - Parallel process input files.
+    failures = []
     if len(infiles) > 0:
         if numproc4 > 1:
             pool = sharedmem.MapReduce(np=numproc4)
             with pool:
-                gfas = pool.map(_get_gfas, infiles, reduce=_update_status)
+                gfas = pool.map(_get_gfas, infiles, reduce=_update_status,
+                                retries=int(skipfailures), skip=skipfailures,
+                                timeout=timeout)
+            # ADM report any files that failed, to be rerun in isolation.
+            failures = pool.failures
+            for f in failures:
+                log.error("Skipped {} after {} attempt(s): {}".format(
+                    f["item"], f["attempts"], f["error"]))
         else:
             gfas = list()
             for file in infiles:
                 gfas.append(_update_status(_get_gfas(file)))
-        gfas = np.concatenate(gfas)
+        gfas = np.concatenate([g for g in gfas if g is not None])
         # ADM resolve any duplicates between imaging data releases.
         gfas = resolve(gfas)
 
+    # ADM record any skipped files alongside the output.
+    if skipfailures and failfile is not None:
+        desitarget.io.write_failures(failfile, failures)
+
     # ADM retrieve Gaia objects in the DESI footprint or passed tiles.
     log.info('Retrieving additional Gaia objects...t = {:.1f} mins'
              .format((time()-t0)/60))
@@ -137,6 +137,9 @@ import threading
 import heapq
 import os
 import pickle
+import signal
+import contextlib
+import time
 
 import numpy
 from multiprocessing import RawArray
@@ -225,6 +228,53 @@ class SlaveException(Exception):
         self.traceback = traceback
         Exception.__init__(self, "%s\n%s" % (str(reason), str(traceback)))
 
+class SlaveTimeout(Exception):
+    """ Raised in a slave when a work item runs past its time limit """
+    pass
+
+class Failure(object):
+    """ A work item that failed on every attempt, in place of its result.
+
+        Attributes
+        ----------
+        error : str
+            The type and message of the last exception.
+
+        traceback : str
+            The traceback of the last exception.
+
+        attempts : int
+            The number of times the item was tried.
+    """
+    def __init__(self, e, traceback, attempts):
+        # only strings, as some exceptions can't be pickled.
+        self.error = "%s: %s" % (type(e).__name__, str(e))
+        self.traceback = traceback
+        self.attempts = attempts
+
+@contextlib.contextmanager
+def timelimit(seconds):
+    """ Raise :py:class:`SlaveTimeout` if the block runs for longer than seconds.
+
+        Uses SIGALRM, so the limit is only enforced on the main thread of a
+        process (i.e. with the ProcessBackend, or in serial) and when seconds
+        is not None.
+    """
+    if seconds is None or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def handler(signum, frame):
+        raise SlaveTimeout("work item took longer than %g seconds" % seconds)
+
+    old = signal.signal(signal.SIGALRM, handler)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, old)
+
 class StopProcessGroup(Exception):
     """ StopProcessGroup will terminate the slave process/thread """
     def __init__(self):
@@ -533,6 +583,22 @@ class MapReduce(object):
             the number of available cores on the computer. If np is 0, all operations
             are performed on the master process -- no child processes are created.
 
+        Attributes
+        ----------
+        stats : dict or None
+            Statistics from the last call to :py:meth:`map` with slaves:
+            the wall-clock time of the map ('wall'), and, per slave, the
+            number of items processed ('nitems'), the time spent in the work
+            function ('busy') and the fraction of the wall-clock time that
+            the slave was busy ('utilization').
+
+        failures : list of dict
+            The work items that failed in the last call to :py:meth:`map`
+            with skip=True, in sequence order, each with the index of the
+            item ('index'), the item itself ('item'), the last error
+            ('error') and its traceback ('traceback'), and the number of
+            attempts ('attempts'). Rerun these items in isolation.
+
         Notes
         -----
         Always wrap the call to :py:meth:`map` in a context manager ('with') block.
@@ -544,24 +610,86 @@ class MapReduce(object):
             self.np = cpu_count()
         else:
             self.np = np
+        self.stats = None
+        self.failures = []
+        self._retries, self._timeout, self._skip = 0, None, False
 
     def _main(self, pg, Q, R, sequence, realfunc):
         # get and put will raise SlaveException
         # and terminate the process.
         # the exception is muted in ProcessGroup,
         # as it will only be dispatched from master.
+        rank = pg._tls.rank
         while True:
             capsule = pg.get(Q)
             if capsule is None:
                 return
-            if len(capsule) == 1:
-                i, = capsule
-                work = sequence[i]
-            else:
-                i, work = capsule
-            self.ordered.move(i)
-            r = realfunc(work)
-            pg.put(R, (i, r))
+            # a batch of work items arrives as a list of capsules.
+            if not isinstance(capsule, list):
+                capsule = [capsule]
+            for c in capsule:
+                if len(c) == 1:
+                    i, = c
+                    work = sequence[i]
+                else:
+                    i, work = c
+                self.ordered.move(i)
+                t0 = time.time()
+                r = self._attempt(realfunc, work)
+                pg.put(R, (i, r, rank, time.time() - t0))
+
+    def _attempt(self, realfunc, work):
+        """ Apply realfunc to work, with the time limit and retries.
+
+            Returns a :py:class:`Failure` if every attempt failed and items
+            are to be skipped, otherwise raises the last exception.
+        """
+        if self._retries == 0 and self._timeout is None and not self._skip:
+            return realfunc(work)
+        for attempt in range(self._retries + 1):
+            try:
+                with timelimit(self._timeout):
+                    return realfunc(work)
+            except Exception as e:
+                if attempt < self._retries:
+                    continue
+                if not self._skip:
+                    raise
+                return Failure(e, traceback.format_exc(), attempt + 1)
+
+    def _schedule(self, n, costs, chunksize):
+        """ Batches of indices in the order they are to be dispatched.
+
+            Without costs, items are dispatched in sequence order, in
+            batches of chunksize. With costs, the most expensive items are
+            dispatched first, and batches of up to chunksize items are
+            closed once their total cost reaches a quarter of the average
+            cost per slave, so that cheap items travel together but the
+            work still balances at the end of the map.
+        """
+        if costs is None:
+            order = range(n)
+        else:
+            costs = numpy.asarray(costs, dtype='f8')
+            if len(costs) != n:
+                raise ValueError("costs must have the same length as the sequence")
+            order = numpy.argsort(-costs, kind='stable')
+            target = costs.sum() / (4. * max(self.np, 1))
+
+        batches = []
+        batch = []
+        cost = 0.
+        for i in order:
+            batch.append(int(i))
+            if costs is not None:
+                cost += costs[i]
+            if len(batch) >= chunksize or (costs is not None and cost >= target):
+                batches.append(batch)
+                batch = []
+                cost = 0.
+        if len(batch) > 0:
+            batches.append(batch)
+        return batches
 
     def __enter__(self):
         self.critical = self.backend.LockFactory()
@@ -572,7 +700,8 @@ class MapReduce(object):
         self.ordered = None
         pass
 
-    def map(self, func, sequence, reduce=None, star=False):
+    def map(self, func, sequence, reduce=None, star=False, costs=None, chunksize=1,
+            timeout=None, retries=0, skip=False):
         """ Map-reduce with multile processes.
 
             Apply func to each item on the sequence, in parallel.
@@ -603,11 +732,41 @@ class MapReduce(object):
                 if True, the items in sequence are treated as positional
                 arguments of reduce.
 
+            costs : array_like, optional
+                A hint of the relative cost of each item in the sequence.
+                If passed, the most expensive items are dispatched first, so
+                that slow items don't leave most slaves idle at the end of
+                the map. :py:attr:`ordered` cannot be used with costs.
+
+            chunksize : int, optional
+                The maximum number of items to dispatch to a slave at once.
+                Defaults to 1. If costs are passed, batches are also closed
+                once they are expensive enough, so only cheap items are
+                batched.
+
+            timeout : float, optional
+                The time limit, in seconds, for each attempt at an item.
+                An item that runs past the limit fails with
+                :py:class:`SlaveTimeout`. Only enforced with the
+                ProcessBackend (or in serial). The limit is raised by a
+                SIGALRM handler, which Python only runs between bytecodes,
+                so it can't interrupt a long call into C (e.g. a single
+                fitsio read); such an item fails once the call returns.
+
+            retries : int, optional
+                The number of times to retry an item that fails.
+
+            skip : boolean, optional
+                If True, an item that fails on every attempt is recorded in
+                :py:attr:`failures` and its result is None (reduce is not
+                called for it), rather than aborting the map.
+
             Returns
             -------
             results : list
                 The list of reduced results from the map operation, in
-                the order of the arguments of sequence.
+                the order of the arguments of sequence. None for any items
+                that were skipped.
 
             Raises
             ------
@@ -628,9 +787,28 @@ class MapReduce(object):
             if star: return func(*i)
             else: return func(i)
 
+        self._timeout, self._retries, self._skip = timeout, retries, skip
+        self.failures = []
+        def record(i, item, r):
+            self.failures.append(dict(index=i, item=item, error=r.error,
+                traceback=r.traceback, attempts=r.attempts))
+
         if self.np == 0 or get_debug():
             #Do this in serial
-            return [realreduce(realfunc(i)) for i in sequence]
+            rt = []
+            for i, work in enumerate(sequence):
+                r = self._attempt(realfunc, work)
+                if isinstance(r, Failure):
+                    record(i, work, r)
+                    rt.append(None)
+                else:
+                    rt.append(realreduce(r))
+            return rt
+
+        # scheduling needs random access to the sequence.
+        schedule = costs is not None or chunksize > 1
+        if schedule and not hasattr(sequence, '__getitem__'):
+            sequence = list(sequence)
 
         Q = self.backend.QueueFactory(64)
         R = self.backend.QueueFactory(64)
@@ -648,12 +826,17 @@ class MapReduce(object):
             #   will fail silently if any error occurs.
             j = 0
             try:
-                for i, work in enumerate(sequence):
-                    if not hasattr(sequence, '__getitem__'):
-                        pg.put(Q, (i, work))
-                    else:
-                        pg.put(Q, (i, ))
-                    j = j + 1
+                if schedule:
+                    for batch in self._schedule(len(sequence), costs, chunksize):
+                        pg.put(Q, [(i, ) for i in batch])
+                        j = j + len(batch)
+                else:
+                    for i, work in enumerate(sequence):
+                        if not hasattr(sequence, '__getitem__'):
+                            pg.put(Q, (i, work))
+                        else:
+                            pg.put(Q, (i, ))
+                        j = j + 1
                 N.append(j)
 
                 for i in range(self.np):
@@ -668,6 +851,9 @@ class MapReduce(object):
         # we run fetcher on main thread to catch exceptions
         # raised by reduce
         count = 0
+        t0 = time.time()
+        nitems = numpy.zeros(self.np, dtype='i8')
+        busy = numpy.zeros(self.np, dtype='f8')
         try:
             while True:
                 try:
@@ -676,7 +862,15 @@ class MapReduce(object):
                     continue
                 except StopProcessGroup:
                     raise pg.get_exception()
-                capsule = capsule[0], realreduce(capsule[1])
+                i, r, rank, elapsed = capsule
+                nitems[rank] += 1
+                busy[rank] += elapsed
+                if isinstance(r, Failure):
+                    item = sequence[i] if hasattr(sequence, '__getitem__') else None
+                    record(i, item, r)
+                    capsule = i, None
+                else:
+                    capsule = i, realreduce(r)
                 heapq.heappush(L, capsule)
                 count = count + 1
                 if len(N) > 0 and count == N[0]:
@@ -691,6 +885,10 @@ class MapReduce(object):
             pg.join()
             feeder.join()
             assert N[0] == len(rt)
+            wall = time.time() - t0
+            self.failures.sort(key=lambda f: f['index'])
+            self.stats = dict(wall=wall, nitems=nitems, busy=busy,
+                              utilization=busy / max(wall, 1e-12))
             return rt
         except BaseException as e:
             pg.killall()
@@ -14,6 +14,7 @@ import fitsio
 from fitsio import FITS
 import os
 import re
+import json
 from . import __version__ as desitarget_version
 import numpy.lib.recfunctions as rfn
 import healpy as hp
@@ -24,7 +25,8 @@ from desiutil import depend
 from desitarget.geomask import hp_in_box, box_area, is_in_box
 from desitarget.geomask import hp_in_cap, cap_area, is_in_cap
 from desitarget.geomask import is_in_hp, nside2nside, pixarea2nside
-from desitarget.targets import main_cmx_or_sv
+from desitarget.targets import main_cmx_or_sv, subpriority_from_targetid
+from desitarget.internal import sharedmem
 
 # ADM set up the DESI default logger
 from desiutil.log import get_logger
@@ -129,7 +131,7 @@ def add_photsys(indata):
     return outdata
 
 
-def read_tractor(filename, header=False, columns=None):
+def read_tractor(filename, header=False, columns=None, rows=None):
     """Read a tractor catalogue or sweeps file.
 
     Parameters
@@ -142,6 +144,8 @@ def read_tractor(filename, header=False, columns=None):
         Specify the desired Tractor catalog columns to read; defaults to
         desitarget.io.tsdatamodel.dtype.names + most of the columns in
         desitarget.gaiamatch.gaiadatamodel.dtype.names.
+    rows : :class:`list`, optional, defaults to ``None``
+        Only read these rows from the file (read all rows if ``None``).
 
     Returns
     -------
@@ -153,9 +157,10 @@ def read_tractor(filename, header=False, columns=None):
     # ADM read in the file information. Due to fitsio header bugs
     # ADM near v1.0.0, make absolutely sure the user wants the header.
     if header:
-        indata, hdr = fitsio.read(filename, upper=True, header=True, columns=columns)
+        indata, hdr = fitsio.read(filename, upper=True, header=True,
+                                  columns=columns, rows=rows)
     else:
-        indata = fitsio.read(filename, upper=True, columns=columns)
+        indata = fitsio.read(filename, upper=True, columns=columns, rows=rows)
 
     # ADM the full data model including Gaia columns.
     from desitarget.gaiamatch import gaiadatamodel
@@ -350,7 +355,8 @@ def _bright_or_dark(filename, hdr, data, obscon, mockdata=None):
 def write_targets(filename, data, indir=None, indir2=None, nchunks=None,
                   qso_selection=None, sandboxcuts=False, nside=None,
                   survey="?", nsidefile=None, hpxlist=None, scndout=None,
-                  resolve=True, maskbits=True, obscon=None, mockdata=None):
+                  resolve=True, maskbits=True, obscon=None, mockdata=None,
+                  hpxsplit=None, numthreads=8):
     """Write target catalogues.
 
     Parameters
@@ -394,13 +400,21 @@ def write_targets(filename, data, indir=None, indir2=None, nchunks=None,
     mockdata : :class:`dict`, optional, defaults to `None`
         Dictionary of mock data to write out (only used in
         `desitarget.mock.build.targets_truth` via `select_mock_targets`).
+    hpxsplit : :class:`int`, optional, defaults to `None`
+        If passed, write a file for each (NESTED) HEALPixel at nside
+        `hpxsplit` rather than one file, see :func:`write_hp_split()`.
+        The per-file HEALPixel information replaces `nsidefile` and
+        `hpxlist` in the file headers.
+    numthreads : :class:`int`, optional, defaults to 8
+        The number of files to write at once if `hpxsplit` is passed.
 
     Returns
     -------
     :class:`int`
         The number of targets that were written to file.
     :class:`str`
-        The name of the file to which targets were written.
+        The name of the file to which targets were written (or the
+        directory of files if `hpxsplit` was passed).
 
     """
     # ADM create header.
@@ -449,8 +463,7 @@ def write_targets(filename, data, indir=None, indir2=None, nchunks=None,
 
     # ADM populate SUBPRIORITY with a reproducible random float.
     if "SUBPRIORITY" in data.dtype.names and mockdata is None:
-        np.random.seed(616)
-        data["SUBPRIORITY"] = np.random.random(ntargs)
+        data["SUBPRIORITY"] = subpriority_from_targetid(data["TARGETID"])
 
     # ADM add the type of survey (main, commissioning; or "cmx", sv) to the header.
     hdr["SURVEY"] = survey
@@ -476,12 +489,16 @@ def write_targets(filename, data, indir=None, indir2=None, nchunks=None,
         _check_hpx_length(hpxlist, warning=True)
         hdr['FILEHPX'] = hpxlist
 
-    # ADM write in a series of chunks to save memory.
-    if nchunks is None:
-        fitsio.write(filename+'.tmp', data, extname='TARGETS', header=hdr, clobber=True)
-        os.rename(filename+'.tmp', filename)
+    # ADM write a file per HEALPixel...
+    if hpxsplit is not None:
+        outname = write_hp_split(filename, data, hpxsplit, extname='TARGETS',
+                                 header=hdr, numthreads=numthreads)
+    # ADM ...or write one file in a series of chunks to save memory.
     else:
-        write_in_chunks(filename, data, nchunks, extname='TARGETS', header=hdr)
+        outname = filename
+        write_fits_table(filename+'.tmp', data, extname='TARGETS',
+                         header=hdr, nchunks=nchunks)
+        os.rename(filename+'.tmp', filename)
 
     # Optionally wite out mock catalog data.
     if mockdata is not None:
@@ -510,7 +527,7 @@ def write_targets(filename, data, indir=None, indir2=None, nchunks=None,
 
         os.rename(truthfile+'.tmp', truthfile)
 
-    return ntargs, filename
+    return ntargs, outname
 
 
 def write_in_chunks(filename, data, nchunks, extname=None, header=None):
@@ -534,34 +551,385 @@ def write_in_chunks(filename, data, nchunks, extname=None, header=None):
     Notes
     -----
         - Always OVERWRITES existing files!
+        - A wrapper on :func:`write_fits_table()`.
     """
-    # ADM ensure that files are always overwritten.
-    if os.path.isfile(filename):
-        os.remove(filename)
-    start = time()
-    # ADM open a file for writing.
-    outy = FITS(filename, 'rw')
-    # ADM write the chunks one-by-one.
-    chunk = len(data)//nchunks
-    for i in range(nchunks):
-        log.info("Writing chunk {}/{} from index {} to {}...t = {:.1f}s"
-                 .format(i+1, nchunks, i*chunk, (i+1)*chunk-1, time()-start))
-        datachunk = data[i*chunk:(i+1)*chunk]
-        # ADM if this is the first chunk, write the data and header...
-        if i == 0:
-            outy.write(datachunk, extname='TARGETS', header=header, clobber=True)
-        # ADM ...otherwise just append to the existing file object.
-        else:
-            outy[-1].append(datachunk)
-    # ADM append any remaining data.
-    datachunk = data[nchunks*chunk:]
-    log.info("Writing final partial chunk from index {} to {}...t = {:.1f}s"
-             .format(nchunks*chunk, len(data)-1, time()-start))
-    outy[-1].append(datachunk)
-    outy.close()
+    write_fits_table(filename, data, extname=extname, header=header,
+                     nchunks=nchunks)
+
     return
 
 
+def _fits_row_dtype(dtype):
+    """The layout of the rows of a FITS binary table on disk.
+
+    Parameters
+    ----------
+    dtype : :class:`~numpy.dtype`
+        The dtype of a structured array that is written to a FITS table.
+
+    Returns
+    -------
+    :class:`~numpy.dtype`
+        The dtype of the bytes in each row of the FITS table, or ``None``
+        if not all of the columns are stored as their raw (big-endian)
+        bytes (e.g. booleans, or unsigned integers, which are offset).
+    """
+    descr = []
+    for name in dtype.names:
+        dt, shape = dtype[name].base, dtype[name].shape
+        if dt.kind == 'U':
+            dt = np.dtype('S{}'.format(dt.itemsize//4))
+        elif (dt.kind == 'i' and dt.itemsize > 1) or dt.kind == 'f':
+            dt = dt.newbyteorder('>')
+        elif not (dt.kind == 'S' or dt == np.dtype('u1')):
+            return None
+        descr.append((name, dt, shape))
+
+    return np.dtype(descr)
+
+
+def create_fits_table(filename, dtype, nrows, extname=None, header=None):
+    """Create a FITS file with an (empty) binary table of a fixed length.
+
+    Parameters
+    ----------
+    filename : :class:`str`
+        The output file, which is OVERWRITTEN if it exists.
+    dtype : :class:`~numpy.dtype`
+        The dtype of the structured array that will be written.
+    nrows : :class:`int`
+        The number of rows in the table.
+    extname : :class:`str`, optional, defaults to ``None``
+        Extension name of the table.
+    header : :class:`dict` or `FITSHDR`, optional
+        Header for the table extension.
+
+    Returns
+    -------
+    :class:`int`
+        The offset in bytes of the first row of the table in `filename`,
+        or ``None`` if rows can only be written via `fitsio`.
+
+    Notes
+    -----
+        - Rows are filled in with :func:`write_fits_rows()`. When an
+          offset is returned, different processes can write disjoint sets
+          of rows to `filename` at the same time.
+    """
+    rowdtype = _fits_row_dtype(dtype)
+    if rowdtype is not None:
+        dtype = rowdtype
+
+    fx = FITS(filename, 'rw', clobber=True)
+    fx.create_table_hdu(dtype=dtype, extname=extname)
+    if header is not None:
+        fx[-1].write_keys(header)
+    # ADM writing the last row sets the length of the table.
+    if nrows > 0:
+        fx[-1].write(np.zeros(1, dtype=dtype), firstrow=nrows-1)
+    offsets = fx[-1].get_offsets()
+    naxis1 = fx[-1].read_header()["NAXIS1"]
+    fx.close()
+
+    # ADM only return an offset if the rows are laid out as expected.
+    if rowdtype is None or naxis1 != rowdtype.itemsize:
+        return None
+    # ADM older versions of fitsio return the offsets as a tuple.
+    if isinstance(offsets, dict):
+        return offsets['data_start']
+    return offsets[1]
+
+
+def write_fits_rows(filename, data, firstrow, offset=None):
+    """Write rows into the binary table made by :func:`create_fits_table()`.
+
+    Parameters
+    ----------
+    filename : :class:`str`
+        A file created by :func:`create_fits_table()`.
+    data : :class:`~numpy.ndarray`
+        The rows to write, with the dtype used to create `filename`.
+    firstrow : :class:`int`
+        The (0-indexed) row of the table at which to start writing.
+    offset : :class:`int`, optional, defaults to ``None``
+        The offset returned by :func:`create_fits_table()`. If ``None``,
+        write using `fitsio` (which is NOT safe to run in parallel).
+
+    Returns
+    -------
+    :class:`int`
+        The number of rows written.
+    """
+    if offset is None:
+        with FITS(filename, 'rw') as fx:
+            fx[1].write(data, firstrow=firstrow)
+    else:
+        # ADM convert to the FITS (big-endian) layout and write the bytes.
+        rows = data.astype(_fits_row_dtype(data.dtype), copy=False)
+        with open(filename, 'r+b') as f:
+            f.seek(offset + firstrow*rows.dtype.itemsize)
+            rows.tofile(f)
+
+    return len(data)
+
+
+def write_fits_table(filename, data, extname=None, header=None,
+                     nchunks=None, numproc=1):
+    """Write a FITS binary table by filling in a preallocated file.
+
+    Parameters
+    ----------
+    filename : :class:`str`
+        The output file, which is OVERWRITTEN if it exists.
+    data : :class:`~numpy.ndarray`
+        The numpy structured array of data to write.
+    extname : :class:`str`, optional, defaults to ``None``
+        Extension name of the table.
+    header : :class:`dict` or `FITSHDR`, optional
+        Header for the table extension.
+    nchunks : :class:`int`, optional, defaults to ``None``
+        The number of chunks in which to write the table. Each chunk is
+        converted to the FITS layout separately, which limits the extra
+        memory needed. Defaults to `numproc` chunks.
+    numproc : :class:`int`, optional, defaults to 1
+        The number of processes that write chunks at the same time.
+
+    Returns
+    -------
+    :class:`int`
+        The number of rows written.
+    """
+    start = time()
+    nrows = len(data)
+    offset = create_fits_table(filename, data.dtype, nrows,
+                               extname=extname, header=header)
+    # ADM columns that fitsio has to convert must be written serially.
+    if offset is None:
+        numproc = 1
+    if nchunks is None:
+        nchunks = numproc
+    edges = np.linspace(0, nrows, max(nchunks, 1)+1).astype('int64')
+
+    def _write_chunk(i):
+        """write the rows in chunk i"""
+        if nchunks > 1:
+            log.info("Writing chunk {}/{} from index {} to {}...t = {:.1f}s"
+                     .format(i+1, nchunks, edges[i], edges[i+1]-1, time()-start))
+        return write_fits_rows(filename, data[edges[i]:edges[i+1]],
+                               edges[i], offset=offset)
+
+    if numproc > 1:
+        pool = sharedmem.MapReduce(np=numproc)
+        with pool:
+            nwrit = pool.map(_write_chunk, np.arange(len(edges)-1))
+    else:
+        nwrit = [_write_chunk(i) for i in range(len(edges)-1)]
+
+    return np.sum(nwrit, dtype='int64')
+
+
+def gather_fits(infiles, outfile, extname=None, header=None,
+                numproc=1, chunksize=1000000):
+    """Concatenate the tables in a set of FITS files into one file.
+
+    Parameters
+    ----------
+    infiles : :class:`list`
+        The input files. The table in the first extension of each file
+        is gathered, and all of these tables must have the same columns.
+    outfile : :class:`str`
+        The output file, which is OVERWRITTEN if it exists.
+    extname : :class:`str`, optional, defaults to ``None``
+        Extension name of the output table.
+    header : :class:`dict` or `FITSHDR`, optional
+        Header for the output table. Defaults to the header of the first
+        extension of the first file in `infiles`.
+    numproc : :class:`int`, optional, defaults to 1
+        The number of processes that copy input files at the same time.
+    chunksize : :class:`int`, optional, defaults to 1000000
+        The maximum number of rows to read into memory at once.
+
+    Returns
+    -------
+    :class:`int`
+        The number of rows written to `outfile`.
+
+    Notes
+    -----
+        - The size of the output is calculated from the input file
+          headers and `outfile` is created at that size, so each input
+          file can be copied to its rows of `outfile` independently.
+    """
+    start = time()
+    # ADM the row counts and columns from the headers.
+    nrows, dtype = [], None
+    for fn in infiles:
+        with FITS(fn) as fx:
+            nrows.append(fx[1].get_nrows())
+            if dtype is None:
+                dtype = fx[1].get_rec_dtype()[0]
+                if header is None:
+                    header = fx[1].read_header()
+            elif fx[1].get_rec_dtype()[0] != dtype:
+                msg = "columns in {} differ from those in {}".format(
+                    fn, infiles[0])
+                log.critical(msg)
+                raise ValueError(msg)
+    nrows = np.array(nrows, dtype='int64')
+    firstrows = np.cumsum(nrows) - nrows
+    log.info("Gathering {} rows from {} files...t = {:.1f}s"
+             .format(np.sum(nrows), len(infiles), time()-start))
+
+    offset = create_fits_table(outfile, dtype, np.sum(nrows),
+                               extname=extname, header=header)
+    # ADM columns that fitsio has to convert must be written serially.
+    if offset is None:
+        numproc = 1
+
+    def _copy_file(i):
+        """copy file i to its rows in outfile, in chunks"""
+        log.info('Working on file {}...t = {:.1f}s'
+                 .format(infiles[i], time()-start))
+        with FITS(infiles[i]) as fx:
+            for row in range(0, nrows[i], chunksize):
+                data = fx[1][row:min(row+chunksize, nrows[i])]
+                write_fits_rows(outfile, data, firstrows[i]+row, offset=offset)
+        return nrows[i]
+
+    if numproc > 1:
+        pool = sharedmem.MapReduce(np=numproc)
+        with pool:
+            nwrit = pool.map(_copy_file, np.arange(len(infiles)), costs=nrows)
+    else:
+        nwrit = [_copy_file(i) for i in range(len(infiles))]
+
+    return np.sum(nwrit, dtype='int64')
+
+
+def write_hp_split(filename, data, nside, extname=None, header=None,
+                   numthreads=8):
+    """Write a file for each (NESTED) HEALPixel that contains data.
+
+    Parameters
+    ----------
+    filename : :class:`str`
+        Template for the output file names. The files are written to a
+        directory named for `filename` with ".fits" replaced by "-hp",
+        and the file for HEALPixel `pix` is the basename of `filename`
+        with ".fits" replaced by "-hp-`pix`.fits".
+    data : :class:`~numpy.ndarray`
+        Structured array to write. Must include the columns "RA", "DEC".
+    nside : :class:`int`
+        The (NESTED) HEALPixel nside at which to split `data`.
+    extname : :class:`str`, optional, defaults to ``None``
+        Extension name of the table in each file.
+    header : :class:`FITSHDR`, optional
+        Header for each file, to which the pixel information is added.
+    numthreads : :class:`int`, optional, defaults to 8
+        The number of files to write at the same time.
+
+    Returns
+    -------
+    :class:`str`
+        The directory of the output files, which can be passed as
+        `hpdirname` to, e.g., :func:`read_targets_in_hp()`.
+
+    Notes
+    -----
+        - `data` is sorted by HEALPixel once, and each file is written
+          from a slice of the sorted data.
+        - Each file header records its pixel (as "FILEHPX") and `nside`
+          (as "FILENSID"), as expected by :func:`check_hp_target_dir()`.
+        - An index of the pixels, the number of rows in each pixel and
+          the name of each file is written to `filename` with ".fits"
+          replaced by "-hp-index.txt", in the output directory.
+        - Any files from an earlier split of `filename` (e.g. at another
+          `nside`) are removed from the output directory before writing,
+          so that :func:`check_hp_target_dir()` only finds new files.
+    """
+    start = time()
+    theta, phi = np.radians(90-data["DEC"]), np.radians(data["RA"])
+    pixnum = hp.ang2pix(nside, theta, phi, nest=True)
+    srt = np.argsort(pixnum, kind='stable')
+    data, pixnum = data[srt], pixnum[srt]
+    pixels, firstrows, nrows = np.unique(pixnum, return_index=True,
+                                         return_counts=True)
+    log.info("Writing {} rows to {} files at nside={}...t = {:.1f}s"
+             .format(len(data), len(pixels), nside, time()-start))
+
+    hpdirname, root = _hp_split_dir(filename)
+    fns = [os.path.join(hpdirname, "{}-hp-{}.fits".format(root, pix))
+           for pix in pixels]
+
+    def _write_pixel(i):
+        """write the rows in HEALPixel pixels[i]"""
+        hdr = fitsio.FITSHDR(header)
+        hdr['FILENSID'] = nside
+        hdr['FILENEST'] = True
+        hdr['FILEHPX'] = int(pixels[i])
+        tmpfn = fns[i]+'.tmp'
+        write_fits_table(tmpfn, data[firstrows[i]:firstrows[i]+nrows[i]],
+                         extname=extname, header=hdr)
+        os.rename(tmpfn, fns[i])
+        return nrows[i]
+
+    pool = sharedmem.MapReduceByThread(np=numthreads)
+    with pool:
+        pool.map(_write_pixel, np.arange(len(pixels)), costs=nrows,
+                 chunksize=16)
+
+    _write_hp_index(hpdirname, root, nside, pixels, nrows, fns)
+    log.info("Done...t = {:.1f}s".format(time()-start))
+
+    return hpdirname
+
+
+def _hp_split_dir(filename):
+    """Prepare the directory for a file per HEALPixel, see write_hp_split().
+
+    Parameters
+    ----------
+    filename : :class:`str`
+        Template for the output file names, as for write_hp_split().
+
+    Returns
+    -------
+    :class:`str`
+        The (existing) directory for the files, `filename` with ".fits"
+        replaced by "-hp".
+    :class:`str`
+        The root for the file names, the basename of `filename` without
+        ".fits". Files are named `root`-hp-`pix`.fits.
+
+    Notes
+    -----
+        - Any files from an earlier split of `filename` are removed.
+    """
+    # ADM write to a dedicated directory, so that no other files (e.g.
+    # ADM an unsplit version of filename) are read as part of the split.
+    root = os.path.basename(filename).replace(".fits", "")
+    hpdirname = os.path.join(os.path.dirname(os.path.abspath(filename)),
+                             root+"-hp")
+    os.makedirs(hpdirname, exist_ok=True)
+    # ADM remove stale files from an earlier split of filename.
+    stale = glob(os.path.join(hpdirname, "{}-hp-*.fits".format(root)))
+    if len(stale) > 0:
+        log.info("Removing {} files from an earlier split in {}"
+                 .format(len(stale), hpdirname))
+        for fn in stale:
+            os.remove(fn)
+
+    return hpdirname, root
+
+
+def _write_hp_index(hpdirname, root, nside, pixels, nrows, fns):
+    """Write the index of pixels, rows and files for write_hp_split()"""
+    with open(os.path.join(hpdirname, root+"-hp-index.txt"), 'w') as f:
+        f.write("# HPXPIXEL NROWS FILENAME (FILENSID={})\n".format(nside))
+        for pix, nrow, fn in zip(pixels, nrows, fns):
+            f.write("{} {} {}\n".format(pix, nrow, os.path.basename(fn)))
+
+
 def write_secondary(filename, data, primhdr=None, scxdir=None, obscon=None):
     """Write a catalogue of secondary targets.
 
@@ -631,9 +999,7 @@ def write_secondary(filename, data, primhdr=None, scxdir=None, obscon=None):
 
     # ADM populate SUBPRIORITY with a reproducible random float.
     if "SUBPRIORITY" in data.dtype.names:
-        ntargs = len(data)
-        np.random.seed(616)
-        data["SUBPRIORITY"] = np.random.random(ntargs)
+        data["SUBPRIORITY"] = subpriority_from_targetid(data["TARGETID"])
 
     # ADM remove the SCND_TARGET_INIT and SCND_ORDER columns.
     scnd_target_init, scnd_order = data["SCND_TARGET_INIT"], data["SCND_ORDER"]
@@ -676,7 +1042,7 @@ def write_secondary(filename, data, primhdr=None, scxdir=None, obscon=None):
 
 def write_skies(filename, data, indir=None, indir2=None, supp=False,
                 apertures_arcsec=None, nskiespersqdeg=None, nside=None,
-                nsidefile=None, hpxlist=None, extra=None):
+                nsidefile=None, hpxlist=None, extra=None, hpxsplit=None):
     """Write a target catalogue of sky locations.
 
     Parameters
@@ -712,6 +1078,17 @@ def write_skies(filename, data, indir=None, indir2=None, supp=False,
     extra : :class:`dict`, optional
         If passed (and not None), write these extra dictionary keys and
         values to the output header.
+    hpxsplit : :class:`int`, optional, defaults to `None`
+        If passed, write a file for each (NESTED) HEALPixel at nside
+        `hpxsplit` rather than one file, see :func:`write_hp_split()`.
+        The per-file HEALPixel information replaces `nsidefile` and
+        `hpxlist` in the file headers.
+
+    Returns
+    -------
+    :class:`str`
+        The name of the file to which skies were written (or the
+        directory of files if `hpxsplit` was passed).
     """
     nskies = len(data)
 
@@ -752,11 +1129,9 @@ def write_skies(filename, data, indir=None, indir2=None, supp=False,
     # ADM populate SUBPRIORITY with a reproducible random float.
     if "SUBPRIORITY" in data.dtype.names:
         # ADM ensure different SUBPRIORITIES for supp/standard files.
-        if supp:
-            np.random.seed(626)
-        else:
-            np.random.seed(616)
-        data["SUBPRIORITY"] = np.random.random(nskies)
+        seed = 626 if supp else 616
+        data["SUBPRIORITY"] = subpriority_from_targetid(data["TARGETID"],
+                                                        seed=seed)
 
     # ADM add the extra dictionary to the header.
     if extra is not None:
@@ -777,12 +1152,19 @@ def write_skies(filename, data, indir=None, indir2=None, supp=False,
         _check_hpx_length(hpxlist, warning=True)
         hdr['FILEHPX'] = hpxlist
 
-    fitsio.write(filename+'.tmp', data, extname='SKY_TARGETS', header=hdr, clobber=True)
-    os.rename(filename+'.tmp', filename)
+    if hpxsplit is not None:
+        outname = write_hp_split(filename, data, hpxsplit,
+                                 extname='SKY_TARGETS', header=hdr)
+    else:
+        outname = filename
+        fitsio.write(filename+'.tmp', data, extname='SKY_TARGETS', header=hdr, clobber=True)
+        os.rename(filename+'.tmp', filename)
+
+    return outname
 
 
 def write_gfas(filename, data, indir=None, indir2=None, nside=None,
-               nsidefile=None, hpxlist=None, extra=None):
+               nsidefile=None, hpxlist=None, extra=None, hpxsplit=None):
     """Write a catalogue of Guide/Focus/Alignment targets.
 
     Parameters
@@ -808,6 +1190,17 @@ def write_gfas(filename, data, indir=None, indir2=None, nside=None,
     extra : :class:`dict`, optional
         If passed (and not None), write these extra dictionary keys and
         values to the output header.
+    hpxsplit : :class:`int`, optional, defaults to `None`
+        If passed, write a file for each (NESTED) HEALPixel at nside
+        `hpxsplit` rather than one file, see :func:`write_hp_split()`.
+        The per-file HEALPixel information replaces `nsidefile` and
+        `hpxlist` in the file headers.
+
+    Returns
+    -------
+    :class:`str`
+        The name of the file to which GFAs were written (or the
+        directory of files if `hpxsplit` was passed).
     """
     # ADM rename 'TYPE' to 'MORPHTYPE'.
     data = rfn.rename_fields(data, {'TYPE': 'MORPHTYPE'})
@@ -854,11 +1247,19 @@ def write_gfas(filename, data, indir=None, indir2=None, nside=None,
         _check_hpx_length(hpxlist, warning=True)
         hdr['FILEHPX'] = hpxlist
 
-    fitsio.write(filename, data, extname='GFA_TARGETS', header=hdr, clobber=True)
+    if hpxsplit is not None:
+        outname = write_hp_split(filename, data, hpxsplit,
+                                 extname='GFA_TARGETS', header=hdr)
+    else:
+        outname = filename
+        fitsio.write(filename, data, extname='GFA_TARGETS', header=hdr, clobber=True)
+
+    return outname
 
 
 def write_randoms(filename, data, indir=None, hdr=None, nside=None, supp=False,
-                  density=None, resolve=True, aprad=None, extra=None):
+                  density=None, resolve=True, aprad=None, extra=None,
+                  hpxsplit=None):
     """Write a catalogue of randoms and associated pixel-level info.
 
     Parameters
@@ -889,6 +1290,15 @@ def write_randoms(filename, data, indir=None, hdr=None, nside=None, supp=False,
     extra : :class:`dict`, optional
         If passed (and not None), write these extra dictionary keys and
         values to the output header.
+    hpxsplit : :class:`int`, optional, defaults to `None`
+        If passed, write a file for each (NESTED) HEALPixel at nside
+        `hpxsplit` rather than one file, see :func:`write_hp_split()`.
+
+    Returns
+    -------
+    :class:`str`
+        The name of the file to which randoms were written (or the
+        directory of files if `hpxsplit` was passed).
     """
     # ADM create header to include versions, etc. If a `hdr` was
     # ADM passed, then use it, if not then create a new header.
@@ -930,7 +1340,293 @@ def write_randoms(filename, data, indir=None, hdr=None, nside=None, supp=False,
     # ADM add whether or not the randoms were resolved to the header.
     hdr["RESOLVE"] = resolve
 
-    fitsio.write(filename, data, extname='RANDOMS', header=hdr, clobber=True)
+    if hpxsplit is not None:
+        outname = write_hp_split(filename, data, hpxsplit, extname='RANDOMS',
+                                 header=hdr)
+    else:
+        outname = filename
+        fitsio.write(filename, data, extname='RANDOMS', header=hdr, clobber=True)
+
+    return outname
+
+
+def write_failures(filename, failures):
+    """Write a manifest of inputs that were skipped after failing.
+
+    Parameters
+    ----------
+    filename : :class:`str`
+        Output file name, e.g. `dest-failures.txt` for output `dest.fits`.
+    failures : :class:`list`
+        A list of dictionaries with (at least) the keys 'item',
+        'attempts' and 'error', as in the `failures` attribute of
+        :class:`~desitarget.internal.sharedmem.MapReduce`.
+
+    Returns
+    -------
+    Nothing, but writes a line for each skipped input to `filename`
+    (the input, the number of attempts and the last error). The file
+    is written even if there are no `failures`, so that an existing
+    manifest from an earlier run is never mistaken for this run's.
+    """
+    dirname = os.path.dirname(filename)
+    if dirname != '':
+        os.makedirs(dirname, exist_ok=True)
+    tmpfn = '{}.tmp{}'.format(filename, os.getpid())
+    with open(tmpfn, 'w') as f:
+        f.write('# {} input(s) skipped after failing\n'.format(len(failures)))
+        f.write('# input attempts error\n')
+        for fail in failures:
+            # ADM keep each error on a single line.
+            error = ' '.join(str(fail["error"]).split())
+            f.write('{} {} {}\n'.format(fail["item"], fail["attempts"], error))
+    os.replace(tmpfn, filename)
+
+    if len(failures) > 0:
+        log.warning('{} input(s) skipped: output is INCOMPLETE, see {}'
+                    .format(len(failures), filename))
+
+
+def brick_shard_filename(checkdir, brickname):
+    """Name of the checkpoint file (shard) for a single brick.
+
+    Parameters
+    ----------
+    checkdir : :class:`str`
+        Root directory of a brick-level checkpoint store.
+    brickname : :class:`str`
+        Name of a Legacy Surveys brick, e.g., '1351p320'.
+
+    Returns
+    -------
+    :class:`str`
+        The file name, in the form `checkdir/%(brick).3s/%(brick)s.npy`.
+    """
+    return os.path.join(checkdir, brickname[:3], '{}.npy'.format(brickname))
+
+
+def write_brick_shard(checkdir, brickname, data):
+    """Write the output for a single brick to a checkpoint store.
+
+    Parameters
+    ----------
+    checkdir : :class:`str`
+        Root directory of a brick-level checkpoint store.
+    brickname : :class:`str`
+        Name of the brick that was processed.
+    data : :class:`~numpy.ndarray`
+        Output for the brick. If ``None``, or empty, no shard is written.
+
+    Returns
+    -------
+    :class:`int`
+        The number of rows written.
+
+    Notes
+    -----
+        - Shards are written in :func:`numpy.save` format, which is fast
+          and preserves the exact dtype of `data`.
+        - Shards are written to a temporary file and then renamed, so an
+          interrupted write never leaves a partial shard.
+        - Safe to call from a parallel worker. Completion is only recorded
+          by :func:`update_brick_manifest()`, once the shard is written.
+        - The first time any `data` are passed, an empty array of the same
+          dtype is also written to `checkdir/dtype.npy`, so that a store
+          in which every brick is empty can still be gathered.
+    """
+    if data is None:
+        return 0
+
+    # ADM record the dtype the first time that any data are passed.
+    fn = os.path.join(checkdir, 'dtype.npy')
+    if not os.path.exists(fn):
+        _save_npy(fn, data[:0])
+
+    if len(data) == 0:
+        return 0
+
+    _save_npy(brick_shard_filename(checkdir, brickname), data)
+
+    return len(data)
+
+
+def _save_npy(fn, data):
+    """Write `data` to `fn` via a temporary file, so writes are atomic."""
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    tmpfn = '{}.tmp{}'.format(fn, os.getpid())
+    with open(tmpfn, 'wb') as f:
+        np.save(f, data)
+    os.replace(tmpfn, fn)
+
+
+def update_brick_manifest(checkdir, brickname, nrows):
+    """Record that a brick has been completed in a checkpoint store.
+
+    Parameters
+    ----------
+    checkdir : :class:`str`
+        Root directory of a brick-level checkpoint store.
+    brickname : :class:`str`
+        Name of the brick that was completed.
+    nrows : :class:`int`
+        Number of rows in the shard for the brick (can be zero).
+    """
+    os.makedirs(checkdir, exist_ok=True)
+    with open(os.path.join(checkdir, 'manifest.txt'), 'a') as f:
+        f.write('{} {}\n'.format(brickname, nrows))
+
+
+def check_brick_params(checkdir, **params):
+    """Record, or check, the parameters of a run in a checkpoint store.
+
+    Parameters
+    ----------
+    checkdir : :class:`str`
+        Root directory of a brick-level checkpoint store.
+    **params
+        The parameters that determine the output for each brick, e.g.
+        `density=10000, aprad=0.75`.
+
+    Returns
+    -------
+    Nothing, but writes `params` to `checkdir/params.json` if the store
+    doesn't yet contain any parameters.
+
+    Raises
+    ------
+    :class:`ValueError`
+        If the store was created with different `params`, as resuming
+        would then mix bricks from two different runs.
+    """
+    # ADM a round-trip through json means lists and tuples, numpy
+    # ADM types, etc. are compared in a consistent way.
+    params = json.loads(json.dumps(params, sort_keys=True,
+                                   default=lambda x: x.tolist()))
+    fn = os.path.join(checkdir, 'params.json')
+    if os.path.exists(fn):
+        with open(fn) as f:
+            stored = json.load(f)
+        diff = sorted(key for key in set(stored) | set(params)
+                      if stored.get(key) != params.get(key))
+        if len(diff) > 0:
+            msg = ('checkpoint store {} was made with different parameters: {}'
+                   .format(checkdir, ', '.join('{}={} (not {})'.format(
+                       key, stored.get(key), params.get(key)) for key in diff)))
+            log.critical(msg)
+            raise ValueError(msg)
+    else:
+        os.makedirs(checkdir, exist_ok=True)
+        tmpfn = '{}.tmp{}'.format(fn, os.getpid())
+        with open(tmpfn, 'w') as f:
+            json.dump(params, f, sort_keys=True)
+        os.replace(tmpfn, fn)
+
+
+def read_brick_manifest(checkdir):
+    """The bricks that have been completed in a checkpoint store.
+
+    Parameters
+    ----------
+    checkdir : :class:`str`
+        Root directory of a brick-level checkpoint store.
+
+    Returns
+    -------
+    :class:`dict`
+        Keys are the names of completed bricks and values are the number
+        of rows in the shard for each brick. Empty if `checkdir`
+        doesn't yet contain a manifest.
+
+    Notes
+    -----
+        - Incomplete lines (e.g. from a run that was killed mid-write)
+          are ignored, so those bricks are processed again.
+    """
+    done = {}
+    fn = os.path.join(checkdir, 'manifest.txt')
+    if os.path.exists(fn):
+        with open(fn) as f:
+            for line in f:
+                words = line.split()
+                if len(words) == 2 and words[1].isdigit():
+                    done[words[0]] = int(words[1])
+
+    return done
+
+
+def gather_brick_shards(checkdir, bricknames=None, outfile=None,
+                        extname=None, header=None):
+    """Assemble the shards in a brick-level checkpoint store.
+
+    Parameters
+    ----------
+    checkdir : :class:`str`
+        Root directory of a brick-level checkpoint store.
+    bricknames : :class:`list` or `~numpy.ndarray`, optional
+        Gather only these bricks. Defaults to all completed bricks.
+    outfile : :class:`str`, optional, defaults to ``None``
+        If passed, stream the shards, one at a time, to this file rather
+        than returning them in memory.
+    extname : :class:`str`, optional, defaults to ``None``
+        Extension name for `outfile`.
+    header : :class:`dict` or `FITSHDR`, optional
+        Header for the data extension of `outfile`.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray` or `int`
+        The concatenated shards, or, if `outfile` was passed, the number
+        of rows that were written to `outfile`. If there are no rows to
+        gather, an empty array (or `outfile`) of the dtype of the shards.
+
+    Notes
+    -----
+        - Bricks that are not in the manifest are not gathered, with a
+          warning, as their shards could be incomplete.
+        - The output (array or `outfile`) is allocated once, from the row
+          counts in the manifest, and then filled shard-by-shard.
+    """
+    done = read_brick_manifest(checkdir)
+    if bricknames is None:
+        bricknames = sorted(done)
+    missing = [bn for bn in bricknames if bn not in done]
+    if len(missing) > 0:
+        log.warning('{} bricks are not complete in {}, e.g. {}'
+                    .format(len(missing), checkdir, missing[0]))
+    bricknames = [bn for bn in bricknames if done.get(bn, 0) > 0]
+    nrows = np.sum([done[bn] for bn in bricknames], dtype='i8')
+
+    out, offset = None, None
+    if nrows == 0:
+        fn = os.path.join(checkdir, 'dtype.npy')
+        if os.path.exists(fn):
+            out = np.load(fn)
+        else:
+            log.warning('no shards have been written to {}'.format(checkdir))
+            out = np.zeros(0)
+        if outfile is not None:
+            create_fits_table(outfile, out.dtype, 0, extname=extname, header=header)
+            return 0
+        return out
+
+    i = 0
+    for bn in bricknames:
+        data = np.load(brick_shard_filename(checkdir, bn))
+        if outfile is not None:
+            if i == 0:
+                offset = create_fits_table(outfile, data.dtype, nrows,
+                                           extname=extname, header=header)
+            write_fits_rows(outfile, data, i, offset=offset)
+        else:
+            if out is None:
+                out = np.empty(nrows, dtype=data.dtype)
+            out[i:i+len(data)] = data
+        i += len(data)
+
+    if outfile is not None:
+        return i
+
+    return out
 
 
 def iter_files(root, prefix, ext='fits'):
@@ -14,13 +14,15 @@ from astropy.wcs import WCS
 from time import time
 import healpy as hp
 import fitsio
-import photutils
 from glob import glob
 from desitarget.gaiamatch import _get_gaia_dir
 from desitarget.geomask import bundle_bricks, box_area
 from desitarget.targets import resolve, main_cmx_or_sv
-from desitarget.skyfibers import get_brick_info
+from desitarget.skyfibers import get_brick_info, aperture_photometry
 from desitarget.io import read_targets_in_box, target_columns_from_header
+from desitarget.io import read_brick_manifest, update_brick_manifest
+from desitarget.io import check_brick_params
+from desitarget.io import write_brick_shard, gather_brick_shards
 
 # ADM the parallelization script
 from desitarget.internal import sharedmem
@@ -66,6 +68,16 @@ def dr_extension(drdir):
     return 'fz', 1
 
 
+def _coadd_filename(drdir, brickname, qin, filt=None, extn='fz'):
+    """The name of a Legacy Surveys coadd file of type `qin` in band `filt`."""
+    rootdir = os.path.join(drdir, 'coadd', brickname[:3], brickname)
+    if filt is None:
+        fn = 'legacysurvey-{}-{}.fits.{}'.format(brickname, qin, extn)
+    else:
+        fn = 'legacysurvey-{}-{}-{}.fits.{}'.format(brickname, qin, filt, extn)
+    return os.path.join(rootdir, fn)
+
+
 def randoms_in_a_brick_from_edges(ramin, ramax, decmin, decmax,
                                   density=100000, poisson=True, wrap=True):
     """For brick edges, return random (RA/Dec) positions in the brick.
@@ -288,6 +300,8 @@ def quantities_at_positions_in_a_brick(ras, decs, brickname, drdir,
     Notes
     -----
         - First version copied shamelessly from Anand Raichoor.
+        - Each coadd file is opened once (e.g. the maskbits file, which
+          has three extensions), and closed before returning.
     """
     # ADM guard against too low a density of random locations.
     npts = len(ras)
@@ -302,14 +316,21 @@ def quantities_at_positions_in_a_brick(ras, decs, brickname, drdir,
     # ADM the output dictionary.
     qdict = {}
 
-    # as a speed up, we assume all images in different filters for the brick have the same WCS
-    # -> if we have read it once (iswcs=True), we use this info
-    iswcs = False
+    # ADM the coadd files for this brick, keyed by file name.
+    hdulists = {}
+
+    def _hdu(fn, hdu):
+        """open each coadd file once, return the extension `hdu`"""
+        if fn not in hdulists:
+            hdulists[fn] = fits.open(fn)
+        return hdulists[fn][hdu]
+
+    # ADM all images in different filters for the brick have the same WCS
+    # ADM so the WCS is only computed for the first file we find.
+    x, y = None, None
     # ADM this will store the instrument name the first time we touch the wcs
     instrum = None
 
-    rootdir = os.path.join(drdir, 'coadd', brickname[:3], brickname)
-    fileform = os.path.join(rootdir, 'legacysurvey-{}-{}-{}.fits.{}')
     # ADM loop through the filters and store the number of observations
     # ADM etc. at the RA and Dec positions of the passed points.
     for filt in ['g', 'r', 'z']:
@@ -319,41 +340,35 @@ def quantities_at_positions_in_a_brick(ras, decs, brickname, drdir,
                      ['nobs', 'psfdepth', 'galdepth', 'psfsize', 'apflux'],
                      ['i2', 'f4', 'f4', 'f4', 'f4'])
         for qin, qout, qform in qnames:
-            fn = fileform.format(brickname, qin, filt, extn)
+            fn = _coadd_filename(drdir, brickname, qin, filt, extn)
             # ADM only process the WCS if there's a file for this filter.
             if os.path.exists(fn):
-                img = fits.open(fn)[extn_nb]
-                if not iswcs:
+                img = _hdu(fn, extn_nb)
+                if x is None:
                     # ADM store the instrument name, if it isn't stored.
                     instrum = img.header["INSTRUME"].lower().strip()
                     w = WCS(img.header)
                     x, y = w.all_world2pix(ras, decs, 0)
-                    iswcs = True
+                img = img.data
                 # ADM get the quantity of interest at each location and
                 # ADM store in a dictionary with the filter and quantity.
                 if qout == 'apflux':
                     # ADM special treatment to photometer sky.
                     # ADM Read in the ivar image.
-                    fnivar = fileform.format(brickname, 'invvar', filt, extn)
-                    ivar = fits.open(fnivar)[extn_nb].data
-                    with np.errstate(divide='ignore', invalid='ignore'):
-                        # ADM ivars->errors, guard against 1/0.
-                        imsigma = 1./np.sqrt(ivar)
-                        imsigma[ivar == 0] = 0
+                    fnivar = _coadd_filename(drdir, brickname, 'invvar', filt, extn)
+                    ivar = _hdu(fnivar, extn_nb).data
                     # ADM aperture photometry at requested radius (aprad).
-                    apxy = np.vstack((x, y)).T
-                    aper = photutils.CircularAperture(apxy, aprad)
-                    p = photutils.aperture_photometry(img.data, aper, error=imsigma)
+                    flux, err = aperture_photometry(img, x, y, aprad, ivar=ivar)
                     # ADM store the results.
-                    qdict[qout+'_'+filt] = np.array(p.field('aperture_sum'))
-                    err = p.field('aperture_sum_err')
+                    qdict[qout+'_'+filt] = flux[:, 0]
+                    err = err[:, 0]
                     with np.errstate(divide='ignore', invalid='ignore'):
                         # ADM errors->ivars, guard against 1/0.
                         ivar = 1./err**2.
                         ivar[err == 0] = 0.
                     qdict[qout+'_ivar_'+filt] = np.array(ivar)
                 else:
-                    qdict[qout+'_'+filt] = img.data[y.astype("int"), x.astype("int")]
+                    qdict[qout+'_'+filt] = img[y.astype("int"), x.astype("int")]
             # ADM if the file doesn't exist, set quantities to zero.
             else:
                 if qout == 'apflux':
@@ -361,22 +376,20 @@ def quantities_at_positions_in_a_brick(ras, decs, brickname, drdir,
                 qdict[qout+'_'+filt] = np.zeros(npts, dtype=qform)
 
     # ADM add the MASKBITS and WISEMASK information.
-    fn = os.path.join(rootdir,
-                      'legacysurvey-{}-maskbits.fits.{}'.format(brickname, extn))
+    fn = _coadd_filename(drdir, brickname, 'maskbits', extn=extn)
     # ADM only process the WCS if there's a file for this filter.
     mnames = zip([extn_nb, extn_nb+1, extn_nb+2],
                  ['maskbits', 'wisemask_w1', 'wisemask_w2'],
                  ['>i2', '|u1', '|u1'])
     for mextn, mout, mform in mnames:
         if os.path.exists(fn):
-            img = fits.open(fn)[mextn]
+            img = _hdu(fn, mextn)
             # ADM use the WCS for the per-filter quantities if it exists.
-            if not iswcs:
+            if x is None:
                 # ADM store the instrument name, if it isn't yet stored.
                 instrum = img.header["INSTRUME"].lower().strip()
                 w = WCS(img.header)
                 x, y = w.all_world2pix(ras, decs, 0)
-                iswcs = True
             # ADM add the maskbits to the dictionary.
             qdict[mout] = img.data[y.astype("int"), x.astype("int")]
         else:
@@ -389,6 +402,8 @@ def quantities_at_positions_in_a_brick(ras, decs, brickname, drdir,
     # ADM populate the photometric system in the quantity dictionary.
     if instrum is None:
         # ADM don't count bricks where we never read a file header.
+        for hdulist in hdulists.values():
+            hdulist.close()
         return
     elif instrum == 'decam':
         qdict['photsys'] = np.array([b"S" for x in range(npts)], dtype='|S1')
@@ -398,7 +413,7 @@ def quantities_at_positions_in_a_brick(ras, decs, brickname, drdir,
 #                  .format(brickname,time()-start))
 
     # ADM calculate and add WISE depths. The WCS is different for WISE.
-    iswcs = False
+    x, y = None, None
     # ADM a dictionary of scalings from invvar to depth:
     norm = {'W1': 0.240, 'W2': 0.255}
     # ADM a dictionary of Vega-to-AB conversions:
@@ -408,15 +423,14 @@ def quantities_at_positions_in_a_brick(ras, decs, brickname, drdir,
         # ADM formats for each of the quantities of interest.
         qnames = zip(['invvar'], ['psfdepth'], ['f4'])
         for qin, qout, qform in qnames:
-            fn = fileform.format(brickname, qin, band, extn)
+            fn = _coadd_filename(drdir, brickname, qin, band, extn)
             # ADM only process the WCS if there's a file for this band.
             if os.path.exists(fn):
-                img = fits.open(fn)[extn_nb]
+                img = _hdu(fn, extn_nb)
                 # ADM calculate the WCS if it wasn't, already.
-                if not iswcs:
+                if x is None:
                     w = WCS(img.header)
                     x, y = w.all_world2pix(ras, decs, 0)
-                    iswcs = True
                 # ADM get the inverse variance at each location.
                 ivar = img.data[y.astype("int"), x.astype("int")]
                 # ADM convert to WISE depth in AB. From Dustin Lang on the
@@ -430,6 +444,9 @@ def quantities_at_positions_in_a_brick(ras, decs, brickname, drdir,
             else:
                 qdict[qout+'_'+band] = np.zeros(npts, dtype=qform)
 
+    for hdulist in hdulists.values():
+        hdulist.close()
+
     return qdict
 
 
@@ -885,7 +902,199 @@ def get_targ_dens(targets, Mx, nside=256):
     return targdens
 
 
-def pixmap(randoms, targets, rand_density, nside=256, gaialoc=None):
+def grouped_medians(groups, values):
+    """Medians of one or more quantities within each of a set of groups.
+
+    Parameters
+    ----------
+    groups : :class:`~numpy.ndarray`
+        Integer group labels (e.g. HEALPixel numbers) for each row.
+    values : :class:`~numpy.ndarray`
+        A 1-D array, or a 2-D (row, column) block, of values for each
+        row. Must have the same number of rows as `groups`.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        The unique (sorted) group labels.
+    :class:`~numpy.ndarray`
+        Array of shape (len(unique groups), number of columns) of the
+        median of each column of `values` within each group.
+
+    Notes
+    -----
+        - Identical to calling :func:`numpy.median` for each column in
+          each group, but the rows are only sorted once, and groups with
+          the same number of members are reduced together in one call.
+    """
+    values = np.asarray(values)
+    if values.ndim == 1:
+        values = values[:, None]
+
+    # ADM sort once to make each group a contiguous segment.
+    order = np.argsort(groups, kind='stable')
+    block = values[order]
+    ugroups, starts, counts = np.unique(np.asarray(groups)[order],
+                                        return_index=True, return_counts=True)
+
+    # ADM segments of equal length can be stacked into a (segment,
+    # ADM member, column) array and reduced in a single pass.
+    medians = np.empty((len(ugroups), block.shape[1]), dtype='f8')
+    for cnt in np.unique(counts):
+        ii = np.where(counts == cnt)[0]
+        inds = starts[ii][:, None] + np.arange(cnt)
+        medians[ii] = np.median(block[inds], axis=1)
+
+    return ugroups, medians
+
+
+def approx_grouped_medians(chunks, ngroups, nbins=64):
+    """Approximate per-group medians accumulated over chunks of rows.
+
+    Parameters
+    ----------
+    chunks : :class:`iterable`
+        Yields (`groups`, `values`) tuples, where `groups` are integer
+        group labels in the range [0, `ngroups`) and `values` is a 1-D
+        array or a 2-D (row, column) block of values, as for
+        :func:`grouped_medians()`. Two passes are made over `chunks`,
+        so it must be re-iterable (e.g. a list, but not a generator).
+    ngroups : :class:`int`
+        The total number of groups.
+    nbins : :class:`int`, optional, defaults to 64
+        Number of histogram bins used to track each column in each group.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        Array of shape (`ngroups`, number of columns) of the approximate
+        median of each column of `values` within each group. Groups that
+        have no members are set to NaN.
+
+    Notes
+    -----
+        - Only a histogram of (`ngroups`, `nbins`) counts per column is
+          held in memory, so inputs can be streamed from disk.
+        - The first pass finds the range of each column and a regular
+          subsample of its values, drawn from every chunk. Bin edges are
+          quantiles of that subsample, so bins are finest where values
+          are most common, and the outer edges are the global minimum
+          and maximum, so no values fall outside of the bins. The result
+          therefore doesn't depend on how the rows are ordered.
+        - The second pass histograms values in each group, and the
+          median is interpolated linearly within the bin that contains it,
+          limited to the range of values in the group (so, e.g., groups
+          with a single value are exact).
+        - NaN values are ignored.
+    """
+    if iter(chunks) is chunks:
+        msg = 'chunks must be re-iterable (e.g. a list), not an iterator!'
+        log.critical(msg)
+        raise ValueError(msg)
+
+    # ADM first pass: the range and a subsample of each column.
+    samples, stride = None, None
+    for groups, values in chunks:
+        values = np.asarray(values, dtype='f8')
+        if values.ndim == 1:
+            values = values[:, None]
+        if samples is None:
+            samples = [[] for col in values.T]
+            # ADM sample ~10 values per bin from each (full) chunk.
+            stride = max(1, len(values)//(10*nbins))
+        for col, samp in zip(values.T, samples):
+            col = col[np.isfinite(col)]
+            if len(col) > 0:
+                samp += [col[::stride], col.min(keepdims=True),
+                         col.max(keepdims=True)]
+
+    if samples is None:
+        msg = 'no chunks were passed!'
+        log.critical(msg)
+        raise ValueError(msg)
+
+    edges = []
+    for samp in samples:
+        samp = np.concatenate(samp) if len(samp) > 0 else np.zeros(1)
+        e = np.quantile(samp, np.linspace(0, 1, nbins+1))
+        e[0], e[-1] = samp.min(), samp.max()
+        e = np.unique(e)
+        # ADM a column of identical values needs one empty bin.
+        if len(e) == 1:
+            e = np.append(e, e)
+        edges.append(e)
+
+    # ADM second pass: histogram the values in each group.
+    counts = [np.zeros((ngroups, len(e)-1), dtype='i8') for e in edges]
+    gmin = np.full((ngroups, len(edges)), np.inf)
+    gmax = np.full((ngroups, len(edges)), -np.inf)
+    for groups, values in chunks:
+        values = np.asarray(values, dtype='f8')
+        if values.ndim == 1:
+            values = values[:, None]
+        for i, (col, e, cnt) in enumerate(zip(values.T, edges, counts)):
+            ok = np.isfinite(col)
+            nb = len(e) - 1
+            # ADM the clip only places the maximum in the last bin.
+            b = np.clip(np.searchsorted(e, col[ok], side='right') - 1, 0, nb-1)
+            cnt += np.bincount(groups[ok]*nb + b,
+                               minlength=ngroups*nb).reshape(ngroups, nb)
+            # ADM track the range of values in each group.
+            np.minimum.at(gmin[:, i], groups[ok], col[ok])
+            np.maximum.at(gmax[:, i], groups[ok], col[ok])
+
+    medians = np.full((ngroups, len(edges)), np.nan)
+    for i, (e, cnt) in enumerate(zip(edges, counts)):
+        cum = np.cumsum(cnt, axis=1)
+        half = cum[:, -1] / 2.
+        # ADM the bin that contains the median for each group...
+        k = np.argmax(cum >= half[:, None], axis=1)
+        below = np.where(k > 0, cum[np.arange(ngroups), k-1], 0)
+        inbin = cnt[np.arange(ngroups), k]
+        # ADM ...and linear interpolation within that bin.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac = np.where(inbin > 0, (half - below) / inbin, 0.)
+        ok = cum[:, -1] > 0
+        med = np.clip(e[k] + frac*(e[k+1] - e[k]), gmin[:, i], gmax[:, i])
+        medians[ok, i] = med[ok]
+
+    return medians
+
+
+class _SystematicsChunks(object):
+    """Re-iterable chunks of (group, systematics) for :func:`pixmap()`.
+
+    Parameters
+    ----------
+    randoms : :class:`~numpy.ndarray` or `str`
+        Catalog or file of randoms.
+    cols : :class:`list`
+        The systematics columns to read from `randoms`.
+    groups : :class:`~numpy.ndarray`
+        The group (pixel index) of each row of `randoms`.
+    chunksize : :class:`int`
+        The number of rows in each chunk.
+    """
+    def __init__(self, randoms, cols, groups, chunksize):
+        self.randoms, self.cols = randoms, cols
+        self.groups, self.chunksize = groups, chunksize
+
+    def __iter__(self):
+        nrows = len(self.groups)
+        for i in range(0, nrows, self.chunksize):
+            rows = np.arange(i, min(i+self.chunksize, nrows))
+            if isinstance(self.randoms, str):
+                chunk = fitsio.read(self.randoms, columns=self.cols, rows=rows)
+            else:
+                chunk = self.randoms[rows]
+            block = np.vstack([chunk[col] for col in self.cols]).T
+            yield self.groups[rows], block
+            log.info('{}/{} randoms processed...t = {:.1f}s'
+                     .format(rows[-1]+1, nrows, time()-start))
+
+
+def pixmap(randoms, targets, rand_density, nside=256, gaialoc=None,
+           chunksize=None, nbins=64):
     """HEALPix map of useful quantities for a Legacy Surveys Data Release
 
     Parameters
@@ -908,6 +1117,15 @@ def pixmap(randoms, targets, rand_density, nside=256, gaialoc=None):
         Name of a FITS file that already contains a column "STARDENS",
         which is simply read in. If ``None``, the stellar density is
         constructed from files in $GAIA_DIR.
+    chunksize : :class:`int`, optional, defaults to ``None``
+        If passed, calculate approximate medians of the systematics by
+        streaming through `randoms` in chunks of this many rows (see
+        :func:`approx_grouped_medians()`). If `randoms` is a file name,
+        only the columns needed for the footprint are read in full.
+        If ``None``, the medians are calculated exactly.
+    nbins : :class:`int`, optional, defaults to 64
+        Number of histogram bins per pixel used to approximate medians.
+        Only relevant if `chunksize` is passed.
 
     Returns
     -------
@@ -942,18 +1160,31 @@ def pixmap(randoms, targets, rand_density, nside=256, gaialoc=None):
     -----
         - If `gaialoc` is ``None`` then $GAIA_DIR must be set.
     """
+    # ADM the systematics for which to calculate medians.
+    cols = ['EBV', 'PSFDEPTH_W1', 'PSFDEPTH_W2',
+            'PSFDEPTH_G', 'GALDEPTH_G', 'PSFSIZE_G',
+            'PSFDEPTH_R', 'GALDEPTH_R', 'PSFSIZE_R',
+            'PSFDEPTH_Z', 'GALDEPTH_Z', 'PSFSIZE_Z']
+
     # ADM if a file name was passed for the random catalog, read it in
+    # ADM (just the footprint columns if we'll stream the systematics).
+    randfile = None
     if isinstance(randoms, str):
         log.info('Reading in random catalog...t = {:.1f}s'.format(time()-start))
-        randoms = fitsio.read(randoms)
+        if chunksize is None:
+            randoms = fitsio.read(randoms)
+        else:
+            randfile = randoms
+            randoms = fitsio.read(randfile, columns=[
+                "RA", "DEC", "NOBS_G", "NOBS_R", "NOBS_Z", "MASKBITS"])
 
     # ADM if a file name was passed for the targets catalog, read it in
     if isinstance(targets, str):
         log.info('Reading in target catalog...t = {:.1f}s'.format(time()-start))
         # ADM grab appropriate columns for an SV/cmx/main survey file.
-        targcols = target_columns_from_header(targets)
-        cols = np.concatenate([["RA", "DEC"], targcols])
-        targets = read_targets_in_box(targets, columns=cols)
+        targcols = np.concatenate([["RA", "DEC"],
+                                   target_columns_from_header(targets)])
+        targets = read_targets_in_box(targets, columns=list(targcols))
     log.info('Read targets and randoms...t = {:.1f}s'.format(time()-start))
 
     # ADM change target column names, and retrieve associated survey information.
@@ -1025,31 +1256,21 @@ def pixmap(randoms, targets, rand_density, nside=256, gaialoc=None):
     ras, decs = randoms["RA"], randoms["DEC"]
     pixnums = hp.ang2pix(nside, np.radians(90.-decs), np.radians(ras), nest=True)
 
-    # ADM some sorting to order the values to extract the medians.
-    pixorder = np.argsort(pixnums)
-    pixels, pixcnts = np.unique(pixnums, return_counts=True)
-    pixcnts = np.insert(pixcnts, 0, 0)
-    pixcnts = np.cumsum(pixcnts)
-    log.info('Done sorting...t = {:.1f}s'.format(time()-start))
-    # ADM work through the ordered pixels to populate the median for
-    # ADM each quantity of interest.
-    cols = ['EBV', 'PSFDEPTH_W1', 'PSFDEPTH_W2',
-            'PSFDEPTH_G', 'GALDEPTH_G', 'PSFSIZE_G',
-            'PSFDEPTH_R', 'GALDEPTH_R', 'PSFSIZE_R',
-            'PSFDEPTH_Z', 'GALDEPTH_Z', 'PSFSIZE_Z']
-    t0 = time()
-    npix = len(pixcnts)
-    stepper = npix//50
-    for i in range(npix-1):
-        inds = pixorder[pixcnts[i]:pixcnts[i+1]]
-        pix = pixnums[inds][0]
-        for col in cols:
-            hpxinfo[col][pix] = np.median(randoms[col][inds])
-        if i % stepper == 0 and i > 0:
-            elapsed = time() - t0
-            rate = i / elapsed
-            log.info('{}/{} pixels; {:.1f} pix/sec; {:.1f} total mins elapsed'
-                     .format(i, npix, rate, elapsed/60.))
+    if chunksize is None:
+        # ADM exact medians for every pixel and systematic in one pass.
+        block = np.vstack([randoms[col] for col in cols]).T
+        pixels, medians = grouped_medians(pixnums, block)
+        del block
+    else:
+        # ADM approximate medians, streaming the systematics in chunks.
+        pixels = np.unique(pixnums)
+        chunks = _SystematicsChunks(randoms if randfile is None else randfile,
+                                    cols, np.searchsorted(pixels, pixnums),
+                                    chunksize)
+        medians = approx_grouped_medians(chunks, len(pixels), nbins=nbins)
+
+    for i, col in enumerate(cols):
+        hpxinfo[col][pixels] = medians[:, i]
 
     log.info('Done...t = {:.1f}s'.format(time()-start))
 
@@ -1058,7 +1279,8 @@ def pixmap(randoms, targets, rand_density, nside=256, gaialoc=None):
 
 def select_randoms_bricks(brickdict, bricknames, numproc=32, drdir=None,
                           zeros=False, cnts=True,
-                          density=None, dustdir=None, aprad=None):
+                          density=None, dustdir=None, aprad=None,
+                          checkdir=None):
 
     """Parallel-process a random catalog for a set of brick names.
 
@@ -1075,6 +1297,13 @@ def select_randoms_bricks(brickdict, bricknames, numproc=32, drdir=None,
         See :func:`~desitarget.randoms.get_quantities_in_a_brick`.
     cnts : :class:`bool`, optional, defaults to ``True``
         See :func:`~desitarget.skyfibers.get_brick_info`.
+    checkdir : :class:`str`, optional, defaults to ``None``
+        If passed, write the randoms for each brick to a checkpoint
+        store in this directory as each brick completes. Bricks already
+        completed in `checkdir` are not reprocessed, so an interrupted
+        run can be resumed, or extended to new bricks. A store can only
+        be resumed with the same `drdir`, `density`, `dustdir`, `aprad`
+        and `zeros`.
 
     Returns
     -------
@@ -1086,7 +1315,21 @@ def select_randoms_bricks(brickdict, bricknames, numproc=32, drdir=None,
     -----
     - See :func:`~desitarget.randoms.select_randoms` for definitions of
       `numproc`, `density`, `dustdir`, `aprad`.
+    - See :func:`~desitarget.io.gather_brick_shards` to assemble the
+      randoms in a checkpoint store without processing any bricks.
     """
+    # ADM skip any bricks that were completed in a previous run
+    # ADM (with the same parameters).
+    allbricknames = bricknames
+    if checkdir is not None:
+        check_brick_params(checkdir, drdir=drdir, density=density,
+                           dustdir=dustdir, aprad=aprad, zeros=zeros)
+        done = read_brick_manifest(checkdir)
+        bricknames = np.array([bn for bn in bricknames if bn not in done])
+        log.info('{} of {} bricks already completed in {}'
+                 .format(len(allbricknames)-len(bricknames),
+                         len(allbricknames), checkdir))
+
     nbricks = len(bricknames)
     log.info('Run {} bricks from {} at density {:.1e} per sq. deg...t = {:.1f}s'
              .format(nbricks, drdir, density, time()-start))
@@ -1102,15 +1345,22 @@ def select_randoms_bricks(brickdict, bricknames, numproc=32, drdir=None,
 
         # ADM populate the brick with random points, and retrieve the quantities
         # ADM of interest at those points.
-        return get_quantities_in_a_brick(
+        qinfo = get_quantities_in_a_brick(
             bramin, bramax, bdecmin, bdecmax, brickname, drdir=drdir,
             density=density, dustdir=dustdir, aprad=aprad, zeros=zeros)
 
+        # ADM if checkpointing, write the brick from the worker and
+        # ADM just pass back the brick name and number of rows.
+        if checkdir is not None:
+            return [brickname, write_brick_shard(checkdir, brickname, qinfo)]
+
+        return qinfo
+
     # ADM this is just to count bricks in _update_status.
     nbrick = np.zeros((), dtype='i8')
     t0 = time()
     # ADM write a total of 25 output messages during processing.
-    interval = nbricks // 25
+    interval = np.max([nbricks // 25, 1])
 
     def _update_status(result):
         ''' wrapper function for the critical reduction operation,
@@ -1120,25 +1370,47 @@ def select_randoms_bricks(brickdict, bricknames, numproc=32, drdir=None,
             rate = nbrick / elapsed
             log.info('{}/{} bricks; {:.1f} bricks/sec; {:.1f} total mins elapsed'
                      .format(nbrick, nbricks, rate, elapsed/60.))
-            # ADM if we're going to exceed 4 hours, warn the user.
-            if nbricks/rate > 4*3600.:
+            # ADM if we're going to exceed 4 hours, warn the user (if
+            # ADM we're checkpointing, the run can always be resumed).
+            if nbricks/rate > 4*3600. and checkdir is None:
                 msg = 'May take > 4 hours to run. Run with bundlebricks instead.'
                 log.critical(msg)
                 raise IOError(msg)
 
+        # ADM record completed bricks in the checkpoint manifest.
+        if checkdir is not None:
+            update_brick_manifest(checkdir, *result)
+
         nbrick[...] += 1    # this is an in-place modification.
         return result
 
     # - Parallel process input files.
     if numproc > 1:
+        # ADM bricks that are larger (have more randoms) or that are in
+        # ADM more than one survey (and so are processed twice) take
+        # ADM longer, so use area*counts as a hint to process them first.
+        # ADM this is known from brickdict, without touching any files.
+        edges = np.array([brickdict[bn][2:6] for bn in bricknames],
+                         dtype='f8').reshape(-1, 4)
+        costs = (edges[:, 1] - edges[:, 0]) * (
+            np.sin(np.radians(edges[:, 3])) - np.sin(np.radians(edges[:, 2])))
+        if cnts:
+            costs *= np.array([brickdict[bn][6] for bn in bricknames])
         pool = sharedmem.MapReduce(np=numproc)
         with pool:
-            qinfo = pool.map(_get_quantities, bricknames, reduce=_update_status)
+            qinfo = pool.map(_get_quantities, bricknames, reduce=_update_status,
+                             costs=costs)
+        log.info('Mean (min) process utilization: {:.0%} ({:.0%})'.format(
+            np.mean(pool.stats["utilization"]), np.min(pool.stats["utilization"])))
     else:
         qinfo = list()
         for brickname in bricknames:
             qinfo.append(_update_status(_get_quantities(brickname)))
 
+    # ADM if checkpointing, assemble the randoms from the store.
+    if checkdir is not None:
+        return gather_brick_shards(checkdir, allbricknames)
+
     # ADM concatenate the randoms into a single long list and resolve
     # ADM whether they are officially in the north or the south.
     qinfo = np.concatenate(qinfo)
@@ -1190,7 +1462,8 @@ def supplement_randoms(donebns, density=10000, numproc=32, dustdir=None):
 
 def select_randoms(drdir, density=100000, numproc=32, nside=4, pixlist=None,
                    bundlebricks=None, brickspersec=2.5, extra=None,
-                   dustdir=None, resolverands=True, aprad=0.75):
+                   dustdir=None, resolverands=True, aprad=0.75,
+                   checkdir=None):
     """NOBS, DEPTHs (per-band), MASKs for random points in a Legacy Surveys DR.
 
     Parameters
@@ -1234,6 +1507,10 @@ def select_randoms(drdir, density=100000, numproc=32, nside=4, pixlist=None,
     aprad : :class:`float`, optional, defaults to 0.75
         Radii in arcsec of aperture for which to derive sky fluxes
         defaults to the DESI fiber radius.
+    checkdir : :class:`str`, optional, defaults to ``None``
+        If passed, checkpoint the randoms brick-by-brick in this directory
+        so that an interrupted run can be resumed. See
+        :func:`~desitarget.randoms.select_randoms_bricks`.
 
     Returns
     -------
@@ -1283,7 +1560,7 @@ def select_randoms(drdir, density=100000, numproc=32, nside=4, pixlist=None,
     # ADM recover the pixel-level quantities in the DR bricks.
     qinfo = select_randoms_bricks(brickdict, bricknames, numproc=numproc,
                                   drdir=drdir, density=density, dustdir=dustdir,
-                                  aprad=aprad)
+                                  aprad=aprad, checkdir=checkdir)
     # ADM remove bricks that overlap between two surveys, if requested.
     if resolverands:
         qinfo = resolve(qinfo)
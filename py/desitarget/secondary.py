@@ -51,18 +51,17 @@ from glob import glob
 
 from collections import defaultdict
 
+from desitarget import __version__ as desitarget_version
 from desitarget.internal import sharedmem
 from desitarget.geomask import radec_match_to, add_hp_neighbors, is_in_hp
+from desitarget.geomask import get_bricks
 
 from desitarget.targets import encode_targetid, main_cmx_or_sv
 from desitarget.targets import set_obsconditions, initial_priority_numobs
 from desitarget.targetmask import obsconditions
 
-from desiutil import brick
 from desiutil.log import get_logger
 
-# ADM set up the Legacy Surveys bricks object.
-bricks = brick.Bricks(bricksize=0.25)
 # ADM set up the default DESI logger.
 log = get_logger()
 start = time()
@@ -252,7 +251,55 @@ def _check_files(scxdir, scnd_mask):
     return
 
 
-def read_files(scxdir, scnd_mask):
+def _read_scx_file(fn):
+    """Parse one secondary input file.
+
+    Parameters
+    ----------
+    fn : :class:`str`
+        Full path to a secondary input file, without the extension.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        The targets in the file with columns that correspond to
+        `desitarget.secondary.indatamodel`.
+    """
+    # ADM if the relevant file is a .txt file, read it in.
+    if os.path.exists(fn+'.txt'):
+        scxin = np.loadtxt(fn+'.txt', usecols=[0, 1, 2, 3, 4, 5],
+                           dtype=indatamodel.dtype)
+    # ADM otherwise it's a fits file, read it in.
+    else:
+        scxin = fitsio.read(fn+'.fits',
+                            columns=indatamodel.dtype.names)
+
+    # ADM ensure this is a properly constructed numpy array.
+    return np.atleast_1d(scxin)
+
+
+def _scx_cache_key(fn):
+    """Key that identifies the version of a secondary .txt file.
+
+    Parameters
+    ----------
+    fn : :class:`str`
+        Full path to a secondary input .txt file.
+
+    Returns
+    -------
+    :class:`str`
+        The size in bytes and the modification time in ns of `fn`, the
+        data models used to parse `fn` and the version of desitarget.
+    """
+    st = os.stat(fn)
+
+    return '{} {} {} {} {}'.format(
+        st.st_size, st.st_mtime_ns, indatamodel.dtype.descr,
+        suppdatamodel.dtype.descr, desitarget_version)
+
+
+def read_files(scxdir, scnd_mask, cache=False, numproc=1):
     """Read in all secondary files and concatenate them into one array.
 
     Parameters
@@ -263,32 +310,79 @@ def read_files(scxdir, scnd_mask):
         A mask corresponding to a set of secondary targets, e.g, could
         be ``from desitarget.targetmask import scnd_mask`` for the
         main survey mask.
+    cache : :class:`bool`, optional, defaults to ``False``
+        If ``True``, load .txt input files from a binary cache of
+        already-parsed files in `scxdir`/outdata/cache, and (re)build
+        the cache for any files that are new or have changed. Only
+        pass ``True`` if `scxdir` is writable by (just) the user.
+    numproc : :class:`int`, optional, defaults to 1
+        The number of parallel processes to use to parse files that
+        are not in the cache.
 
     Returns
     -------
     :class:`~numpy.ndarray`
         All secondary targets concatenated as one array with columns
         that correspond to `desitarget.secondary.outdatamodel`.
+
+    Notes
+    -----
+        - A cached file is valid if its source .txt file has the same
+          size and modification time, and desitarget has the same version
+          and data models, as when the cache was built.
+        - If the cache directory can't be written, files are parsed
+          and a warning is logged.
     """
     # ADM the full directory name for the input data files.
     fulldir = os.path.join(scxdir, 'indata')
+    cachedir = os.path.join(scxdir, 'outdata', 'cache')
+
+    names = scnd_mask.names()
+    fns = [os.path.join(fulldir, scnd_mask[name].filename) for name in names]
+
+    # ADM load any valid cached .txt files.
+    scxins = {}
+    if cache:
+        for fn in fns:
+            cfn = os.path.join(cachedir, os.path.basename(fn)+'.npz')
+            if os.path.exists(fn+'.txt') and os.path.exists(cfn):
+                with np.load(cfn) as cached:
+                    if str(cached["key"]) == _scx_cache_key(fn+'.txt'):
+                        scxins[fn] = cached["data"]
+    toparse = [fn for fn in fns if fn not in scxins]
+    if cache and len(scxins) > 0:
+        log.info("Read {} secondary files from the cache in {}".format(
+            len(scxins), cachedir))
+
+    # ADM parse the remaining files, in parallel if requested.
+    if numproc > 1 and len(toparse) > 1:
+        pool = sharedmem.MapReduce(np=numproc)
+        with pool:
+            parsed = pool.map(_read_scx_file, toparse)
+    else:
+        parsed = [_read_scx_file(fn) for fn in toparse]
+
+    # ADM and add any newly parsed .txt files to the cache.
+    for fn, scxin in zip(toparse, parsed):
+        scxins[fn] = scxin
+        if cache and os.path.exists(fn+'.txt'):
+            cfn = os.path.join(cachedir, os.path.basename(fn)+'.npz')
+            try:
+                os.makedirs(cachedir, exist_ok=True)
+                # ADM write to a temporary file and rename, so that
+                # ADM the cache is never left partially written.
+                tmpfn = '{}.tmp{}'.format(cfn, os.getpid())
+                with open(tmpfn, 'wb') as f:
+                    np.savez(f, data=scxin, key=_scx_cache_key(fn+'.txt'))
+                os.replace(tmpfn, cfn)
+            except OSError as e:
+                log.warning("Can't cache {} in {}: {}".format(
+                    fn, cachedir, e))
 
     scxall = []
     # ADM loop through all of the scx bits.
-    for name in scnd_mask.names():
-        # ADM the full file path without the extension.
-        fn = os.path.join(fulldir, scnd_mask[name].filename)
-        # ADM if the relevant file is a .txt file, read it in.
-        if os.path.exists(fn+'.txt'):
-            scxin = np.loadtxt(fn+'.txt', usecols=[0, 1, 2, 3, 4, 5],
-                               dtype=indatamodel.dtype)
-        # ADM otherwise it's a fits file, read it in.
-        else:
-            scxin = fitsio.read(fn+'.fits',
-                                columns=indatamodel.dtype.names)
-
-        # ADM ensure this is a properly constructed numpy array.
-        scxin = np.atleast_1d(scxin)
+    for name, fn in zip(names, fns):
+        scxin = scxins[fn]
 
         # ADM the default is 2015.5 for the REF_EPOCH.
         ii = scxin["REF_EPOCH"] == 0
@@ -340,10 +434,8 @@ def add_primary_info(scxtargs, priminfodir):
         log.warning("No secondary target matches a primary target!!!")
         return scxtargs
 
-    primtargs = fitsio.read(primfns[0])
-    for i in range(1, len(primfns)):
-        prim = fitsio.read(primfns[i])
-        primtargs = np.concatenate([primtargs, prim])
+    # ADM read all of the files and concatenate them in one go.
+    primtargs = np.concatenate([fitsio.read(fn) for fn in primfns])
 
     # ADM make a unique look-up for the target sets.
     scxbitnum = np.log2(scxtargs["SCND_TARGET"]).astype('int')
@@ -353,29 +445,27 @@ def add_primary_info(scxtargs, priminfodir):
     primids = 1000 * primtargs["SCND_ORDER"] + primbitnum
 
     # ADM if a secondary matched TWO (or more) primaries,
-    # ADM only retain the highest-priority primary.
-    alldups = []
-    # for _, dups in duplicates(primids):
-    for _, dups in duplicates(primtargs['TARGETID']):
-        am = np.argmax(primtargs[dups]["PRIORITY_INIT"])
-        dups = np.delete(dups, am)
-        alldups.append(dups)
-    alldups = np.hstack(alldups)
-    log.debug("Discarding {} primary duplicates".format(len(alldups)))
-    primtargs = np.delete(primtargs, alldups)
-    primids = np.delete(primids, alldups)
+    # ADM only retain the highest-priority primary. Sort on TARGETID,
+    # ADM then on descending PRIORITY_INIT (ties are broken by order
+    # ADM in the files), and retain the first entry for each TARGETID.
+    srt = np.lexsort((np.arange(len(primtargs)),
+                      -primtargs["PRIORITY_INIT"], primtargs["TARGETID"]))
+    first = np.ones(len(srt), dtype='?')
+    first[1:] = np.diff(primtargs["TARGETID"][srt]) != 0
+    keep = np.sort(srt[first])
+    log.debug("Discarding {} primary duplicates".format(len(srt)-len(keep)))
+    primtargs = primtargs[keep]
+    primids = primids[keep]
 
     # ADM we already know that all primaries match a secondary, so,
     # ADM for speed, we can reduce to the matching set.
-    sprimids = set(primids)
-    scxii = [scxid in sprimids for scxid in scxids]
-    assert len(sprimids) == len(primids)
-    assert set(scxids[scxii]) == sprimids
+    scxii = np.isin(scxids, primids)
+    assert len(np.unique(primids)) == len(primids)
+    assert np.sum(scxii) == len(primids)
+    assert np.array_equal(np.unique(scxids[scxii]), np.unique(primids))
 
     # ADM sort-to-match sxcid and primid.
     primii = np.zeros_like(primids)
-#    ii[np.argsort(origids)] = np.argsort(refids)
-#    assert np.all(refids[ii] == origids)
     primii[np.argsort(scxids[scxii])] = np.argsort(primids)
     assert np.all(primids[primii] == scxids[scxii])
 
@@ -392,8 +482,89 @@ def add_primary_info(scxtargs, priminfodir):
     return scxtargs
 
 
+def _match_in_shards(targs, scxtargs, sep=1., numproc=4, nside=16):
+    """Match secondary to primary targets in parallel HEALPixel shards.
+
+    Parameters
+    ----------
+    targs : :class:`~numpy.ndarray`
+        An array of primary targets. Must include "RA" and "DEC".
+    scxtargs : :class:`~numpy.ndarray`
+        An array of secondary targets. Must include "RA" and "DEC".
+    sep : :class:`float`, defaults to 1 arcsecond
+        The separation at which to match in ARCSECONDS.
+    numproc : :class:`int`, optional, defaults to 4
+        The number of parallel processes to use.
+    nside : :class:`int`, optional, defaults to 16
+        The (NESTED) HEALPixel nside of the shards.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray` (of integers)
+        The indexes in `targs` that match `scxtargs`.
+    :class:`~numpy.ndarray` (of integers)
+        The indexes in `scxtargs` that match `targs`.
+
+    Notes
+    -----
+        - Identical to ``radec_match_to(targs, scxtargs, sep=sep)``.
+          Each shard matches the secondaries in one HEALPixel to the
+          primaries in that pixel and its neighbors (a halo), so every
+          secondary still finds its CLOSEST primary within `sep`.
+    """
+    # ADM the shards must be (much) larger than the matching radius.
+    halfpix = np.degrees(hp.max_pixrad(nside))*3600.
+    if sep > halfpix:
+        msg = 'sep ({}") exceeds (half) HEALPixel size ({}")'.format(
+            sep, halfpix)
+        log.critical(msg)
+        raise ValueError(msg)
+
+    # ADM sort the primaries and secondaries by HEALPixel once, so
+    # ADM that each pixel is a slice of the sorted indexes.
+    def _sorted_by_pixel(objs):
+        theta, phi = np.radians(90-objs["DEC"]), np.radians(objs["RA"])
+        pixnums = hp.ang2pix(nside, theta, phi, nest=True)
+        srt = np.argsort(pixnums, kind='stable')
+        return pixnums[srt], srt
+    primpix, primsrt = _sorted_by_pixel(targs)
+    scxpix, scxsrt = _sorted_by_pixel(scxtargs)
+
+    upix, starts, cnts = np.unique(scxpix, return_index=True,
+                                   return_counts=True)
+
+    def _match_shard(i):
+        """match the secondaries in one HEALPixel to nearby primaries"""
+        iscx = scxsrt[starts[i]:starts[i]+cnts[i]]
+        allpix = np.sort(add_hp_neighbors(nside, upix[i]))
+        lo = np.searchsorted(primpix, allpix, side='left')
+        hi = np.searchsorted(primpix, allpix, side='right')
+        iprim = np.concatenate([primsrt[l:h] for l, h in zip(lo, hi)])
+        if len(iprim) == 0:
+            return [np.zeros(0, dtype='i8'), np.zeros(0, dtype='i8')]
+        mtargs, mscx = radec_match_to(targs[iprim], scxtargs[iscx], sep=sep)
+        return [iprim[mtargs], iscx[mscx]]
+
+    # ADM process the shards in parallel, most secondaries first, and
+    # ADM send pixels with few secondaries in batches.
+    pool = sharedmem.MapReduce(np=numproc)
+    with pool:
+        matches = pool.map(_match_shard, np.arange(len(upix)), costs=cnts,
+                           chunksize=64)
+
+    if len(matches) == 0:
+        return np.zeros(0, dtype='i8'), np.zeros(0, dtype='i8')
+    mtargs = np.concatenate([m[0] for m in matches])
+    mscx = np.concatenate([m[1] for m in matches])
+
+    # ADM return the matches in the order of the secondaries.
+    srt = np.argsort(mscx)
+
+    return mtargs[srt], mscx[srt]
+
+
 def match_secondary(primtargs, scxdir, scndout, sep=1.,
-                    pix=None, nside=None):
+                    pix=None, nside=None, numproc=1, cache=False):
     """Match secondary targets to primary targets and update bits.
 
     Parameters
@@ -413,6 +584,12 @@ def match_secondary(primtargs, scxdir, scndout, sep=1.,
         pix at the supplied `nside`, as a speed-up.
     nside : :class:`int`, optional, defaults to `None`
         The (NESTED) HEALPixel nside to be used with `pixlist`.
+    numproc : :class:`int`, optional, defaults to 1
+        If more than 1, match in this many parallel processes, each
+        processing a set of HEALPixels (see :func:`_match_in_shards()`).
+    cache : :class:`bool`, optional, defaults to ``False``
+        If ``True``, read secondary input files through the binary
+        cache in `scxdir` (see :func:`read_files()`).
 
     Returns
     -------
@@ -434,7 +611,7 @@ def match_secondary(primtargs, scxdir, scndout, sep=1.,
         scxdir = os.path.join(scxdir, surv)
 
     # ADM read in non-OVERRIDE secondary targets.
-    scxtargs = read_files(scxdir, mx[3])
+    scxtargs = read_files(scxdir, mx[3], cache=cache, numproc=numproc)
     scxtargs = scxtargs[~scxtargs["OVERRIDE"]]
 
     # ADM match primary targets to non-OVERRIDE secondary targets.
@@ -455,35 +632,33 @@ def match_secondary(primtargs, scxdir, scndout, sep=1.,
             raise ValueError(msg)
     # ADM warn the user if the secondary and primary samples are "large".
     big = 500000
-    if np.sum(inhp) > big and len(primtargs) > big:
+    if np.sum(inhp) > big and len(primtargs) > big and numproc == 1:
         log.warning('Large secondary (N={}) and primary (N={}) samples'
                     .format(np.sum(inhp), len(primtargs)))
-        log.warning('The code may run slowly')
+        log.warning('The code may run slowly; consider passing numproc > 1')
 
     # ADM for each secondary target, determine if there is a match
     # ADM with a primary target. Note that sense is important, here
     # ADM (the primary targets must be passed first).
     log.info('Matching primary and secondary targets for {} at {}"...t={:.1f}s'
              .format(scndout, sep, time()-start))
-    mtargs, mscx = radec_match_to(targs, scxtargs[inhp], sep=sep)
+    if numproc > 1:
+        mtargs, mscx = _match_in_shards(targs, scxtargs[inhp], sep=sep,
+                                        numproc=numproc)
+    else:
+        mtargs, mscx = radec_match_to(targs, scxtargs[inhp], sep=sep)
     # ADM recast the indices to the full set of secondary targets,
     # ADM instead of just those that were in the relevant HEALPixels.
     mscx = np.where(inhp)[0][mscx]
 
-    # ADM loop through the matches and update the SCND_TARGET
-    # ADM column in the primary target list. The np.unique is a
-    # ADM speed-up to assign singular matches first.
-    umtargs, inv, cnt = np.unique(mtargs,
-                                  return_inverse=True, return_counts=True)
-    # ADM number of times each primary target was matched, ordered
-    # ADM the same as mtargs, i.e. n(mtargs) for each entry in mtargs.
-    nmtargs = cnt[inv]
-    # ADM assign anything with nmtargs = 1 directly.
-    singular = nmtargs == 1
-    targs["SCND_TARGET"][mtargs[singular]] = scxtargs["SCND_TARGET"][mscx[singular]]
-    # ADM loop through things with nmtargs > 1 and combine the bits.
-    for i in range(len((mtargs[~singular]))):
-        targs["SCND_TARGET"][mtargs[~singular][i]] |= scxtargs["SCND_TARGET"][mscx[~singular][i]]
+    # ADM update the SCND_TARGET column in the primary target list,
+    # ADM combining the bits of primaries matched by more than one
+    # ADM secondary with a grouped OR over the matches sorted by primary.
+    srt = np.argsort(mtargs, kind='stable')
+    umtargs, first = np.unique(mtargs[srt], return_index=True)
+    if len(umtargs) > 0:
+        targs["SCND_TARGET"][umtargs] = np.bitwise_or.reduceat(
+            scxtargs["SCND_TARGET"][mscx[srt]], first)
     # ADM also assign the SCND_ANY bit to the primary targets.
     desicols, desimasks, _ = main_cmx_or_sv(targs, scnd=True)
     targs[desicols[0]][umtargs] |= desimasks[0].SCND_ANY
@@ -563,7 +738,7 @@ def finalize_secondary(scxtargs, scnd_mask, sep=1., darkbright=False):
     nomatch = scxtargs["TARGETID"] == -1
 
     # ADM get the BRICKIDs for each source.
-    brxid = bricks.brickid(scxtargs["RA"], scxtargs["DEC"])
+    brxid = get_bricks().brickid(scxtargs["RA"], scxtargs["DEC"])
 
     # ADM the RELEASE for each source is the `SCND_TARGET` bit NUMBER.
     release = np.log2(scxtargs["SCND_TARGET_INIT"]).astype('int')
@@ -693,7 +868,8 @@ def finalize_secondary(scxtargs, scnd_mask, sep=1., darkbright=False):
     return done
 
 
-def select_secondary(priminfodir, sep=1., scxdir=None, darkbright=False):
+def select_secondary(priminfodir, sep=1., scxdir=None, darkbright=False,
+                     cache=False):
     """Process secondary targets and update relevant bits.
 
     Parameters
@@ -713,6 +889,9 @@ def select_secondary(priminfodir, sep=1., scxdir=None, darkbright=False):
         `NUMOBS_INIT_DARK`, `NUMOBS_INIT_BRIGHT`, `PRIORITY_INIT_DARK`
         and `PRIORITY_INIT_BRIGHT` and calculate values appropriate
         to "BRIGHT" and "DARK|GRAY" observing conditions.
+    cache : :class:`bool`, optional, defaults to ``False``
+        If ``True``, read secondary input files through the binary
+        cache in `scxdir` (see :func:`read_files()`).
 
     Returns
     -------
@@ -750,7 +929,7 @@ def select_secondary(priminfodir, sep=1., scxdir=None, darkbright=False):
     scxdir = _get_scxdir(scxdir)
     _check_files(scxdir, scnd_mask)
     # ADM ...and read in all of the secondary targets.
-    scxtargs = read_files(scxdir, scnd_mask)
+    scxtargs = read_files(scxdir, scnd_mask, cache=cache)
 
     # ADM only non-override targets could match a primary.
     scxover = scxtargs[scxtargs["OVERRIDE"]]
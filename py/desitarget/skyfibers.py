@@ -13,12 +13,13 @@ import numpy as np
 import fitsio
 from astropy.wcs import WCS
 from time import time
-import photutils
 import healpy as hp
 from glob import glob
 from scipy.ndimage.morphology import binary_dilation, binary_erosion
+from scipy.ndimage.morphology import distance_transform_cdt
 from scipy.ndimage.measurements import label, find_objects, center_of_mass
 from scipy.ndimage.filters import gaussian_filter
+from scipy.spatial import cKDTree
 
 # ADM some utility code taken from legacypipe and astrometry.net.
 from desitarget.skyutilities.astrometry.fits import fits_table
@@ -27,18 +28,20 @@ from desitarget.skyutilities.legacypipe.util import find_unique_pixels
 from desitarget.targetmask import desi_mask, targetid_mask
 from desitarget.targets import finalize
 from desitarget.io import brickname_from_filename
+from desitarget.io import read_brick_manifest, update_brick_manifest
+from desitarget.io import check_brick_params
+from desitarget.io import write_brick_shard, gather_brick_shards
+from desitarget.io import write_failures, write_skies, desitarget_nside
+from desitarget.io import _hp_split_dir, _write_hp_index
 from desitarget.gaiamatch import find_gaia_files
-from desitarget.geomask import is_in_gal_box, is_in_circle, is_in_hp
+from desitarget.geomask import is_in_gal_box, is_in_hp
+from desitarget.geomask import radec_to_xyz, get_bricks
 
 # ADM the parallelization script.
 from desitarget.internal import sharedmem
 
-from desiutil import brick
 from desiutil.log import get_logger
 
-# ADM set up the Legacy Surveys bricks object.
-bricks = brick.Bricks(bricksize=0.25)
-
 # ADM initialize the DESI logger.
 log = get_logger()
 
@@ -90,8 +93,7 @@ def get_brick_info(drdirs, counts=False, allbricks=False):
 
     # ADM initialize the bricks class, retrieve the brick information look-up
     # ADM table and turn it into a fast look-up dictionary.
-    from desiutil import brick
-    bricktable = brick.Bricks(bricksize=0.25).to_table()
+    bricktable = get_bricks().to_table()
     brickdict = {}
     for b in bricktable:
         brickdict[b["BRICKNAME"]] = [b["RA"], b["DEC"],
@@ -346,6 +348,174 @@ def make_skies_for_a_brick(survey, brickname, nskiespersqdeg=None, bands=['g', '
     return skies
 
 
+def _disc_area_below(x, y, radius):
+    """Area of a disc centered on (0, 0) that lies below-left of (x, y).
+
+    Parameters
+    ----------
+    x : :class:`~numpy.ndarray`
+        Upper limit in the x-direction (pixels).
+    y : :class:`~numpy.ndarray`
+        Upper limit in the y-direction (pixels). Must broadcast with `x`.
+    radius : :class:`float`
+        Radius of the disc (pixels).
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        The area of the disc with X <= `x` and Y <= `y`.
+
+    Notes
+    -----
+        - The area is the analytic integral, over X, of the length of
+          the vertical chord of the disc that lies below `y`.
+    """
+    r2 = radius*radius
+
+    # ADM the antiderivative of the semi-chord sqrt(r^2 - X^2).
+    def semi(t):
+        t = np.clip(t, -radius, radius)
+        return 0.5*(t*np.sqrt(np.clip(r2 - t*t, 0, None)) + r2*np.arcsin(t/radius))
+
+    # ADM where |X| < c the chord is cut by y, elsewhere it is either
+    # ADM entirely below y (for y >= 0) or entirely above y (for y < 0).
+    xm = np.clip(x, -radius, radius)
+    c = np.sqrt(np.clip(r2 - y*y, 0, None))
+    inner = np.clip(xm, -c, c)
+    area = y*(inner + c) + semi(inner) - semi(-c)
+    outer = 2*(semi(np.minimum(xm, -c)) - semi(-radius)) \
+        + 2*(semi(np.maximum(xm, c)) - semi(c))
+
+    return area + np.where(y >= 0, outer, 0.)
+
+
+def _aperture_stencils(dx, dy, radius, halfsize):
+    """Exact fractional overlap of pixels with circular apertures.
+
+    Parameters
+    ----------
+    dx : :class:`~numpy.ndarray`
+        Offsets in x of the aperture centers from the central pixel.
+    dy : :class:`~numpy.ndarray`
+        Offsets in y of the aperture centers from the central pixel.
+    radius : :class:`float`
+        Radius of the aperture (pixels).
+    halfsize : :class:`int`
+        Half-width of the stencil (pixels). Must be > `radius` + 0.5.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        An array of shape (len(`dx`), 2*`halfsize`+1, 2*`halfsize`+1)
+        of the area of each pixel covered by each aperture, ordered as
+        [aperture, y, x].
+    """
+    # ADM evaluate the cumulative disc area at each pixel corner, then
+    # ADM difference adjacent corners to get the area in each pixel.
+    edges = np.arange(-halfsize, halfsize+2) - 0.5
+    cum = _disc_area_below(edges[None, None, :] - dx[:, None, None],
+                           edges[None, :, None] - dy[:, None, None], radius)
+
+    return cum[:, 1:, 1:] - cum[:, 1:, :-1] - cum[:, :-1, 1:] + cum[:, :-1, :-1]
+
+
+def aperture_photometry(img, x, y, radii, ivar=None, chunksize=2000000):
+    """Circular-aperture photometry for many positions and radii at once.
+
+    Parameters
+    ----------
+    img : :class:`~numpy.ndarray`
+        Two-dimensional image.
+    x : :class:`~numpy.ndarray`
+        x (column) pixel positions at which to center the apertures.
+    y : :class:`~numpy.ndarray`
+        y (row) pixel positions at which to center the apertures.
+    radii : :class:`list` or `~numpy.ndarray`
+        Radii (pixels) of the apertures.
+    ivar : :class:`~numpy.ndarray`, optional, defaults to ``None``
+        Inverse-variance image corresponding to `img`. Pixels with an
+        ivar of zero contribute zero variance. If ``None`` is passed,
+        only fluxes are calculated.
+    chunksize : :class:`int`, optional, defaults to 2000000
+        Maximum number of stencil pixels to process in one pass, which
+        limits the memory used for large numbers of positions.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        Array of shape (len(`x`), len(`radii`)) of aperture fluxes.
+    :class:`~numpy.ndarray`
+        Array of shape (len(`x`), len(`radii`)) of errors on the fluxes
+        (zeros if `ivar` is ``None``).
+
+    Notes
+    -----
+        - Pixel (i, j) is centered on (x=i, y=j) and the fractional area
+          of each pixel covered by an aperture is calculated exactly, so
+          results match ``photutils.aperture_photometry(method='exact')``.
+        - Pixel weights are precomputed once per radius for each unique
+          sub-pixel offset (a single stencil suffices for the integer
+          positions of sky fibers), then applied to all positions at once.
+        - Pixels are gathered once for the largest aperture, and smaller
+          apertures use the central part of the same patch, so the image
+          is only visited once however many `radii` are passed.
+        - As for `photutils`, apertures that lie entirely off the image
+          have fluxes and errors of NaN.
+    """
+    x = np.atleast_1d(np.asarray(x, dtype='f8'))
+    y = np.atleast_1d(np.asarray(y, dtype='f8'))
+    radii = np.atleast_1d(radii)
+    npos = len(x)
+    ny, nx = img.shape
+
+    flux = np.zeros((npos, len(radii)))
+    var = np.zeros((npos, len(radii)))
+
+    # ADM the central pixel for each position and the sub-pixel offset
+    # ADM of each position from that central pixel.
+    ix = np.floor(x + 0.5).astype('i8')
+    iy = np.floor(y + 0.5).astype('i8')
+    dxy = np.vstack([x - ix, y - iy]).T
+
+    # ADM the stencil for the largest aperture contains all the others.
+    halfsizes = [int(np.ceil(rad + 0.5)) for rad in radii]
+    hsmax = np.max(halfsizes)
+    offset = np.arange(-hsmax, hsmax+1)
+    step = max(chunksize // len(offset)**2, 1)
+    for i in range(0, npos, step):
+        s = slice(i, i+step)
+        # ADM gather the pixels under the largest stencil just once, with
+        # ADM zeros for any pixels that fall off the edge of the image.
+        xx = ix[s, None, None] + offset[None, None, :]
+        yy = iy[s, None, None] + offset[None, :, None]
+        inimg = (xx >= 0) & (xx < nx) & (yy >= 0) & (yy < ny)
+        xx, yy = np.clip(xx, 0, nx-1), np.clip(yy, 0, ny-1)
+        pix = np.where(inimg, img[yy, xx], 0.)
+        if ivar is not None:
+            iv = np.where(inimg, ivar[yy, xx], 0.)
+            with np.errstate(divide='ignore'):
+                pixvar = np.where(iv > 0, 1./iv, 0.)
+        # ADM one stencil for each unique sub-pixel offset.
+        udxy, inv = np.unique(dxy[s], axis=0, return_inverse=True)
+        inv = inv.ravel()
+        # ADM (if all offsets are the same, one stencil is broadcast).
+        sub = 'ij' if len(udxy) == 1 else 'nij'
+        for irad, (rad, hs) in enumerate(zip(radii, halfsizes)):
+            w = _aperture_stencils(udxy[:, 0], udxy[:, 1], rad, hs)
+            w = w[0] if len(udxy) == 1 else w[inv]
+            # ADM each aperture only uses the central part of the patch.
+            cen = slice(hsmax-hs, hsmax+hs+1)
+            flux[s, irad] = np.einsum(sub+',nij->n', w, pix[:, cen, cen])
+            if ivar is not None:
+                var[s, irad] = np.einsum(sub+',nij->n', w, pixvar[:, cen, cen])
+            # ADM apertures that don't touch the image are undefined.
+            offimg = ~np.any((w > 0) & inimg[:, cen, cen], axis=(-2, -1))
+            flux[s, irad][offimg] = np.nan
+            var[s, irad][offimg] = np.nan
+
+    return flux, np.sqrt(var)
+
+
 def sky_fibers_for_brick(survey, brickname, nskies=144, bands=['g', 'r', 'z'],
                          apertures_arcsec=[0.5, 0.75, 1., 1.5, 2., 3.5, 5., 7.]):
     """Produce DESI sky fiber locations in a brick, derived at the pixel-level
@@ -461,25 +631,17 @@ def sky_fibers_for_brick(survey, brickname, nskies=144, bands=['g', 'r', 'z'],
         coimg = fitsio.read(imfn)
         coiv = fitsio.read(ivfn)
 
-        with np.errstate(divide='ignore', invalid='ignore'):
-            imsigma = 1./np.sqrt(coiv)
-            imsigma[coiv == 0] = 0
-        apxy = np.vstack((skyfibers.x, skyfibers.y)).T
-        for irad, rad in enumerate(apertures):
-            aper = photutils.CircularAperture(apxy, rad)
-            p = photutils.aperture_photometry(coimg, aper, error=imsigma)
-            apflux[:, irad] = p.field('aperture_sum')
-            err = p.field('aperture_sum_err')
-            # ADM where the error is 0, that actually means infinite error
-            # ADM so, in reality, set the ivar to 0 for those cases and
-            # ADM retain the true ivars where the error is non-zero.
-            # ADM also catch the occasional NaN (which are very rare).
-            ii = np.isnan(err)
-            err[ii] = 0.0
-            wzero = np.where(err == 0)
-            wnonzero = np.where(err > 0)
-            apiv[:, irad][wnonzero] = 1./err[wnonzero]**2
-            apiv[:, irad][wzero] = 0.
+        # ADM photometer all of the apertures in one pass.
+        flux, err = aperture_photometry(coimg, skyfibers.x, skyfibers.y,
+                                        apertures, ivar=coiv)
+        apflux[:] = flux
+        # ADM where the error is 0, that actually means infinite error
+        # ADM so, in reality, set the ivar to 0 for those cases and
+        # ADM retain the true ivars where the error is non-zero.
+        # ADM also catch the occasional NaN (which are very rare).
+        err[np.isnan(err)] = 0.0
+        wnonzero = np.where(err > 0)
+        apiv[wnonzero] = 1./err[wnonzero]**2
 
     header = fitsio.FITSHDR()
     for i, ap in enumerate(apertures_arcsec):
@@ -490,7 +652,7 @@ def sky_fibers_for_brick(survey, brickname, nskies=144, bands=['g', 'r', 'z'],
     return skyfibers
 
 
-def sky_fiber_locations(skypix, gridsize=300):
+def sky_fiber_locations(skypix, gridsize=300, method='distance'):
     """The core worker function for `sky_fibers_for_brick`
 
     Parameters
@@ -501,23 +663,42 @@ def sky_fiber_locations(skypix, gridsize=300):
         Resolution (in pixels) at which to split the `skypix` array in order to
         find sky locations. For example, if skypix is a 3600x3600 array of pixels,
         gridsize=300 will return (3600/300) x (3600/300) = 12x12 = 144 locations.
+    method : :class:`str`, optional, defaults to 'distance'
+        How to build the distance-from-blobs map. 'distance' uses a single
+        chessboard distance transform. 'erosion' iteratively erodes the map
+        of good sky locations, and is retained for validation. Both methods
+        produce identical maps, and so identical sky locations.
 
     Notes
     -----
-        - Implements the core trick of iteratively eroding the map of good sky
-          locations to produce a distance-from-blobs map, and then return the max
+        - Implements the core trick of eroding the map of good sky locations
+          to produce a distance-from-blobs map, and then return the max
           values in that map in each cell of a grid.
+        - The number of erosions that a pixel survives (plus one) is its
+          chessboard distance to the nearest bad pixel, treating pixels
+          beyond the edge of the image as bad. The distance transform finds
+          this directly, which is much faster than eroding the map, as the
+          map must be eroded once per pixel of the largest distance.
         - Initial version written by Dustin Lang (@dstndstn).
     """
-    nerosions = np.zeros(skypix.shape, np.int16)
-    nerosions += skypix
-    element = np.ones((3, 3), bool)
-    while True:
-        skypix = binary_erosion(skypix, structure=element)
+    if method == 'distance':
+        # ADM pad with bad pixels, as binary_erosion assumes a border of 0.
+        nerosions = distance_transform_cdt(np.pad(skypix, 1), metric='chessboard')
+        nerosions = nerosions[1:-1, 1:-1].astype(np.int16)
+    elif method == 'erosion':
+        nerosions = np.zeros(skypix.shape, np.int16)
         nerosions += skypix
-#        log.info('After erosion: {} sky pixels'.format(np.sum(skypix)))
-        if not np.any(skypix.ravel()):
-            break
+        element = np.ones((3, 3), bool)
+        while True:
+            skypix = binary_erosion(skypix, structure=element)
+            nerosions += skypix
+#            log.info('After erosion: {} sky pixels'.format(np.sum(skypix)))
+            if not np.any(skypix.ravel()):
+                break
+    else:
+        msg = "method must be 'distance' or 'erosion', not {}".format(method)
+        log.critical(msg)
+        raise ValueError(msg)
 
     # This is a hack to break ties in the integer 'nerosions' map.
     nerosions = gaussian_filter(nerosions.astype(np.float32), 1.0)
@@ -758,18 +939,29 @@ def get_supp_skies(ras, decs, radius=2.):
     -----
         - Written to be used when `ras` and `decs` are within a single
           Gaia-file HEALPixel, but should work for all cases.
+        - Gaia sources are held in KD-trees of unit vectors (see
+          :func:`~desitarget.geomask.radec_to_xyz`) and each location is
+          rejected if its nearest Gaia neighbor is closer than `radius`.
+          This is equivalent to, but much faster than,
+          :func:`~desitarget.geomask.is_in_circle`, as all pairs of
+          matches don't need to be found.
     """
-    # ADM determine Gaia files of interest and read the RAs/Decs.
+    # ADM determine Gaia files of interest.
     fns = find_gaia_files([ras, decs], neighbors=True, radec=True)
-    gobjs = np.concatenate(
-        [fitsio.read(fn, columns=["RA", "DEC"]) for fn in fns])
 
-    # ADM convert radius to an array.
-    r = np.zeros(len(gobjs))+radius
+    # ADM the chord length equivalent to the avoidance radius.
+    chord = 2*np.sin(np.radians(radius/3600.)/2.)
 
-    # ADM determine matches between Gaia and the passed RAs/Decs.
-    isin = is_in_circle(ras, decs, gobjs["RA"], gobjs["DEC"], r)
-    good = ~isin
+    # ADM locations with no Gaia source inside the chord are good. Build
+    # ADM a tree for each file and find the nearest source.
+    xyz = radec_to_xyz(ras, decs)
+    dist = np.full(len(xyz), np.inf)
+    for fn in fns:
+        gobjs = fitsio.read(fn, columns=["RA", "DEC"])
+        tree = cKDTree(radec_to_xyz(gobjs["RA"], gobjs["DEC"]))
+        dist = np.minimum(
+            dist, tree.query(xyz, distance_upper_bound=chord)[0])
+    good = ~(dist < chord)
 
     # ADM build the output array from the sky targets data model.
     nskies = np.sum(good)
@@ -777,6 +969,7 @@ def get_supp_skies(ras, decs, radius=2.):
     # ADM populate output array with the RA/Dec of the sky locations.
     supsky["RA"], supsky["DEC"] = ras[good], decs[good]
     # ADM add the brickid and name.
+    bricks = get_bricks()
     supsky["BRICKID"] = bricks.brickid(ras[good], decs[good])
     supsky["BRICKNAME"] = bricks.brickname(ras[good], decs[good])
     supsky["BLOBDIST"] = 2.
@@ -790,7 +983,7 @@ def get_supp_skies(ras, decs, radius=2.):
 
 def supplement_skies(nskiespersqdeg=None, numproc=16, gaiadir=None,
                      nside=None, pixlist=None, mindec=-30., mingalb=10.,
-                     radius=2.):
+                     radius=2., outfile=None):
     """Generate supplemental sky locations using Gaia-G-band avoidance.
 
     Parameters
@@ -817,17 +1010,26 @@ def supplement_skies(nskiespersqdeg=None, numproc=16, gaiadir=None,
         (e.g. send 10 to limit to areas beyond -10o <= b < 10o).
     radius : :class:`float`, optional, defaults to 2
         Radius at which to avoid (all) Gaia sources (arcseconds).
+    outfile : :class:`str`, optional, defaults to ``None``
+        If passed, write the sky positions in each Gaia HEALPixel to a
+        file as soon as the pixel is finished, rather than holding all
+        of the sky positions in memory. The files are written in the
+        layout of :func:`~desitarget.io.write_hp_split()`, in a
+        directory named for `outfile` with ".fits" replaced by "-hp".
 
     Returns
     -------
-    :class:`~numpy.ndarray`
+    :class:`~numpy.ndarray` or `str`
         a structured array of supplemental sky positions in the DESI sky
-        target format within the passed `mindec` and `mingalb` limits.
+        target format within the passed `mindec` and `mingalb` limits,
+        or the directory of output files if `outfile` was passed.
 
     Notes
     -----
         - The environment variable $GAIA_DIR must be set, or `gaiadir`
           must be passed.
+        - OBJIDs count up from one in each brick, in order of Gaia
+          HEALPixel, so pixels are finalized (and written) in order.
     """
     log.info("running on {} processors".format(numproc))
 
@@ -868,21 +1070,83 @@ def supplement_skies(nskiespersqdeg=None, numproc=16, gaiadir=None,
              .format(len(ras), time()-start))
     theta, phi = np.radians(90-decs), np.radians(ras)
     pixels = hp.ang2pix(nsidegaia, theta, phi, nest=True)
-    upixels = np.unique(pixels)
+    # ADM sort once by pixel, so each pixel is a contiguous slice.
+    pixorder = np.argsort(pixels, kind='stable')
+    ras, decs, pixels = ras[pixorder], decs[pixorder], pixels[pixorder]
+    upixels, pixstart, pixcnt = np.unique(
+        pixels, return_index=True, return_counts=True)
+    pixslices = {pix: slice(i, i+n) for pix, i, n in zip(upixels, pixstart, pixcnt)}
     npixels = len(upixels)
     log.info("Running across {} Gaia HEALPixels.".format(npixels))
 
+    # ADM if splitting by HEALPixels, use the input list to
+    # ADM set RELEASE so we don't have duplicate TARGETIDs.
+    if pixlist is not None and pixlist[0] < 1000:
+        release = pixlist[0]
+    else:
+        msg = "First entry in pixlist ({}) > 1000. This sets ".format(pixlist[0])
+        msg += "RELEASE for SUPP_SKIES. > 1000 may duplicate TARGETID for SKIES!"
+        log.critical(msg)
+        raise IOError
+
+    # ADM if writing a file per pixel, set up the output directory and
+    # ADM the header information for each file.
+    if outfile is not None:
+        hpdirname, root = _hp_split_dir(outfile)
+        outinfo = []
+        extra = {"radius": radius, "mindec": mindec, "mingalb": mingalb,
+                 "FILENSID": nsidegaia, "FILENEST": True}
+
     # ADM parallelize across pixels. The function to run on every pixel.
     def _get_supp(pix):
         """wrapper on get_supp_skies() given a HEALPixel"""
-        ii = (pixels == pix)
-        return get_supp_skies(ras[ii], decs[ii], radius=radius)
-
-    # ADM this is just to count pixels in _update_status.
+        ii = pixslices[pix]
+        return pix, get_supp_skies(ras[ii], decs[ii], radius=radius)
+
+    # ADM the number of OBJIDs assigned so far in each brick.
+    nobjid = {}
+
+    def _finalize_supp(supp):
+        """assign OBJIDs, TARGETIDs, etc. to the skies in one pixel"""
+        # ADM count up from one in each brick, in order of appearance,
+        # ADM carrying on from any earlier pixels that touched the brick.
+        brxid = supp["BRICKID"]
+        order = np.argsort(brxid, kind='stable')
+        ubrx, brxstart, cntr = np.unique(brxid[order], return_index=True,
+                                         return_counts=True)
+        offset = np.array([nobjid.get(brx, 0) for brx in ubrx], dtype=int)
+        rank = np.arange(len(brxid)) - np.repeat(brxstart - offset, cntr)
+        objid = np.empty(len(brxid), dtype=int)
+        objid[order] = rank + 1
+        nobjid.update(zip(ubrx, offset + cntr))
+        # ADM ensure the number of sky positions that were generated doesn't exceed
+        # ADM the largest possible OBJID (which is unlikely).
+        if np.any(offset + cntr > 2**targetid_mask.OBJID.nbits):
+            msg = 'Too many sky locations in brick(s) {}, OBJID cannot exceed {}'.format(
+                ubrx[offset + cntr > 2**targetid_mask.OBJID.nbits],
+                2**targetid_mask.OBJID.nbits)
+            log.critical(msg)
+            raise ValueError(msg)
+        supp["OBJID"] = objid
+        supp["RELEASE"] = release
+
+        # ADM add the TARGETID, DESITARGET bits etc.
+        desi_target = np.zeros(len(supp), dtype='>i8')
+        desi_target |= desi_mask.SKY
+        desi_target |= desi_mask.SUPP_SKY
+        dum = np.zeros_like(desi_target)
+        return finalize(supp, desi_target, dum, dum, sky=1)
+
+    # ADM pixels that are finished, but are waiting on an earlier pixel.
+    waiting = {}
+    # ADM this is just to count pixels in _update_status (and to
+    # ADM track the next pixel to finalize).
     npix = np.zeros((), dtype='i8')
+    nextpix = np.zeros((), dtype='i8')
+    done = []
     t0 = time()
 
-    def _update_status(result):
+    def _update_status(pix, supp):
         """wrapper function for the critical reduction operation,
         that occurs on the main parallel process"""
         if npix % 500 == 0 and npix > 0:
@@ -890,65 +1154,54 @@ def supplement_skies(nskiespersqdeg=None, numproc=16, gaiadir=None,
             log.info('{}/{} HEALPixels; {:.1f} pixels/sec'.
                      format(npix, npixels, rate))
         npix[...] += 1    # this is an in-place modification.
-        return result
+        # ADM finalize pixels in order, as OBJIDs run across pixels.
+        waiting[pix] = supp
+        while nextpix < npixels and upixels[nextpix] in waiting:
+            finpix = upixels[nextpix]
+            nextpix[...] += 1
+            skies = _finalize_supp(waiting.pop(finpix))
+            # ADM write each pixel as it's finalized, if requested...
+            if outfile is not None:
+                if len(skies) > 0:
+                    fn = os.path.join(
+                        hpdirname, "{}-hp-{}.fits".format(root, finpix))
+                    extra["FILEHPX"] = int(finpix)
+                    write_skies(fn, skies, supp=True,
+                                indir=os.environ["GAIA_DIR"],
+                                nside=desitarget_nside(),
+                                nskiespersqdeg=nskiespersqdeg, extra=extra)
+                    outinfo.append((finpix, len(skies), fn))
+            # ADM ...otherwise retain it.
+            else:
+                done.append(skies)
 
     # - Parallel process across the unique pixels.
     if numproc > 1:
         pool = sharedmem.MapReduce(np=numproc)
         with pool:
-            supp = pool.map(_get_supp, upixels, reduce=_update_status)
+            pool.map(_get_supp, upixels, reduce=_update_status)
     else:
-        supp = []
         for upix in upixels:
-            supp.append(_update_status(_get_supp(upix)))
-
-    # ADM Concatenate the parallelized results into one rec array.
-    supp = np.concatenate(supp)
-
-    # ADM build the OBJIDs from the number of sources per brick.
-    # ADM the for loop doesn't seem the smartest way, but it is O(n).
-    log.info("Begin assigning OBJIDs to bricks...t={:.1f}s".format(time()-start))
-    brxid = supp["BRICKID"]
-    # ADM start each brick counting from zero.
-    cntr = np.zeros(np.max(brxid)+1, dtype=int)
-    objid = []
-    for ibrx in brxid:
-        cntr[ibrx] += 1
-        objid.append(cntr[ibrx])
-    # ADM ensure the number of sky positions that were generated doesn't exceed
-    # ADM the largest possible OBJID (which is unlikely).
-    if np.any(cntr > 2**targetid_mask.OBJID.nbits):
-        log.fatal('{} sky locations requested in brick {}, but OBJID cannot exceed {}'
-                  .format(nskies, brickname, 2**targetid_mask.OBJID.nbits))
-        raise ValueError
-    supp["OBJID"] = np.array(objid)
-    log.info("Assigned OBJIDs to bricks...t={:.1f}s".format(time()-start))
-
-    # ADM if splitting by HEALPixels, use the input list to
-    # ADM set RELEASE so we don't have duplicate TARGETIDs.
-    if pixlist is not None and pixlist[0] < 1000:
-        supp["RELEASE"] = pixlist[0]
-    else:
-        msg = "First entry in pixlist ({}) > 1000. This sets ".format(pixlist[0])
-        msg += "RELEASE for SUPP_SKIES. > 1000 may duplicate TARGETID for SKIES!"
-        log.critical(msg)
-        raise IOError
-
-    # ADM add the TARGETID, DESITARGET bits etc.
-    nskies = len(supp)
-    desi_target = np.zeros(nskies, dtype='>i8')
-    desi_target |= desi_mask.SKY
-    desi_target |= desi_mask.SUPP_SKY
-    dum = np.zeros_like(desi_target)
-    supp = finalize(supp, desi_target, dum, dum, sky=1)
+            _update_status(*_get_supp(upix))
 
     log.info('Done...t={:.1f}s'.format(time()-start))
 
-    return supp
+    # ADM if writing per-pixel, finish with the index of the files...
+    if outfile is not None:
+        if len(outinfo) > 0:
+            pixels, nrows, fns = zip(*outinfo)
+        else:
+            pixels, nrows, fns = [], [], []
+        _write_hp_index(hpdirname, root, nsidegaia, pixels, nrows, fns)
+        return hpdirname
+
+    # ADM ...otherwise concatenate the results into one rec array.
+    return np.concatenate(done)
 
 
 def select_skies(survey, numproc=16, nskiespersqdeg=None, bands=['g', 'r', 'z'],
-                 apertures_arcsec=[0.75], nside=2, pixlist=None, writebricks=False):
+                 apertures_arcsec=[0.75], nside=2, pixlist=None, writebricks=False,
+                 checkdir=None, skipfailures=False, timeout=None, failfile=None):
     """Generate skies in parallel for bricks in a Legacy Surveys DR.
 
     Parameters
@@ -978,6 +1231,24 @@ def select_skies(survey, numproc=16, nskiespersqdeg=None, bands=['g', 'r', 'z'],
         from the input `survey` object and is in the form:
         `%(survey.survey_dir)/metrics/%(brick).3s/skies-%(brick)s.fits.gz`
         which is returned by `survey.find_file('skies')`.
+    checkdir : :class:`str`, optional, defaults to ``None``
+        If passed, write the skies for each brick to a checkpoint store in
+        this directory as each brick completes. Bricks already completed in
+        `checkdir` are not reprocessed, so an interrupted run can be resumed,
+        or extended to new bricks. A store can only be resumed with the same
+        `survey`, `nskiespersqdeg`, `bands`, `apertures_arcsec` and `nside`.
+    skipfailures : :class:`boolean`, optional, defaults to ``False``
+        If ``True``, and `numproc` > 1, retry any brick that fails exactly
+        once and, if it fails again, skip it (logging the error) rather
+        than halting the run.
+    timeout : :class:`float`, optional, defaults to ``None``
+        If passed, and `numproc` > 1, any brick that takes longer
+        than this many seconds fails (and, with `skipfailures`, is then
+        retried and skipped). See
+        :meth:`~desitarget.internal.sharedmem.MapReduce.map` for caveats.
+    failfile : :class:`str`, optional, defaults to ``None``
+        If passed, with `skipfailures`, write a manifest of any skipped
+        bricks to `failfile` (see :func:`~desitarget.io.write_failures`).
 
     Returns
     -------
@@ -988,6 +1259,8 @@ def select_skies(survey, numproc=16, nskiespersqdeg=None, bands=['g', 'r', 'z'],
     Notes
     -----
         - Some core code in this module was initially written by Dustin Lang (@dstndstn).
+        - See :func:`~desitarget.io.gather_brick_shards` to assemble the skies
+          in a checkpoint store without processing any bricks.
     """
     # ADM retrieve the bricks of interest for this DR.
     brickdict = get_brick_info([survey.survey_dir])
@@ -1010,6 +1283,19 @@ def select_skies(survey, numproc=16, nskiespersqdeg=None, bands=['g', 'r', 'z'],
             return
         log.info("Processing bricks (nside={}, HEALPixels={}, DRdir={})"
                  .format(nside, pixlist, survey.survey_dir))
+
+    # ADM skip any bricks that were completed in a previous run
+    # ADM (with the same parameters).
+    allbricknames = bricknames
+    if checkdir is not None:
+        check_brick_params(checkdir, survey_dir=survey.survey_dir,
+                           nskiespersqdeg=nskiespersqdeg, bands=bands,
+                           apertures_arcsec=apertures_arcsec, nside=nside)
+        done = read_brick_manifest(checkdir)
+        bricknames = np.array([bn for bn in bricknames if bn not in done])
+        log.info('{} of {} bricks already completed in {}'
+                 .format(len(allbricknames)-len(bricknames),
+                         len(allbricknames), checkdir))
     nbricks = len(bricknames)
     log.info('Processing {} bricks that have observations from DR at {}...t = {:.1f}s'
              .format(nbricks, survey.survey_dir, time()-start))
@@ -1022,10 +1308,17 @@ def select_skies(survey, numproc=16, nskiespersqdeg=None, bands=['g', 'r', 'z'],
     def _get_skies(brickname):
         '''wrapper on make_skies_for_a_brick() given a brick name'''
 
-        return make_skies_for_a_brick(survey, brickname,
-                                      nskiespersqdeg=nskiespersqdeg, bands=bands,
-                                      apertures_arcsec=apertures_arcsec,
-                                      write=writebricks)
+        skies = make_skies_for_a_brick(survey, brickname,
+                                       nskiespersqdeg=nskiespersqdeg, bands=bands,
+                                       apertures_arcsec=apertures_arcsec,
+                                       write=writebricks)
+
+        # ADM if checkpointing, write the brick from the worker and
+        # ADM just pass back the brick name and number of rows.
+        if checkdir is not None:
+            return [brickname, write_brick_shard(checkdir, brickname, skies)]
+
+        return skies
 
     # ADM this is just in order to count bricks in _update_status.
     nbrick = np.zeros((), dtype='i8')
@@ -1041,23 +1334,51 @@ def select_skies(survey, numproc=16, nskiespersqdeg=None, bands=['g', 'r', 'z'],
             log.info('{}/{} bricks; {:.1f} bricks/sec; {:.1f} total mins elapsed'
                      .format(nbrick, nbricks, rate, elapsed/60.))
 
+        # ADM record completed bricks in the checkpoint manifest.
+        if checkdir is not None:
+            update_brick_manifest(checkdir, *result)
+
         nbrick[...] += 1    # this is an in-place modification.
         return result
 
     # - Parallel process input files.
     if numproc > 1:
+        # ADM bricks with larger blob maps have more structure, and take
+        # ADM longer, so use the file sizes as a hint to process them first.
+        costs = []
+        for brickname in bricknames:
+            fn = survey.find_file('blobmap', brick=brickname)
+            costs.append(os.path.getsize(fn) if os.path.exists(fn) else 0)
         pool = sharedmem.MapReduce(np=numproc)
         with pool:
-            skies = pool.map(_get_skies, bricknames, reduce=_update_status)
+            skies = pool.map(_get_skies, bricknames, reduce=_update_status,
+                             costs=costs, retries=int(skipfailures),
+                             skip=skipfailures, timeout=timeout)
+        # ADM report any bricks that failed, to be rerun in isolation.
+        failures = pool.failures
+        for f in failures:
+            log.error("Skipped {} after {} attempt(s): {}".format(
+                f["item"], f["attempts"], f["error"]))
+        log.info('Mean (min) process utilization: {:.0%} ({:.0%})'.format(
+            np.mean(pool.stats["utilization"]), np.min(pool.stats["utilization"])))
     else:
         skies = list()
         for brickname in bricknames:
             skies.append(_update_status(_get_skies(brickname)))
+        failures = []
 
-    # ADM some missing blobs may have contaminated the array.
-    skies = [sk for sk in skies if sk is not None]
-    # ADM Concatenate the parallelized results into one rec array.
-    skies = np.concatenate(skies)
+    # ADM record any skipped bricks alongside the output.
+    if skipfailures and failfile is not None:
+        write_failures(failfile, failures)
+
+    if checkdir is not None:
+        # ADM if checkpointing, assemble the skies from the store.
+        skies = gather_brick_shards(checkdir, allbricknames)
+    else:
+        # ADM some missing blobs may have contaminated the array.
+        skies = [sk for sk in skies if sk is not None]
+        # ADM Concatenate the parallelized results into one rec array.
+        skies = np.concatenate(skies)
 
     log.info('Done with (nside={}, HEALPixels={}, DRdir={})...t={:.1f}s'
              .format(nside, pixlist, survey.survey_dir, time()-start))
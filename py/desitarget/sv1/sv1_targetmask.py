@@ -4,19 +4,13 @@ desitarget.sv1.sv1_targetmask
 
 This looks more like a script than an actual module.
 """
-from desiutil.bitmask import BitMask
-from desitarget.targetmask import load_mask_bits
+import sys
+from desitarget.targetmask import _MaskModule
 
-_bitdefs = load_mask_bits("sv1")
-try:
-    desi_mask = BitMask('sv1_desi_mask', _bitdefs)
-    mws_mask = BitMask('sv1_mws_mask', _bitdefs)
-    bgs_mask = BitMask('sv1_bgs_mask', _bitdefs)
-    scnd_mask = BitMask('sv1_scnd_mask', _bitdefs)
-    obsmask = BitMask('sv1_obsmask', _bitdefs)
-except TypeError:
-    desi_mask = object()
-    mws_mask = object()
-    bgs_mask = object()
-    scnd_mask = object()
-    obsmask = object()
+# ADM the BitMasks (and the yaml file) are only loaded when first used.
+_maskprefix = "sv1"
+_masknames = {'desi_mask': 'sv1_desi_mask', 'mws_mask': 'sv1_mws_mask',
+              'bgs_mask': 'sv1_bgs_mask', 'scnd_mask': 'sv1_scnd_mask',
+              'obsmask': 'sv1_obsmask'}
+
+sys.modules[__name__].__class__ = _MaskModule
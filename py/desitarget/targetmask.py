@@ -4,20 +4,71 @@ desitarget.targetmask
 
 This looks more like a script than an actual module.
 """
+import os
+import sys
+import types
+import pickle
+import hashlib
 from desiutil.bitmask import BitMask
-import yaml
-from pkg_resources import resource_filename
 
 
-def load_mask_bits(prefix=""):
+def _mask_cache_file(filepath):
+    """Name of the cache of processed bit definitions for a yaml file.
+    """
+    cachedir = os.getenv('XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+    # ADM include a hash of the full path, in case of multiple installs.
+    pathhash = hashlib.md5(filepath.encode()).hexdigest()[:8]
+    base = os.path.splitext(os.path.basename(filepath))[0]
+
+    return os.path.join(cachedir, 'desitarget',
+                        '{}-{}.pkl'.format(base, pathhash))
+
+
+def _mask_cache_key(filepath):
+    """Key that identifies the version of a yaml file (and of this module).
+    """
+    return [(fn, os.stat(fn).st_size, os.stat(fn).st_mtime_ns)
+            for fn in (filepath, os.path.abspath(__file__))]
+
+
+def load_mask_bits(prefix="", cache=True):
     """Load bit definitions from yaml file.
+
+    Parameters
+    ----------
+    prefix : :class:`str`, optional, defaults to ""
+        The survey for which to load bits, e.g. "sv1" or "cmx", or ""
+        for the main survey.
+    cache : :class:`bool`, optional, defaults to ``True``
+        If ``True``, then load the processed bit definitions from a
+        cache (in $XDG_CACHE_HOME/desitarget or ~/.cache/desitarget)
+        that is rebuilt whenever the yaml file changes.
+
+    Returns
+    -------
+    :class:`dict`
+        The bit definitions, with priorities and numobs processed.
     """
     us = ""
     if len(prefix) > 0:
         us = '_'
     prename = prefix+us
-    fn = "{}/data/{}targetmask.yaml".format(prefix, prename)
-    _filepath = resource_filename('desitarget', fn)
+    _filepath = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             prefix, 'data', '{}targetmask.yaml'.format(prename))
+
+    # ADM load the cached bit definitions, if they're up-to-date.
+    if cache:
+        cachefn = _mask_cache_file(_filepath)
+        try:
+            with open(cachefn, 'rb') as fx:
+                key, bitdefs = pickle.load(fx)
+            if key == _mask_cache_key(_filepath):
+                return bitdefs
+        except Exception:
+            pass
+
+    # ADM only import yaml if it's actually needed.
+    import yaml
     with open(_filepath) as fx:
         bitdefs = yaml.safe_load(fx)
         try:
@@ -28,9 +79,49 @@ def load_mask_bits(prefix=""):
             bitdefs = _load_mask_priorities(bitdefs, handle="numobs", prename=prename)
         except TypeError:
             pass
+
+    # ADM write the cache to a temporary file and rename, so that it's
+    # ADM never left partially written. Failing to cache isn't an error.
+    if cache:
+        try:
+            os.makedirs(os.path.dirname(cachefn), exist_ok=True)
+            tmpfn = '{}.tmp{}'.format(cachefn, os.getpid())
+            with open(tmpfn, 'wb') as fx:
+                pickle.dump((_mask_cache_key(_filepath), bitdefs), fx)
+            os.replace(tmpfn, cachefn)
+        except OSError:
+            pass
+
     return bitdefs
 
 
+class _MaskModule(types.ModuleType):
+    """A targetmask module that builds its BitMasks when first accessed.
+
+    Notes
+    -----
+        - The module must define `_maskprefix`, the survey as for
+          :func:`load_mask_bits()`, and `_masknames`, the attribute name
+          of each BitMask mapped to its name in the yaml file.
+    """
+    def __getattr__(self, name):
+        # ADM only called for attributes that don't (yet) exist.
+        if name not in self._masknames and name != '_bitdefs':
+            raise AttributeError("module {!r} has no attribute {!r}".format(
+                self.__name__, name))
+
+        bitdefs = load_mask_bits(self._maskprefix)
+        try:
+            masks = {attr: BitMask(maskname, bitdefs)
+                     for attr, maskname in self._masknames.items()}
+        except TypeError:
+            masks = {attr: object() for attr in self._masknames}
+        self.__dict__.update(masks)
+        self._bitdefs = bitdefs
+
+        return self.__dict__[name]
+
+
 def _load_mask_priorities(bitdefs, handle="priorities", prename=""):
     """Priorities and NUMOBS are defined in the yaml file, but they aren't
     a bitmask and so require some extra processing.
@@ -66,25 +157,15 @@ def _load_mask_priorities(bitdefs, handle="priorities", prename=""):
 
 
 # -convert to BitMask objects
-# if bitdefs is None:
-#     load_bits()
-_bitdefs = load_mask_bits()
-try:
-    desi_mask = BitMask('desi_mask', _bitdefs)
-    mws_mask = BitMask('mws_mask', _bitdefs)
-    bgs_mask = BitMask('bgs_mask', _bitdefs)
-    scnd_mask = BitMask('scnd_mask', _bitdefs)
-    obsconditions = BitMask('obsconditions', _bitdefs)
-    obsmask = BitMask('obsmask', _bitdefs)
-    targetid_mask = BitMask('targetid_mask', _bitdefs)
-except TypeError:
-    desi_mask = object()
-    mws_mask = object()
-    bgs_mask = object()
-    scnd_mask = object()
-    obsconditions = object()
-    obsmask = object()
-    targetid_mask = object()
+# ADM the BitMasks (and the yaml file) are only loaded when first used.
+_maskprefix = ""
+_masknames = {'desi_mask': 'desi_mask', 'mws_mask': 'mws_mask',
+              'bgs_mask': 'bgs_mask', 'scnd_mask': 'scnd_mask',
+              'obsconditions': 'obsconditions', 'obsmask': 'obsmask',
+              'targetid_mask': 'targetid_mask'}
+
+
+sys.modules[__name__].__class__ = _MaskModule
 
 # -------------------------------------------------------------------------
 # -Do some error checking that the bitmasks are consistent with each other
@@ -8,6 +8,7 @@ Presumably this defines targets.
 """
 import numpy as np
 import healpy as hp
+from functools import lru_cache
 import numpy.lib.recfunctions as rfn
 
 from astropy.table import Table
@@ -94,13 +95,10 @@ def encode_targetid(objid=None, brickid=None, release=None,
         nobjs = len(inputs[firstgoodpar])
         intpassed = False
 
-    # ADM set parameters that weren't passed to zerod arrays
+    # ADM skip parameters that weren't passed (they contribute zeros).
     # ADM set integers that were passed to at least 1D arrays
-    for i, param in enumerate(inputs):
-        if param is None:
-            inputs[i] = np.zeros(nobjs, dtype='int64')
-        else:
-            inputs[i] = np.atleast_1d(param)
+    inputs, bitnames = zip(*[(np.atleast_1d(param), bitname) for param, bitname
+                             in zip(inputs, bitnames) if param is not None])
 
     # ADM check passed parameters don't exceed their bit-allowance.
     for param, bitname in zip(inputs, bitnames):
@@ -180,6 +178,40 @@ def decode_targetid(targetid):
     return outputs
 
 
+def subpriority_from_targetid(targetid, seed=616):
+    """Reproducible random SUBPRIORITY values from a hash of TARGETID.
+
+    Parameters
+    ----------
+    targetid : :class:`int` or :class:`~numpy.ndarray`
+        DESI TARGETIDs.
+    seed : :class:`int`, optional, defaults to 616
+        Different seeds produce different (independent) sets of values.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        Floats uniformly distributed over [0, 1), one per `targetid`.
+
+    Notes
+    -----
+        - Each value only depends on its TARGETID and on `seed`, so the
+          same value is produced in any process, for any shard of a
+          catalog, and whatever the order of the rows.
+        - The hash is the finalizer of the SplitMix64 generator (Steele,
+          Lea & Flood 2014) applied to ``TARGETID + seed*0x9E3779B97F4A7C15``.
+          The top 53 bits of the hash make a double.
+    """
+    z = np.atleast_1d(targetid).astype('int64').view('uint64')
+    with np.errstate(over='ignore'):
+        z = z + np.uint64(seed)*np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+
+    return (z >> np.uint64(11)) * 2.**-53
+
+
 def main_cmx_or_sv(targets, rename=False, scnd=False):
     """determine whether a target array is main survey, commissioning, or SV
 
@@ -259,6 +291,148 @@ def main_cmx_or_sv(targets, rename=False, scnd=False):
     return outcolnames, masks, survey
 
 
+def _bit_lookup(bitvalues, baseline, ufunc=np.maximum):
+    """Compile per-bit values into lookup tables for each byte of a bitmask.
+
+    Parameters
+    ----------
+    bitvalues : :class:`~numpy.ndarray`
+        Array of shape (..., 64) of the value for each bit position
+        (and, e.g., each observational state).
+    baseline : :class:`int`
+        The value for a bitmask with no bits set.
+    ufunc : :class:`~numpy.ufunc`, optional, defaults to `np.maximum`
+        How to combine the values of multiple set bits.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        Array of shape (..., 8, 256) of the combined value (including
+        `baseline`) of the bits set in each possible value of each of
+        the 8 bytes of a 64-bit bitmask.
+    """
+    bitvalues = np.asarray(bitvalues)
+    # ADM which bits are set in each possible value of a byte.
+    isset = ((np.arange(256)[:, None] >> np.arange(8)) & 1) == 1
+    bytevalues = bitvalues.reshape(bitvalues.shape[:-1] + (8, 1, 8))
+    lookup = ufunc(ufunc.reduce(np.where(isset, bytevalues, baseline), axis=-1),
+                   baseline)
+    lookup.flags.writeable = False
+
+    return lookup
+
+
+def _apply_bit_lookup(bits, lookup, state=None, ufunc=np.maximum):
+    """Combine the values of the bits set in a bitmask with lookup tables.
+
+    Parameters
+    ----------
+    bits : :class:`~numpy.ndarray`
+        Array of (64-bit integer) bitmasks, e.g. `DESI_TARGET`.
+    lookup : :class:`~numpy.ndarray`
+        Lookup tables of shape (8, 256), or (nstate, 8, 256) if `state`
+        is passed, as made by :func:`_bit_lookup()`.
+    state : :class:`~numpy.ndarray`, optional, defaults to ``None``
+        The index of the first dimension of `lookup` for each of `bits`.
+    ufunc : :class:`~numpy.ufunc`, optional, defaults to `np.maximum`
+        How to combine values, as used to make `lookup`.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        The combined value for each of `bits`.
+
+    Notes
+    -----
+        - Takes at most 8 vectorized passes (one per byte of `bits`),
+          however many bits are set, and skips bytes with no bits
+          that contribute.
+    """
+    bits = np.asarray(bits).astype('i8', copy=False)
+    out = None
+    for byte in range(8):
+        table = lookup[..., byte, :]
+        # ADM skip bytes that only ever give the baseline value.
+        if out is not None and np.all(table == table[..., :1]):
+            continue
+        index = (bits >> (8*byte)) & 255
+        values = table[index] if state is None else table[state, index]
+        out = values if out is None else ufunc(out, values)
+
+    return out
+
+
+@lru_cache(maxsize=None)
+def _obsconditions_lookup(mask):
+    """Lookup tables of OBSCONDITIONS for the bits in a mask.
+    """
+    obscon = np.zeros(64, dtype='i8')
+    for name in mask.names():
+        obscon[mask[name].bitnum] = obsconditions.mask(mask[name].obsconditions)
+
+    return _bit_lookup(obscon, 0, ufunc=np.bitwise_or)
+
+
+@lru_cache(maxsize=None)
+def _initial_priority_numobs_lookup(mask, obscon):
+    """Lookup tables of initial PRIORITY and NUMOBS for the bits in a mask.
+    """
+    obsbits = obsconditions.mask(obscon)
+    # ADM remember that calibs have NUMOBS of -1.
+    priority, numobs = np.zeros(64, dtype='i8'), np.zeros(64, dtype='i8')-1
+    for name in mask.names():
+        # ADM only consider bits with priorities and correct OBSCONDITIONS.
+        if "UNOBS" in mask[name].priorities:
+            obsforname = obsconditions.mask(mask[name].obsconditions)
+            if (obsforname & obsbits) != 0:
+                priority[mask[name].bitnum] = mask[name].priorities["UNOBS"]
+                numobs[mask[name].bitnum] = mask[name].numobs
+
+    return _bit_lookup(priority, 0), _bit_lookup(numobs, -1)
+
+
+@lru_cache(maxsize=None)
+def _calc_priority_lookup(mask, obscon=None, names=None):
+    """Lookup tables of PRIORITY for the bits in a mask in each state.
+
+    Parameters
+    ----------
+    mask : :class:`desiutil.bitmask.BitMask`
+        A targeting bitmask, e.g. `desi_mask`.
+    obscon : :class:`str`, optional, defaults to ``None``
+        Only include bits that can be observed in these conditions. If
+        ``None``, then include bits regardless of their OBSCONDITIONS.
+    names : :class:`tuple`, optional, defaults to ``None``
+        Only include these bit names. If ``None``, include all bits.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        Lookup tables of shape (5, 8, 256) for targets that are
+        unobserved, done, have a good (high-z for QSOs) redshift, have a
+        good (but not high-z) redshift, or have ZWARN set.
+    """
+    if names is None:
+        names = mask.names()
+    states = [["UNOBS"], ["DONE"], ["MORE_ZGOOD"], ["MORE_ZGOOD"], ["MORE_ZWARN"]]
+    # ADM QSOs that don't have a good high-z redshift are treated as DONE.
+    qsostates = [["UNOBS", "DONE"], ["DONE"], ["MORE_ZGOOD"], ["DONE"],
+                 ["MORE_ZWARN", "DONE"]]
+
+    priority = np.zeros((len(states), 64), dtype='i8')
+    for name in names:
+        # ADM only include priorities for passed observing conditions.
+        if obscon is not None:
+            pricon = obsconditions.mask(mask[name].obsconditions)
+            if (obsconditions.mask(obscon) & pricon) == 0:
+                continue
+        prios = mask[name].priorities
+        for i, keys in enumerate(qsostates if name == 'QSO' else states):
+            priority[i, mask[name].bitnum] = max([prios[key] for key in keys])
+
+    return _bit_lookup(priority, 0)
+
+
 def set_obsconditions(targets, scnd=False):
     """set the OBSCONDITIONS mask for each target bit.
 
@@ -292,12 +466,9 @@ def set_obsconditions(targets, scnd=False):
     n = len(targets)
     obscon = np.zeros(n, dtype='i4')
     for mask, xxx_target in zip(masks, colnames):
-        for name in mask.names():
-            # ADM which targets have this bit for this mask set?
-            ii = (targets[xxx_target] & mask[name]) != 0
-            # ADM under what conditions can that bit be observed?
-            if np.any(ii):
-                obscon[ii] |= obsconditions.mask(mask[name].obsconditions)
+        # ADM under what conditions can the bits for each target be observed?
+        obscon |= _apply_bit_lookup(targets[xxx_target], _obsconditions_lookup(mask),
+                                    ufunc=np.bitwise_or).astype('i4')
 
     return obscon
 
@@ -337,6 +508,8 @@ def initial_priority_numobs(targets, scnd=False,
           `desi_mask["ELG"].priorities["UNOBS"]`.
         - the input obscon string can be converted to a bitmask using
           `desitarget.targetmask.obsconditions.mask(blat)`.
+        - the priorities and numbers of observations for each bit are
+          compiled into lookup tables once for each mask and `obscon`.
     """
     colnames, masks, _ = main_cmx_or_sv(targets, scnd=scnd)
     # ADM if we requested secondary targets, the needed information
@@ -349,40 +522,14 @@ def initial_priority_numobs(targets, scnd=False,
     # ADM remember that calibs have NUMOBS of -1.
     outnumobs = np.zeros(len(targets), dtype='int')-1
 
-    # ADM convert the passed obscon string to bits.
-    obsbits = obsconditions.mask(obscon)
-
-    # ADM loop through the masks to establish all bitnames of interest.
+    # ADM update with the highest priority and the largest value of
+    # ADM NUMOBS for the bits that are set in each column.
     for colname, mask in zip(colnames, masks):
-        # ADM first determine which bits actually have priorities.
-        bitnames = []
-        for name in mask.names():
-            try:
-                _ = mask[name].priorities["UNOBS"]
-                # ADM also only consider bits with correct OBSCONDITIONS.
-                obsforname = obsconditions.mask(mask[name].obsconditions)
-                if (obsforname & obsbits) != 0:
-                    bitnames.append(name)
-            except KeyError:
-                pass
-
-        # ADM loop through the relevant bits updating with the highest
-        # ADM priority and the largest value of NUMOBS.
-        for name in bitnames:
-            # ADM indexes in the DESI/MWS/BGS_TARGET column that have this bit set
-            istarget = (targets[colname] & mask[name]) != 0
-            # ADM for each index, determine where this bit is set and the priority
-            # ADM for this bit is > than the currently stored priority.
-            w = np.where((mask[name].priorities['UNOBS'] >= outpriority) & istarget)[0]
-            # ADM where a larger priority trumps the stored priority, update the priority
-            if len(w) > 0:
-                outpriority[w] = mask[name].priorities['UNOBS']
-            # ADM for each index, determine where this bit is set and whether NUMOBS
-            # ADM for this bit is > than the currently stored NUMOBS.
-            w = np.where((mask[name].numobs >= outnumobs) & istarget)[0]
-            # ADM where a larger NUMOBS trumps the stored NUMOBS, update NUMOBS.
-            if len(w) > 0:
-                outnumobs[w] = mask[name].numobs
+        priolookup, numobslookup = _initial_priority_numobs_lookup(mask, obscon)
+        outpriority = np.maximum(
+            outpriority, _apply_bit_lookup(targets[colname], priolookup))
+        outnumobs = np.maximum(
+            outnumobs, _apply_bit_lookup(targets[colname], numobslookup))
 
     return outpriority, outnumobs
 
@@ -418,6 +565,8 @@ def calc_priority(targets, zcat, obscon):
         - If a target passes multiple selections, highest priority wins.
         - Will automatically detect if the passed targets are main
           survey, commissioning or SV and behave accordingly.
+        - The priorities for each bit are compiled into lookup tables
+          once for each mask and `obscon`.
     """
     # ADM check the input arrays are the same length.
     assert len(targets) == len(zcat)
@@ -460,75 +609,31 @@ def calc_priority(targets, zcat, obscon):
     assert not np.any(zwarn & done)
     assert np.all(unobs | done | zgood | zwarn)
 
-    # DESI dark time targets.
+    # ADM the state of each target, which sets the priority of each bit.
+    # ADM QSOs need a good high-z redshift (any good redshift in SV).
+    good_hiz = zgood & (zcat['Z'] >= 2.15) & (zcat['ZWARN'] == 0)
+    if survey[0:2] == 'sv':
+        good_hiz = zgood & (zcat['ZWARN'] == 0)
+    state = np.zeros(len(targets), dtype='i1')
+    state[done] = 1
+    state[good_hiz] = 2
+    state[zgood & ~good_hiz] = 3
+    state[zwarn] = 4
+
     if survey != 'cmx':
-        if desi_target in targets.dtype.names:
-            # ADM 'LRG' is the guiding column in SV and the main survey
-            # ADM (once, it was 'LRG_1PASS' and 'LRG_2PASS' in the MS).
-            # names = ('ELG', 'LRG_1PASS', 'LRG_2PASS')
-            # if survey[0:2] == 'sv':
-            names = ('ELG', 'LRG')
-            for name in names:
-                # ADM only update priorities for passed observing conditions.
-                pricon = obsconditions.mask(desi_mask[name].obsconditions)
-                if (obsconditions.mask(obscon) & pricon) != 0:
-                    ii = (targets[desi_target] & desi_mask[name]) != 0
-                    priority[ii & unobs] = np.maximum(priority[ii & unobs], desi_mask[name].priorities['UNOBS'])
-                    priority[ii & done] = np.maximum(priority[ii & done],  desi_mask[name].priorities['DONE'])
-                    priority[ii & zgood] = np.maximum(priority[ii & zgood], desi_mask[name].priorities['MORE_ZGOOD'])
-                    priority[ii & zwarn] = np.maximum(priority[ii & zwarn], desi_mask[name].priorities['MORE_ZWARN'])
-
-            # QSO could be Lyman-alpha or Tracer.
-            name = 'QSO'
-            # ADM only update priorities for passed observing conditions.
-            pricon = obsconditions.mask(desi_mask[name].obsconditions)
-            if (obsconditions.mask(obscon) & pricon) != 0:
-                ii = (targets[desi_target] & desi_mask[name]) != 0
-                # ADM all redshifts require more observations in SV.
-                good_hiz = zgood & (zcat['Z'] >= 2.15) & (zcat['ZWARN'] == 0)
-                if survey[0:2] == 'sv':
-                    good_hiz = zgood & (zcat['ZWARN'] == 0)
-                priority[ii & unobs] = np.maximum(priority[ii & unobs], desi_mask[name].priorities['UNOBS'])
-                priority[ii & done] = np.maximum(priority[ii & done], desi_mask[name].priorities['DONE'])
-                priority[ii & good_hiz] = np.maximum(priority[ii & good_hiz], desi_mask[name].priorities['MORE_ZGOOD'])
-                priority[ii & ~good_hiz] = np.maximum(priority[ii & ~good_hiz], desi_mask[name].priorities['DONE'])
-                priority[ii & zwarn] = np.maximum(priority[ii & zwarn], desi_mask[name].priorities['MORE_ZWARN'])
-
-        # BGS targets.
-        if bgs_target in targets.dtype.names:
-            for name in bgs_mask.names():
-                # ADM only update priorities for passed observing conditions.
-                pricon = obsconditions.mask(bgs_mask[name].obsconditions)
-                if (obsconditions.mask(obscon) & pricon) != 0:
-                    ii = (targets[bgs_target] & bgs_mask[name]) != 0
-                    priority[ii & unobs] = np.maximum(priority[ii & unobs], bgs_mask[name].priorities['UNOBS'])
-                    priority[ii & done] = np.maximum(priority[ii & done],  bgs_mask[name].priorities['DONE'])
-                    priority[ii & zgood] = np.maximum(priority[ii & zgood], bgs_mask[name].priorities['MORE_ZGOOD'])
-                    priority[ii & zwarn] = np.maximum(priority[ii & zwarn], bgs_mask[name].priorities['MORE_ZWARN'])
-
-        # MWS targets.
-        if mws_target in targets.dtype.names:
-            for name in mws_mask.names():
-                # ADM only update priorities for passed observing conditions.
-                pricon = obsconditions.mask(mws_mask[name].obsconditions)
-                if (obsconditions.mask(obscon) & pricon) != 0:
-                    ii = (targets[mws_target] & mws_mask[name]) != 0
-                    priority[ii & unobs] = np.maximum(priority[ii & unobs], mws_mask[name].priorities['UNOBS'])
-                    priority[ii & done] = np.maximum(priority[ii & done],  mws_mask[name].priorities['DONE'])
-                    priority[ii & zgood] = np.maximum(priority[ii & zgood], mws_mask[name].priorities['MORE_ZGOOD'])
-                    priority[ii & zwarn] = np.maximum(priority[ii & zwarn], mws_mask[name].priorities['MORE_ZWARN'])
-
-        # ADM Secondary targets.
-        if scnd_target in targets.dtype.names:
-            for name in scnd_mask.names():
-                # ADM only update priorities for passed observing conditions.
-                pricon = obsconditions.mask(scnd_mask[name].obsconditions)
-                if (obsconditions.mask(obscon) & pricon) != 0:
-                    ii = (targets[scnd_target] & scnd_mask[name]) != 0
-                    priority[ii & unobs] = np.maximum(priority[ii & unobs], scnd_mask[name].priorities['UNOBS'])
-                    priority[ii & done] = np.maximum(priority[ii & done],  scnd_mask[name].priorities['DONE'])
-                    priority[ii & zgood] = np.maximum(priority[ii & zgood], scnd_mask[name].priorities['MORE_ZGOOD'])
-                    priority[ii & zwarn] = np.maximum(priority[ii & zwarn], scnd_mask[name].priorities['MORE_ZWARN'])
+        # ADM only update priorities for passed observing conditions.
+        # ADM 'LRG' is the guiding column in SV and the main survey
+        # ADM (once, it was 'LRG_1PASS' and 'LRG_2PASS' in the MS).
+        # ADM QSO could be Lyman-alpha or Tracer.
+        lookups = [_calc_priority_lookup(desi_mask, obscon, ('ELG', 'LRG', 'QSO')),
+                   _calc_priority_lookup(bgs_mask, obscon),
+                   _calc_priority_lookup(mws_mask, obscon),
+                   _calc_priority_lookup(scnd_mask, obscon)]
+        # DESI dark time targets, BGS, MWS and secondary targets.
+        for colname, lookup in zip(colnames, lookups):
+            if colname in targets.dtype.names:
+                priority = np.maximum(priority, _apply_bit_lookup(
+                    targets[colname], lookup, state=state))
 
         # Special case: IN_BRIGHT_OBJECT means priority=-1 no matter what
         ii = (targets[desi_target] & desi_mask.IN_BRIGHT_OBJECT) != 0
@@ -536,12 +641,10 @@ def calc_priority(targets, zcat, obscon):
 
     # ADM Special case: SV-like commissioning targets.
     if 'CMX_TARGET' in targets.dtype.names:
-        for name in ['SV0_' + label for label in ('BGS', 'MWS')]:
-            ii = (targets['CMX_TARGET'] & cmx_mask[name]) != 0
-            priority[ii & unobs] = np.maximum(priority[ii & unobs], cmx_mask[name].priorities['UNOBS'])
-            priority[ii & done] = np.maximum(priority[ii & done],  cmx_mask[name].priorities['DONE'])
-            priority[ii & zgood] = np.maximum(priority[ii & zgood], cmx_mask[name].priorities['MORE_ZGOOD'])
-            priority[ii & zwarn] = np.maximum(priority[ii & zwarn], cmx_mask[name].priorities['MORE_ZWARN'])
+        names = tuple(['SV0_' + label for label in ('BGS', 'MWS')])
+        lookup = _calc_priority_lookup(cmx_mask, names=names)
+        priority = np.maximum(priority, _apply_bit_lookup(
+            targets['CMX_TARGET'], lookup, state=state))
 
     return priority
 
@@ -601,6 +704,63 @@ def resolve(targets):
     return targets[keep]
 
 
+def is_unique(values):
+    """Check whether every entry in an array is unique.
+
+    Parameters
+    ----------
+    values : :class:`~numpy.ndarray`
+        A 1-D array, e.g. of `TARGETID`.
+
+    Returns
+    -------
+    :class:`bool`
+        ``True`` if no value appears more than once in `values`.
+
+    Notes
+    -----
+        - Sorts a copy of `values` rather than building a Python set,
+          which is much faster for large arrays of integers.
+    """
+    values = np.sort(values)
+
+    return not np.any(values[1:] == values[:-1])
+
+
+def _finalize_dtype(dtype, cols, forms):
+    """The output dtype for :func:`finalize()`.
+
+    Parameters
+    ----------
+    dtype : :class:`~numpy.dtype`
+        The dtype of the targets passed to :func:`finalize()`.
+    cols : :class:`list`
+        Names of the new columns to add.
+    forms : :class:`list`
+        Formats of the new columns to add.
+
+    Returns
+    -------
+    :class:`~numpy.dtype`
+        `dtype` with OBJID renamed to BRICK_OBJID and TYPE renamed to
+        MORPHTYPE, and `cols` appended. The columns from `dtype` retain
+        their offsets, so `dtype` is the leading part of each row.
+    """
+    rename = {'OBJID': 'BRICK_OBJID', 'TYPE': 'MORPHTYPE'}
+    names = [rename.get(name, name) for name in dtype.names]
+    formats = [dtype.fields[name][0] for name in dtype.names]
+    offsets = [dtype.fields[name][1] for name in dtype.names]
+    itemsize = dtype.itemsize
+    for col, form in zip(cols, forms):
+        names.append(col)
+        formats.append(form)
+        offsets.append(itemsize)
+        itemsize += np.dtype(form).itemsize
+
+    return np.dtype({"names": names, "formats": formats,
+                     "offsets": offsets, "itemsize": itemsize})
+
+
 def finalize(targets, desi_target, bgs_target, mws_target,
              sky=0, survey='main', darkbright=False, gaiadr=None,
              targetid=None):
@@ -662,11 +822,6 @@ def finalize(targets, desi_target, bgs_target, mws_target,
     assert ntargets == len(bgs_target)
     assert ntargets == len(mws_target)
 
-    # - OBJID in tractor files is only unique within the brick; rename and
-    # - create a new unique TARGETID
-    targets = rfn.rename_fields(targets,
-                                {'OBJID': 'BRICK_OBJID', 'TYPE': 'MORPHTYPE'})
-
     # allow TARGETID to be passed as an input (specifically for the mocks).
     if targetid is None:
         if gaiadr is not None:
@@ -676,7 +831,7 @@ def finalize(targets, desi_target, bgs_target, mws_target,
                                        sky=sky,
                                        gaiadr=gaiadr)
         else:
-            targetid = encode_targetid(objid=targets['BRICK_OBJID'],
+            targetid = encode_targetid(objid=targets['OBJID'],
                                        brickid=targets['BRICKID'],
                                        release=targets['RELEASE'],
                                        sky=sky)
@@ -716,11 +871,19 @@ def finalize(targets, desi_target, bgs_target, mws_target,
         vals += [nodata, nodata]
         forms += ['>i8', '>i8']
 
-    # ADM write the output array.
-    newdt = [dt for dt in zip(cols, forms)]
-    done = np.array(np.zeros(len(targets)), dtype=targets.dtype.descr+newdt)
-    for col in targets.dtype.names:
-        done[col] = targets[col]
+    # ADM write the output array. OBJID in tractor files is only unique
+    # ADM within the brick; rename it (and TYPE) in the output.
+    done = np.empty(ntargets, dtype=_finalize_dtype(targets.dtype, cols, forms))
+    if type(targets) is np.ndarray and not targets.dtype.hasobject:
+        # ADM the input columns have the same layout in the output, so
+        # ADM they can be copied as a single block of bytes.
+        inbytes = np.ascontiguousarray(targets).view(np.uint8)
+        outbytes = done.view(np.uint8).reshape(ntargets, done.dtype.itemsize)
+        outbytes[:, :targets.dtype.itemsize] = inbytes.reshape(
+            ntargets, targets.dtype.itemsize)
+    else:
+        for col, newcol in zip(targets.dtype.names, done.dtype.names):
+            done[newcol] = targets[col]
     for col, val in zip(cols, vals):
         done[col] = val
 
@@ -734,7 +897,7 @@ def finalize(targets, desi_target, bgs_target, mws_target,
 
     # ADM some final checks that the targets conform to expectations...
     # ADM check that each target has a unique ID.
-    if len(done["TARGETID"]) != len(set(done["TARGETID"])):
+    if not is_unique(done["TARGETID"]):
         msg = 'TARGETIDs are not unique!'
         log.critical(msg)
         raise AssertionError(msg)
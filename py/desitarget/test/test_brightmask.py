@@ -91,6 +91,26 @@ class TestBRIGHTMASK(unittest.TestCase):
         bs2ids = bs2['BRICKID'].astype(np.int64)*1000000 + bs2['OBJID']
         self.assertTrue(np.all(bs1ids == bs2ids))
 
+    def test_collect_bright_sources_incremental(self):
+        """Test writing bright sources to file as they are collected
+        """
+        # ADM collect the bright sources, holding them in memory...
+        bs1 = brightmask.collect_bright_sources('grz', [9, 9, 9], rootdirname=self.bsdatadir)
+        # ADM ...and writing them to file as they're collected.
+        nbs = brightmask.collect_bright_sources('grz', [9, 9, 9], rootdirname=self.bsdatadir,
+                                                outfilename=self.testbsfile, incremental=True)
+        bs2 = fitsio.read(self.testbsfile)
+        self.assertEqual(nbs, len(bs1))
+        self.assertTrue(np.all(bs1["RA"] == bs2["RA"]))
+        self.assertTrue(np.all(bs1["FLUX_G"] == bs2["FLUX_G"]))
+        # ADM if there are no bright sources, no file is left behind.
+        os.remove(self.testbsfile)
+        with self.assertRaises(IOError):
+            brightmask.collect_bright_sources('grz', [-9, -9, -9], rootdirname=self.bsdatadir,
+                                              outfilename=self.testbsfile, incremental=True)
+        self.assertFalse(os.path.exists(self.testbsfile))
+        self.assertFalse(os.path.exists(self.testbsfile+'.tmp'))
+
     def test_make_bright_source_mask(self):
         """Test the construction of a bright source mask
         """
@@ -116,6 +136,21 @@ class TestBRIGHTMASK(unittest.TestCase):
                                         drbricks=self.drbricks)
         self.assertTrue(np.any(targs["DESI_TARGET"] != 0))
 
+    def test_mask_targets_hp(self):
+        """Test that masking targets split by HEALPixel matches serial masking
+        """
+        # ADM create the mask and write it to file
+        mask = brightmask.make_bright_source_mask('RZ', [8, 10],
+                                                  rootdirname=self.bsdatadir, outfilename=self.testmaskfile)
+        # ADM mask the targets serially and in HEALPixel shards
+        targs1 = brightmask.mask_targets(self.masktargs, inmaskfile=self.testmaskfile,
+                                         drbricks=self.drbricks)
+        for numproc in [1, 2]:
+            targs2 = brightmask.mask_targets(self.masktargs, inmaskfile=self.testmaskfile,
+                                             drbricks=self.drbricks, numproc=numproc,
+                                             nsideshard=16)
+            self.assertTrue(np.all(targs1 == targs2))
+
     def test_non_mask_targets(self):
         """Test that targets that are NOT in masks are flagged as not being in masks
         """
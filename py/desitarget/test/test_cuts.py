@@ -5,6 +5,8 @@
 import unittest
 from pkg_resources import resource_filename
 import os.path
+import shutil
+import tempfile
 from uuid import uuid4
 import numbers
 
@@ -321,6 +323,28 @@ class TestCuts(unittest.TestCase):
                 bgs2 = targets['BGS_TARGET'] != 0
                 self.assertTrue(np.all(bgs1 == bgs2))
 
+    def test_skipfailures(self):
+        """Test that skipped input files are recorded in a manifest
+        """
+        tc = ["ELG", "BGS"]
+        testdir = tempfile.mkdtemp()
+        try:
+            # ADM a "sweep" file that can't be read.
+            badfile = os.path.join(testdir, "sweep-000p000-010p005.fits")
+            with open(badfile, "w") as f:
+                f.write("not a FITS file")
+            failfile = os.path.join(testdir, "targets-failures.txt")
+            targets = cuts.select_targets(self.sweepfiles[:1] + [badfile],
+                                          numproc=2, tcnames=tc,
+                                          skipfailures=True, failfile=failfile)
+            t1 = cuts.select_targets(self.sweepfiles[:1], numproc=1, tcnames=tc)
+            self.assertTrue(np.all(targets == t1))
+            with open(failfile) as f:
+                skipped = [line.split()[0] for line in f if line[0] != "#"]
+            self.assertEqual(skipped, [badfile])
+        finally:
+            shutil.rmtree(testdir)
+
     def test_targets_spatial(self):
         """Test applying RA/Dec/HEALpixel inputs to sweeps recovers same targets
         """
@@ -0,0 +1,173 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# -*- coding: utf-8 -*-
+"""Test desitarget.gfa.
+"""
+import unittest
+import os
+import shutil
+import tempfile
+from glob import glob
+from pkg_resources import resource_filename
+import numpy as np
+import healpy as hp
+import fitsio
+
+from astropy.coordinates import SkyCoord
+import astropy.units as u
+
+from desitarget import gfa
+from desitarget.geomask import is_in_box, is_in_gal_box, is_in_hp
+from desitarget.uratmatch import uratdatamodel
+
+
+class TestGFA(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # ADM Gaia healpix files.
+        cls.gaiafiles = sorted(glob(
+            resource_filename('desitarget.test', 't4/healpix/*fits')))
+
+        # ADM random locations on the sphere.
+        np.random.seed(616)
+        n = 200000
+        cls.objs = np.zeros(n, dtype=[('RA', 'f8'), ('DEC', 'f8')])
+        cls.objs["RA"] = np.random.uniform(0, 360, n)
+        cls.objs["DEC"] = np.degrees(np.arcsin(np.random.uniform(-1, 1, n)))
+
+    def test_galactic_b(self):
+        """Test Galactic latitude against the astropy transformation.
+        """
+        c = SkyCoord(self.objs["RA"]*u.degree, self.objs["DEC"]*u.degree)
+        b = gfa.galactic_b(self.objs["RA"], self.objs["DEC"])
+        self.assertTrue(np.allclose(b, c.galactic.b.value, rtol=0, atol=1e-9))
+
+    def test_gaia_pixel_status(self):
+        """Test that pixels in (out of) the footprint only have objects in (out).
+        """
+        gpix = hp.ang2pix(32, np.radians(90-self.objs["DEC"]),
+                          np.radians(self.objs["RA"]), nest=True)
+        for mindec, mingalb, nside, pixlist in [(-30, 10, None, None),
+                                                (-89.9, 30, 4, [5, 6, 77]),
+                                                (10, 5, 64, range(900, 5000))]:
+            status = gfa.gaia_pixel_status(mindec, mingalb, nside, pixlist)
+            good = is_in_box(self.objs, [0., 360., mindec, 90.])
+            good &= ~is_in_gal_box(self.objs, [0., 360., -mingalb, mingalb])
+            if pixlist is not None:
+                good &= is_in_hp(self.objs, nside, pixlist)
+            self.assertTrue(np.all(good[status[gpix] == 1]))
+            self.assertFalse(np.any(good[status[gpix] == 0]))
+            # ADM only a small fraction of pixels should be on the edge.
+            self.assertTrue(np.sum(status == -1) < 0.1*len(status))
+
+    def test_gaia_in_file(self):
+        """Test the constraints on Gaia objects read from file.
+        """
+        for fn in self.gaiafiles:
+            allobjs = gfa.gaia_in_file(fn, maglim=30, mindec=-90, mingalb=0)
+            for mindec, mingalb in [(-30, 10), (-2, 0), (-1, 60)]:
+                objs = gfa.gaia_in_file(fn, maglim=30, mindec=mindec,
+                                        mingalb=mingalb)
+                good = is_in_box(allobjs, [0., 360., mindec, 90.])
+                if mingalb > 0:
+                    good &= ~is_in_gal_box(
+                        allobjs, [0., 360., -mingalb, mingalb])
+                self.assertTrue(np.all(objs == allobjs[good]))
+
+    def test_add_urat_pms(self):
+        """Test URAT matching retains the order of the input objects.
+        """
+        # ADM write some fake URAT healpix files.
+        uratdir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(uratdir, "healpix"))
+        urat = np.zeros(2000, dtype=uratdatamodel.dtype)
+        urat["URAT_ID"] = np.arange(2000)
+        urat["RA"] = np.random.uniform(150, 160, 2000)
+        urat["DEC"] = np.random.uniform(10, 20, 2000)
+        urat["PMRA"] = np.random.normal(0, 10, 2000)
+        pix = hp.ang2pix(32, np.radians(90-urat["DEC"]),
+                         np.radians(urat["RA"]), nest=True)
+        for p in set(pix):
+            fitsio.write(os.path.join(
+                uratdir, "healpix", "healpix-{:05d}.fits".format(p)),
+                urat[pix == p])
+        uratdir_orig = os.environ.get("URAT_DIR")
+        os.environ["URAT_DIR"] = uratdir
+
+        # ADM objects at URAT locations (in a random order) and far away.
+        ii = np.random.permutation(2000)[:1000]
+        objs = np.zeros(1500, dtype=gfa.gfadatamodel.dtype)
+        objs["RA"][:1000], objs["DEC"][:1000] = urat["RA"][ii], urat["DEC"][ii]
+        objs["DEC"][:1000] += 0.1/3600.
+        objs["RA"][1000:], objs["DEC"][1000:] = 170., 20.
+        try:
+            for numproc in 1, 2:
+                pms = gfa.add_urat_pms(objs, numproc=numproc)
+                self.assertTrue(np.all(pms["URAT_ID"][:1000] == ii))
+                self.assertTrue(np.all(pms["PMRA"][:1000] == urat["PMRA"][ii]))
+                self.assertTrue(np.allclose(pms["URAT_SEP"][:1000], 0.1))
+                self.assertTrue(np.all(pms["URAT_ID"][1000:] == -1))
+        finally:
+            if uratdir_orig is None:
+                del os.environ["URAT_DIR"]
+            else:
+                os.environ["URAT_DIR"] = uratdir_orig
+            shutil.rmtree(uratdir)
+
+    def test_gfa_cache(self):
+        """Test that cached GFAs match and only changed pixels are recomputed.
+        """
+        # ADM a writable copy of the Gaia files, and a cache directory.
+        testdir = tempfile.mkdtemp()
+        shutil.copytree(os.path.dirname(self.gaiafiles[0]),
+                        os.path.join(testdir, "gaia", "healpix"))
+        gaiadir_orig = os.environ.get("GAIA_DIR")
+        os.environ["GAIA_DIR"] = os.path.join(testdir, "gaia")
+        cachedir = os.path.join(testdir, "cache")
+
+        sweepfiles = sorted(glob(
+            resource_filename('desitarget.test', 't/sweep*fits')))
+        pixlist = [gfa._gaia_file_pixel(fn) for fn in self.gaiafiles]
+        kwargs = {"numproc": 1, "nside": 32, "pixlist": pixlist,
+                  "addurat": False}
+        try:
+            for maglim in 21, 19:
+                gfas = np.sort(gfa.select_gfas(
+                    sweepfiles, maglim=maglim, **kwargs), order="REF_ID")
+                for i in range(2):
+                    cgfas = gfa.select_gfas(sweepfiles, maglim=maglim,
+                                            cachedir=cachedir, **kwargs)
+                    self.assertTrue(np.all(cgfas == gfas))
+            self.assertEqual(len(os.listdir(cachedir)), len(pixlist))
+
+            # ADM only the pixel with an updated Gaia file is recomputed.
+            cfns = [os.path.join(cachedir, "gfas-hp-{:05d}.npz".format(pix))
+                    for pix in pixlist]
+            mtimes = [os.stat(cfn).st_mtime_ns for cfn in cfns]
+            gaiafn = os.path.join(testdir, "gaia", "healpix",
+                                  os.path.basename(self.gaiafiles[0]))
+            os.utime(gaiafn, ns=(mtimes[0]+10**9, mtimes[0]+10**9))
+            cgfas = gfa.select_gfas(sweepfiles, maglim=maglim,
+                                    cachedir=cachedir, **kwargs)
+            self.assertTrue(np.all(cgfas == gfas))
+            newmtimes = [os.stat(cfn).st_mtime_ns for cfn in cfns]
+            self.assertEqual([m1 != m2 for m1, m2 in zip(mtimes, newmtimes)],
+                             [True] + [False]*(len(pixlist)-1))
+        finally:
+            if gaiadir_orig is None:
+                del os.environ["GAIA_DIR"]
+            else:
+                os.environ["GAIA_DIR"] = gaiadir_orig
+            shutil.rmtree(testdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+def test_suite():
+    """Allows testing of only this module with the command:
+
+        python setup.py test -m desitarget.test.test_gfa
+    """
+    return unittest.defaultTestLoader.loadTestsFromName(__name__)
@@ -3,6 +3,8 @@
 """Test desitarget.io.
 """
 import unittest
+import shutil
+import tempfile
 from pkg_resources import resource_filename
 import os.path
 from uuid import uuid4
@@ -123,6 +125,145 @@ class TestIO(unittest.TestCase):
         self.assertEqual(io.brickname_from_filename('tractor-3301p002.fits'), '3301p002')
         self.assertEqual(io.brickname_from_filename('/a/b/tractor-3301p002.fits'), '3301p002')
 
+    def test_write_fits_table(self):
+        """Test preallocated FITS writes are identical to fitsio.write.
+        """
+        data = np.zeros(1000, dtype=[('ID', '>i8'), ('RA', '<f8'), ('NAME', 'U4'),
+                                     ('FLUX', '<f4', (2, 3)), ('FLAG', 'u1')])
+        data["ID"] = np.arange(1000)
+        data["RA"] = np.random.uniform(0, 360, 1000)
+        data["NAME"] = "blat"
+        data["FLUX"] = np.random.random((1000, 2, 3))
+        data["FLAG"] = 7
+        hdr = fitsio.FITSHDR()
+        hdr["SURVEY"] = "main"
+        reffile = 'test-{}.fits'.format(uuid4().hex)
+        try:
+            fitsio.write(reffile, data, extname='TARGETS', header=hdr)
+            with open(reffile, 'rb') as f:
+                ref = f.read()
+            for nchunks, numproc in (None, 1), (7, 1), (3, 2):
+                nrows = io.write_fits_table(self.testfile, data, extname='TARGETS',
+                                            header=hdr, nchunks=nchunks, numproc=numproc)
+                self.assertEqual(nrows, len(data))
+                with open(self.testfile, 'rb') as f:
+                    self.assertEqual(f.read(), ref)
+
+            # ADM gathering files with the same columns, including an
+            # ADM empty file, recovers the concatenated data.
+            fitsio.write(reffile, data[:0], extname='TARGETS', clobber=True)
+            infiles = [self.testfile, reffile, self.testfile]
+            for numproc in 1, 2:
+                gathered = 'test-{}.fits'.format(uuid4().hex)
+                try:
+                    nrows = io.gather_fits(infiles, gathered, extname='TARGETS',
+                                           numproc=numproc, chunksize=300)
+                    self.assertEqual(nrows, 2*len(data))
+                    out, outhdr = fitsio.read(gathered, header=True)
+                    self.assertEqual(outhdr["SURVEY"], "main")
+                    self.assertTrue(np.all(out[:1000] == data))
+                    self.assertTrue(np.all(out[1000:] == data))
+                finally:
+                    os.remove(gathered)
+
+            # ADM files with different columns can't be gathered.
+            fitsio.write(reffile, data[['ID', 'RA']], extname='TARGETS', clobber=True)
+            with self.assertRaises(ValueError):
+                io.gather_fits(infiles, reffile+'.out')
+        finally:
+            os.remove(reffile)
+
+        # ADM columns that fitsio converts (e.g. booleans) are still written.
+        data = np.zeros(10, dtype=[('GOOD', '?'), ('N', '>u4')])
+        data["GOOD"][::3] = True
+        data["N"] = 2**32 - 1
+        io.write_fits_table(self.testfile, data, nchunks=3, numproc=2)
+        out = fitsio.read(self.testfile)
+        self.assertTrue(np.all(out["GOOD"] == data["GOOD"]))
+        self.assertTrue(np.all(out["N"] == data["N"]))
+
+    def test_write_hp_split(self):
+        """Test writing a file per HEALPixel in one pass.
+        """
+        np.random.seed(616)
+        data = np.zeros(5000, dtype=[('RA', '>f8'), ('DEC', '>f8'), ('RELEASE', '>i2'),
+                                     ('TARGETID', '>i8'), ('SUBPRIORITY', '>f8')])
+        data["RA"] = np.random.uniform(0, 360, 5000)
+        data["DEC"] = np.degrees(np.arcsin(np.random.uniform(-1, 1, 5000)))
+        data["RELEASE"] = 8000
+        data["TARGETID"] = np.arange(5000)
+        nside = 2
+        testdir = tempfile.mkdtemp()
+        try:
+            fn = os.path.join(testdir, "targets.fits")
+            # ADM an unsplit file and an earlier split at a different
+            # ADM nside shouldn't be read as part of the split.
+            io.write_targets(fn, data[:10], qso_selection="colorcuts")
+            io.write_targets(fn, data, hpxsplit=1, qso_selection="colorcuts")
+            ntargs, hpdirname = io.write_targets(fn, data, hpxsplit=nside,
+                                                 qso_selection="colorcuts")
+            self.assertEqual(ntargs, len(data))
+            self.assertEqual(hpdirname, os.path.join(testdir, "targets-hp"))
+            # ADM the directory is read as a HEALPix-split directory...
+            filensid, filedict = io.check_hp_target_dir(hpdirname)
+            self.assertEqual(filensid, nside)
+            self.assertEqual(len(filedict), 12*nside**2)
+            # ADM ...with targets in the correct files.
+            for pix in [0, 17, 47]:
+                targs = io.read_targets_in_hp(hpdirname, nside, [pix])
+                hdr = fitsio.read_header(filedict[pix], 'TARGETS')
+                self.assertEqual(len(targs), hdr["NAXIS2"])
+                ii = io.is_in_hp(data, nside, [pix])
+                self.assertTrue(np.all(np.sort(targs["TARGETID"]) == data["TARGETID"][ii]))
+            # ADM the index records every file and row.
+            index = np.loadtxt(os.path.join(hpdirname, "targets-hp-index.txt"),
+                               dtype=[('PIX', 'i8'), ('NROWS', 'i8'), ('FN', 'U30')])
+            self.assertEqual(np.sum(index["NROWS"]), len(data))
+            self.assertEqual(set(index["PIX"]), set(filedict))
+
+            # ADM the other writers split in the same way.
+            skyfn = os.path.join(testdir, "skies.fits")
+            skydirname = io.write_skies(skyfn, data.copy(), hpxsplit=nside)
+            self.assertEqual(skydirname, os.path.join(testdir, "skies-hp"))
+            skies = io.read_targets_in_hp(skydirname, nside, [17])
+            ii = io.is_in_hp(data, nside, [17])
+            self.assertTrue(np.all(np.sort(skies["TARGETID"]) == data["TARGETID"][ii]))
+            self.assertEqual(io.write_skies(skyfn, data.copy()), skyfn)
+        finally:
+            shutil.rmtree(testdir)
+
+    def test_brick_shards(self):
+        """Test writing and gathering a brick-level checkpoint store.
+        """
+        data = np.zeros(5, dtype=[('BRICKNAME', 'S8'), ('RA', '>f8')])
+        data["RA"] = np.arange(5)
+        checkdir = tempfile.mkdtemp()
+        try:
+            # ADM a store of only empty bricks gathers an empty array...
+            for bn, d in ('0001p000', data[:0]), ('0002p000', data):
+                n = io.write_brick_shard(checkdir, bn, d)
+                io.update_brick_manifest(checkdir, bn, n)
+                if n == 0:
+                    out = io.gather_brick_shards(checkdir)
+                    self.assertEqual(len(out), 0)
+                    self.assertEqual(out.dtype, data.dtype)
+            # ADM ...and a full store gathers every row.
+            out = io.gather_brick_shards(checkdir)
+            self.assertTrue(np.all(out == data))
+            nrows = io.gather_brick_shards(checkdir, outfile=self.testfile)
+            self.assertEqual(nrows, len(data))
+            self.assertTrue(np.all(fitsio.read(self.testfile)["RA"] == data["RA"]))
+
+            # ADM the parameters of a run are recorded and checked.
+            io.check_brick_params(checkdir, density=1000, apertures=(0.75, 1.0))
+            io.check_brick_params(checkdir, density=1000, apertures=[0.75, 1.0])
+            with self.assertRaises(ValueError):
+                io.check_brick_params(checkdir, density=2000, apertures=[0.75, 1.0])
+            with self.assertRaises(ValueError):
+                io.check_brick_params(checkdir, density=1000)
+        finally:
+            shutil.rmtree(checkdir)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -9,10 +9,65 @@ from astropy.table import Table
 
 from desitarget.targetmask import desi_mask, bgs_mask, mws_mask, obsmask
 from desitarget.targets import calc_priority, main_cmx_or_sv
-from desitarget.targets import initial_priority_numobs
+from desitarget.targets import initial_priority_numobs, set_obsconditions
+from desitarget.targetmask import obsconditions
 from desitarget.mtl import make_mtl
 
 
+def _loop_initial_priority_numobs(targets, obscon):
+    """Reference loop over bits, as initial_priority_numobs() once was."""
+    colnames, masks, _ = main_cmx_or_sv(targets)
+    outpriority = np.zeros(len(targets), dtype='int')
+    outnumobs = np.zeros(len(targets), dtype='int')-1
+    for colname, mask in zip(colnames, masks):
+        for name in mask.names():
+            if "UNOBS" not in mask[name].priorities:
+                continue
+            if obsconditions.mask(mask[name].obsconditions) & \
+               obsconditions.mask(obscon) == 0:
+                continue
+            ii = (targets[colname] & mask[name]) != 0
+            outpriority[ii] = np.maximum(
+                outpriority[ii], mask[name].priorities['UNOBS'])
+            outnumobs[ii] = np.maximum(outnumobs[ii], mask[name].numobs)
+    return outpriority, outnumobs
+
+
+def _loop_calc_priority(targets, zcat, obscon):
+    """Reference loop over bits and states, as calc_priority() once was."""
+    colnames, masks, survey = main_cmx_or_sv(targets, scnd=True)
+    priority = np.zeros(len(targets), dtype='i8')
+    unobs = zcat["NUMOBS"] == 0
+    done = ~unobs & (zcat["NUMOBS_MORE"] == 0)
+    zgood = ~unobs & (zcat["NUMOBS_MORE"] > 0) & (zcat['ZWARN'] == 0)
+    zwarn = ~unobs & (zcat["NUMOBS_MORE"] > 0) & (zcat['ZWARN'] != 0)
+    good_hiz = zgood & (zcat['Z'] >= 2.15) & (zcat['ZWARN'] == 0)
+    if survey[0:2] == 'sv':
+        good_hiz = zgood
+    for colname, mask in zip(colnames, masks):
+        names = mask.names()
+        if colname == colnames[0]:
+            names = ['ELG', 'LRG', 'QSO']
+        for name in names:
+            pricon = obsconditions.mask(mask[name].obsconditions)
+            if (obsconditions.mask(obscon) & pricon) == 0:
+                continue
+            prio = mask[name].priorities
+            ii = (targets[colname] & mask[name]) != 0
+            states = [(unobs, 'UNOBS'), (done, 'DONE'), (zgood, 'MORE_ZGOOD'),
+                      (zwarn, 'MORE_ZWARN')]
+            if name == 'QSO':
+                states = [(unobs, 'UNOBS'), (done, 'DONE'),
+                          (good_hiz, 'MORE_ZGOOD'), (~good_hiz, 'DONE'),
+                          (zwarn, 'MORE_ZWARN')]
+            for state, key in states:
+                priority[ii & state] = np.maximum(priority[ii & state],
+                                                  prio[key])
+    ii = (targets[colnames[0]] & masks[0].IN_BRIGHT_OBJECT) != 0
+    priority[ii] = -1
+    return priority
+
+
 class TestPriorities(unittest.TestCase):
 
     def setUp(self):
@@ -225,6 +280,46 @@ class TestPriorities(unittest.TestCase):
 
         self.assertLess(lowest_bgs_priority_zgood, lowest_mws_priority)
 
+    def test_priority_lookup(self):
+        """Test the compiled priority lookup tables against loops over bits.
+        """
+        np.random.seed(616)
+        n = 5000
+        cols = ['DESI_TARGET', 'BGS_TARGET', 'MWS_TARGET', 'SCND_TARGET']
+        for prefix in ["", "SV1_"]:
+            t = np.zeros(n, dtype=[(prefix+col, '>i8') for col in cols])
+            colnames, masks, _ = main_cmx_or_sv(t, scnd=True)
+            # ADM set a few random bits from each mask for each target.
+            for col, mask in zip(colnames, masks):
+                bits = np.array([mask[name].mask for name in mask.names()])
+                for i in range(3):
+                    t[col] |= np.random.choice(bits, n) * \
+                        np.random.randint(0, 2, n)
+            z = np.zeros(n, dtype=[('Z', '>f4'), ('ZWARN', '>i8'),
+                                   ('NUMOBS', '>i4'), ('NUMOBS_MORE', '>i4')])
+            z["Z"] = np.random.uniform(0, 4, n)
+            z["ZWARN"] = np.random.randint(0, 2, n)
+            z["NUMOBS"] = np.random.randint(0, 2, n)
+            z["NUMOBS_MORE"] = np.random.randint(0, 2, n) * z["NUMOBS"]
+
+            for obscon in ["DARK|GRAY", "BRIGHT",
+                           "DARK|GRAY|BRIGHT|POOR|TWILIGHT12|TWILIGHT18"]:
+                p, nobs = initial_priority_numobs(t[colnames[:3]], obscon=obscon)
+                ploop, nobsloop = _loop_initial_priority_numobs(
+                    t[colnames[:3]], obscon)
+                self.assertTrue(np.all(p == ploop))
+                self.assertTrue(np.all(nobs == nobsloop))
+                p = calc_priority(t, z, obscon)
+                self.assertTrue(np.all(p == _loop_calc_priority(t, z, obscon)))
+
+            # ADM the OBSCONDITIONS are the OR of those for each bit.
+            obscon = np.zeros(n, dtype='i4')
+            for col, mask in zip(colnames[:3], masks[:3]):
+                for name in mask.names():
+                    ii = (t[col] & mask[name]) != 0
+                    obscon[ii] |= obsconditions.mask(mask[name].obsconditions)
+            self.assertTrue(np.all(set_obsconditions(t[colnames[:3]]) == obscon))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,156 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# -*- coding: utf-8 -*-
+"""Test desitarget.randoms.
+"""
+import unittest
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+from pkg_resources import resource_filename
+import numpy as np
+import healpy as hp
+import fitsio
+
+from desitarget import randoms
+
+
+class TestRANDOMS(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # ADM location of input test survey directory structure.
+        cls.drdir = resource_filename('desitarget.test', 'dr6')
+        cls.brickname = '0959p805'
+
+        # ADM generate randoms in the test brick.
+        bricks = fitsio.read(cls.drdir+'/survey-bricks.fits.gz', upper=True)
+        b = bricks[bricks["BRICKNAME"] == cls.brickname][0]
+        cls.ras, cls.decs = randoms.randoms_in_a_brick_from_edges(
+            b["RA1"], b["RA2"], b["DEC1"], b["DEC2"], density=10000)
+
+    def test_coadd_files_opened_once(self):
+        """Test that each coadd file in a brick is only opened once.
+        """
+        # ADM add a maskbits file (which has three extensions that are
+        # ADM all read) to a copy of the test survey directory.
+        drdir = os.path.join(tempfile.mkdtemp(), "dr6")
+        try:
+            shutil.copytree(self.drdir, drdir)
+            coadddir = os.path.join(drdir, "coadd", self.brickname[:3],
+                                    self.brickname)
+            fn = os.path.join(coadddir, "legacysurvey-{}-nexp-g.fits.fz"
+                              .format(self.brickname))
+            hdr = randoms.fits.getheader(fn, 1)
+            hdus = [randoms.fits.PrimaryHDU()]
+            for dt in "i2", "u1", "u1":
+                img = np.ones((hdr["NAXIS2"], hdr["NAXIS1"]), dtype=dt)
+                hdus.append(randoms.fits.CompImageHDU(img, header=hdr))
+            randoms.fits.HDUList(hdus).writeto(os.path.join(
+                coadddir, "legacysurvey-{}-maskbits.fits.fz".format(self.brickname)))
+
+            with patch.object(randoms.fits, "open",
+                              side_effect=randoms.fits.open) as fitsopen:
+                q = randoms.quantities_at_positions_in_a_brick(
+                    self.ras, self.decs, self.brickname, drdir)
+            fns = [c[0][0] for c in fitsopen.call_args_list]
+            self.assertEqual(len(fns), len(set(fns)))
+            self.assertTrue(np.all(q["maskbits"] == 1))
+            self.assertTrue(np.all(q["wisemask_w2"] == 1))
+        finally:
+            shutil.rmtree(os.path.dirname(drdir))
+
+    def test_grouped_medians(self):
+        """Test the grouped medians against a loop over np.median.
+        """
+        np.random.seed(616)
+        groups = np.random.randint(0, 50, 5000)
+        values = np.random.lognormal(size=(5000, 3)).astype('f4')
+        ugroups, medians = randoms.grouped_medians(groups, values)
+        self.assertTrue(np.all(ugroups == np.unique(groups)))
+        for ug, med in zip(ugroups, medians):
+            for col, m in zip(values[groups == ug].T, med):
+                self.assertEqual(np.median(col), m)
+
+        # ADM the streaming version should be close to the exact version.
+        chunks = [(groups[i:i+1000], values[i:i+1000])
+                  for i in range(0, len(groups), 1000)]
+        approx = randoms.approx_grouped_medians(chunks, 50, nbins=64)
+        self.assertTrue(np.allclose(approx, medians, rtol=0.1))
+
+        # ADM including when the rows are ordered by group and the
+        # ADM groups have very different values (to within about half
+        # ADM of the width of a bin, which is ~1 for a range of ~60).
+        srt = np.argsort(groups, kind='stable')
+        groups, values = groups[srt], values[srt] + groups[srt, None]
+        ugroups, medians = randoms.grouped_medians(groups, values)
+        chunks = [(groups[i:i+1000], values[i:i+1000])
+                  for i in range(0, len(groups), 1000)]
+        approx = randoms.approx_grouped_medians(chunks, 50, nbins=64)
+        self.assertTrue(np.allclose(approx, medians, rtol=0, atol=0.5))
+
+        # ADM two passes are made, so an iterator can't be passed.
+        with self.assertRaises(ValueError):
+            randoms.approx_grouped_medians(iter(chunks), 50)
+
+    def test_pixmap(self):
+        """Test pixmap with file names for the randoms and the targets.
+        """
+        targfile = resource_filename('desitarget.test', 't/targets.fits')
+        targs = fitsio.read(targfile, columns=["RA", "DEC"])
+        # ADM randoms near the targets, with systematics that are
+        # ADM constant in each pixel.
+        nside = 64
+        np.random.seed(616)
+        dt = [('RA', '>f8'), ('DEC', '>f8'), ('NOBS_G', '>i2'), ('NOBS_R', '>i2'),
+              ('NOBS_Z', '>i2'), ('MASKBITS', '>i2')]
+        cols = ['EBV', 'PSFDEPTH_W1', 'PSFDEPTH_W2', 'PSFDEPTH_G', 'GALDEPTH_G',
+                'PSFSIZE_G', 'PSFDEPTH_R', 'GALDEPTH_R', 'PSFSIZE_R',
+                'PSFDEPTH_Z', 'GALDEPTH_Z', 'PSFSIZE_Z']
+        rands = np.zeros(20000, dtype=dt + [(col, '>f4') for col in cols])
+        ii = np.random.randint(0, len(targs), len(rands))
+        rands["RA"] = targs["RA"][ii] + np.random.normal(0, 0.01, len(rands))
+        rands["DEC"] = targs["DEC"][ii] + np.random.normal(0, 0.01, len(rands))
+        for band in "G", "R", "Z":
+            rands["NOBS_{}".format(band)] = 1
+        pixnums = hp.ang2pix(nside, np.radians(90-rands["DEC"]),
+                             np.radians(rands["RA"]), nest=True)
+        for col in cols:
+            rands[col] = pixnums
+        testdir = tempfile.mkdtemp()
+        randfile = os.path.join(testdir, "randoms.fits")
+        fitsio.write(randfile, rands)
+        gaialoc = os.path.join(testdir, "stardens.fits")
+        fitsio.write(gaialoc, np.zeros(hp.nside2npix(nside), dtype=[('STARDENS', '>f4')]))
+
+        # ADM the target densities rely on desimodel data, so aren't
+        # ADM tested, here.
+        targdens = np.zeros(hp.nside2npix(nside), dtype=[('ALL', 'f4')])
+        try:
+            with patch.object(randoms, "get_targ_dens", return_value=targdens):
+                # ADM the values are constant in each pixel, so even
+                # ADM the approximate (chunked) medians are exact.
+                for chunksize in None, 3000:
+                    hpxinfo, survey = randoms.pixmap(
+                        randfile, targfile, 10000, nside=nside,
+                        gaialoc=gaialoc, chunksize=chunksize)
+                    self.assertEqual(survey, "main")
+                    for col in cols:
+                        ii = hpxinfo[col] != -1
+                        self.assertEqual(set(np.where(ii)[0]), set(pixnums))
+                        self.assertTrue(np.allclose(hpxinfo[col][ii],
+                                                    hpxinfo["HPXPIXEL"][ii]))
+        finally:
+            shutil.rmtree(testdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+def test_suite():
+    """Allows testing of only this module with the command:
+
+        python setup.py test -m desitarget.test.test_randoms
+    """
+    return unittest.defaultTestLoader.loadTestsFromName(__name__)
@@ -0,0 +1,129 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# -*- coding: utf-8 -*-
+"""Test desitarget.secondary.
+"""
+import unittest
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+import numpy as np
+import fitsio
+
+from desitarget import secondary
+from desitarget.geomask import radec_match_to
+from desitarget.targetmask import scnd_mask
+
+
+class TestSECONDARY(unittest.TestCase):
+
+    def setUp(self):
+        self.testdir = tempfile.mkdtemp()
+
+        # ADM a set of secondary targets from two programs (bits).
+        dt = secondary.outdatamodel.dtype.descr + \
+            secondary.suppdatamodel.dtype.descr
+        self.scxtargs = np.zeros(10, dtype=dt)
+        self.scxtargs["SCND_TARGET"] = [1]*5 + [4]*5
+        self.scxtargs["SCND_ORDER"] = list(range(5))*2
+        self.scxtargs["TARGETID"] = -1
+
+    def tearDown(self):
+        if os.path.exists(self.testdir):
+            shutil.rmtree(self.testdir)
+
+    def test_add_primary_info(self):
+        """Test that secondaries acquire the highest-priority primary TARGETID.
+        """
+        # ADM secondaries 1, 3 (bit 1) and 0, 2 (bit 4) match primaries.
+        prim = self.scxtargs[[1, 3, 5, 7]].copy()
+        prim["TARGETID"] = [11, 13, 15, 17]
+        prim["PRIORITY_INIT"] = [100, 100, 100, 100]
+        # ADM split across files, with one primary (TARGETID 13) matching
+        # ADM two secondaries, the second of which has a higher priority.
+        dup = self.scxtargs[[8]].copy()
+        dup["TARGETID"] = 13
+        dup["PRIORITY_INIT"] = 200
+        fitsio.write(os.path.join(self.testdir, "prim1.fits"), prim[:2])
+        fitsio.write(os.path.join(self.testdir, "prim2.fits"), prim[2:])
+        fitsio.write(os.path.join(self.testdir, "prim3.fits"), dup)
+
+        scx = secondary.add_primary_info(self.scxtargs.copy(), self.testdir)
+        self.assertEqual(list(scx["TARGETID"]),
+                         [-1, 11, -1, -1, -1, 15, -1, 17, 13, -1])
+
+    def test_match_in_shards(self):
+        """Test that matching in HEALPixel shards is the same as in one go.
+        """
+        np.random.seed(616)
+        prim = np.zeros(2000, dtype=[('RA', '>f8'), ('DEC', '>f8')])
+        prim["RA"] = np.random.uniform(10, 20, 2000)
+        prim["DEC"] = np.random.uniform(-5, 5, 2000)
+        # ADM secondaries near primaries, some near the same primary.
+        scx = prim[np.random.randint(0, 1000, 500)].copy()
+        scx["DEC"] += np.random.normal(0, 2e-4, 500)
+        m1 = radec_match_to(prim, scx, sep=1.)
+        m2 = secondary._match_in_shards(prim, scx, sep=1., numproc=2)
+        self.assertTrue(len(m1[0]) > 0)
+        for a, b in zip(m1, m2):
+            self.assertTrue(np.all(a == b))
+
+    def test_read_files_cache(self):
+        """Test that the cache of secondary files is used and refreshed.
+        """
+        for subdir in "indata", "docs", "outdata":
+            os.makedirs(os.path.join(self.testdir, subdir))
+        fns = [os.path.join(self.testdir, "indata", scnd_mask[name].filename)
+               for name in scnd_mask.names()]
+        for i, fn in enumerate(fns):
+            np.savetxt(fn+".txt", [[i, 1, 2, 3, 0, 1], [i, 4, 5, 6, 2000, 0]],
+                       fmt="%d")
+
+        # ADM by default, there's no cache.
+        scx = secondary.read_files(self.testdir, scnd_mask)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.testdir, "outdata", "cache")))
+        # ADM the first call builds the cache, the second reads it.
+        for i in range(2):
+            scxc = secondary.read_files(self.testdir, scnd_mask, cache=True)
+            self.assertEqual(scxc.dtype, scx.dtype)
+            self.assertTrue(np.all(scxc == scx))
+        self.assertEqual(len(os.listdir(
+            os.path.join(self.testdir, "outdata", "cache"))), len(fns))
+
+        # ADM a changed input file is parsed again.
+        np.savetxt(fns[0]+".txt", [[7, 8, 9, 10, 0, 1]], fmt="%d")
+        scxc = secondary.read_files(self.testdir, scnd_mask, cache=True)
+        self.assertEqual(len(scxc), len(scx) - 1)
+        self.assertEqual(scxc["RA"][0], 7)
+
+        # ADM as is every file for a different version of desitarget.
+        with patch.object(secondary, "desitarget_version", "0.0.0"):
+            with patch.object(secondary, "_read_scx_file",
+                              side_effect=secondary._read_scx_file) as parse:
+                secondary.read_files(self.testdir, scnd_mask, cache=True)
+        self.assertEqual(parse.call_count, len(fns))
+
+        # ADM match_secondary reads through the cache if asked.
+        shutil.rmtree(os.path.join(self.testdir, "outdata", "cache"))
+        prim = np.zeros(2, dtype=[('RA', '>f8'), ('DEC', '>f8'),
+                                  ('TARGETID', '>i8'), ('DESI_TARGET', '>i8'),
+                                  ('PRIORITY_INIT_DARK', '>i8'),
+                                  ('PRIORITY_INIT_BRIGHT', '>i8')])
+        prim["RA"], prim["DEC"] = [1, 4], [2, 5]
+        scndout = os.path.join(self.testdir, "outdata", "priminfo.fits")
+        secondary.match_secondary(prim, self.testdir, scndout, cache=True)
+        self.assertEqual(len(os.listdir(
+            os.path.join(self.testdir, "outdata", "cache"))), len(fns))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+def test_suite():
+    """Allows testing of only this module with the command:
+
+        python setup.py test -m desitarget.test.test_secondary
+    """
+    return unittest.defaultTestLoader.loadTestsFromName(__name__)
@@ -0,0 +1,100 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# -*- coding: utf-8 -*-
+"""Test desitarget.internal.sharedmem.
+"""
+import unittest
+from time import sleep
+import numpy as np
+
+from desitarget.internal import sharedmem
+
+
+class TestSHAREDMEM(unittest.TestCase):
+
+    def setUp(self):
+        self.items = np.arange(40)
+        # ADM a few expensive items at the end of the sequence.
+        self.costs = np.ones(len(self.items))
+        self.costs[-4:] = 20.
+
+    def _work(self, i):
+        """sleep for a time proportional to the item's cost"""
+        sleep(0.005*self.costs[i])
+        return i**2
+
+    def test_map_order(self):
+        """Test that results are in sequence order however they're scheduled.
+        """
+        expected = list(self.items**2)
+        for costs, chunksize in [(None, 1), (None, 7),
+                                 (self.costs, 1), (self.costs, 7)]:
+            pool = sharedmem.MapReduce(np=4)
+            with pool:
+                res = pool.map(self._work, self.items,
+                               costs=costs, chunksize=chunksize)
+            self.assertEqual(res, expected)
+
+    def test_schedule(self):
+        """Test that expensive items are dispatched first, cheap ones batched.
+        """
+        pool = sharedmem.MapReduce(np=4)
+        batches = pool._schedule(len(self.items), self.costs, 5)
+        # ADM every item is scheduled exactly once.
+        self.assertEqual(sorted(np.concatenate(batches)), list(self.items))
+        # ADM the expensive items come first, each on their own...
+        self.assertEqual(batches[:4], [[36], [37], [38], [39]])
+        # ADM ...and the cheap items are batched.
+        self.assertTrue(all([len(b) == 5 for b in batches[4:-1]]))
+
+    def test_stats(self):
+        """Test the per-worker statistics.
+        """
+        pool = sharedmem.MapReduce(np=4)
+        with pool:
+            pool.map(self._work, self.items, costs=self.costs)
+        stats = pool.stats
+        self.assertEqual(np.sum(stats["nitems"]), len(self.items))
+        self.assertEqual(len(stats["busy"]), 4)
+        self.assertTrue(np.all(stats["utilization"] <= 1.))
+        self.assertTrue(np.all(stats["utilization"] > 0.))
+
+    def _fail(self, i):
+        """fail for odd items, run too long for item 6"""
+        if i % 2 == 1:
+            raise ValueError("bad item {}".format(i))
+        if i == 6:
+            sleep(10)
+        return i
+
+    def test_failures(self):
+        """Test retries, time limits and skipping failed items.
+        """
+        for np_ in 0, 4:
+            pool = sharedmem.MapReduce(np=np_)
+            with pool:
+                res = pool.map(self._fail, self.items[:10],
+                               timeout=1, retries=1, skip=True)
+            self.assertEqual(res, [0, None, 2, None, 4, None, None, None, 8, None])
+            self.assertEqual([f["index"] for f in pool.failures],
+                             [1, 3, 5, 6, 7, 9])
+            self.assertTrue(all([f["attempts"] == 2 for f in pool.failures]))
+            self.assertTrue("SlaveTimeout" in pool.failures[3]["error"])
+            self.assertTrue("ValueError" in pool.failures[0]["error"])
+
+        # ADM without skip, a failure still aborts the map.
+        pool = sharedmem.MapReduce(np=4)
+        with pool:
+            with self.assertRaises(sharedmem.SlaveException):
+                pool.map(self._fail, self.items[:10])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+def test_suite():
+    """Allows testing of only this module with the command:
+
+        python setup.py test -m desitarget.test.test_sharedmem
+    """
+    return unittest.defaultTestLoader.loadTestsFromName(__name__)
@@ -3,8 +3,12 @@
 """Test desitarget.skyfibers.
 """
 import unittest
+import os
+import shutil
+import tempfile
 from pkg_resources import resource_filename
 import numpy as np
+import fitsio
 
 from desitarget import skyfibers
 from desitarget.targetmask import desi_mask
@@ -162,6 +166,58 @@ class TestSKYFIBERS(unittest.TestCase):
             np.all(gskies[wbad]["DESI_TARGET"] == desi_mask.BAD_SKY)
         )
 
+    def test_sky_fiber_locations(self):
+        """
+        Test the distance transform gives the same skies as erosion
+        """
+        # ADM a map of good sky pixels peppered with small bad "blobs".
+        np.random.seed(616)
+        skypix = np.random.random((360, 300)) > 0.001
+        skypix[100:140, 50:75] = False
+        xd, yd, bd = skyfibers.sky_fiber_locations(skypix, gridsize=60)
+        xe, ye, be = skyfibers.sky_fiber_locations(skypix, gridsize=60,
+                                                   method='erosion')
+        self.assertEqual(len(xd), 30)
+        self.assertTrue(np.all(xd == xe))
+        self.assertTrue(np.all(yd == ye))
+        self.assertTrue(np.all(bd == be))
+
+    def test_aperture_photometry(self):
+        """
+        Test the aperture photometry kernel against photutils
+        """
+        try:
+            from photutils.aperture import CircularAperture
+            from photutils.aperture import aperture_photometry
+        except ImportError:
+            self.skipTest("photutils is not installed")
+
+        fn = self.survey.find_file('image', brick=self.brickname, band='g')
+        img = fitsio.read(fn)
+        ivar = fitsio.read(fn.replace('image', 'invvar'))
+        with np.errstate(divide='ignore'):
+            imsigma = np.where(ivar > 0, 1./np.sqrt(ivar), 0.)
+
+        # ADM test integer (sky-like) and fractional positions, including
+        # ADM some that overlap the edges of the image.
+        np.random.seed(616)
+        xint = np.random.randint(0, img.shape[1], 50).astype('f8')
+        yint = np.random.randint(0, img.shape[0], 50).astype('f8')
+        xfrac = np.random.uniform(-2, img.shape[1]+1, 200)
+        yfrac = np.random.uniform(-2, img.shape[0]+1, 200)
+        x, y = np.concatenate([xint, xfrac]), np.concatenate([yint, yfrac])
+        radii = [0.75, 1.9, 7.6]
+
+        flux, err = skyfibers.aperture_photometry(img, x, y, radii, ivar=ivar)
+        self.assertEqual(flux.shape, (len(x), len(radii)))
+        for irad, rad in enumerate(radii):
+            aper = CircularAperture(np.vstack([x, y]).T, rad)
+            p = aperture_photometry(img, aper, error=imsigma)
+            self.assertTrue(np.allclose(flux[:, irad], p['aperture_sum'],
+                                        rtol=1e-6, atol=1e-6, equal_nan=True))
+            self.assertTrue(np.allclose(err[:, irad], p['aperture_sum_err'],
+                                        rtol=1e-5, atol=1e-6, equal_nan=True))
+
     def test_select_skies(self):
         """
         Test the wrapper function for batch selection of skies
@@ -179,6 +235,40 @@ class TestSKYFIBERS(unittest.TestCase):
         # ADM check the wrapper generates a single brick correctly.
         self.assertTrue(np.all(ss == skies))
 
+    def test_select_skies_checkpoint(self):
+        """
+        Test that checkpointed (and resumed) skies match regular skies
+        """
+        ss = skyfibers.select_skies(self.survey, numproc=1,
+                                    nskiespersqdeg=self.nskiespersqdeg,
+                                    apertures_arcsec=self.ap_arcsec)
+        checkdir = tempfile.mkdtemp()
+        try:
+            cs = skyfibers.select_skies(self.survey, numproc=1,
+                                        nskiespersqdeg=self.nskiespersqdeg,
+                                        apertures_arcsec=self.ap_arcsec,
+                                        checkdir=checkdir)
+            self.assertTrue(np.all(cs == ss))
+            # ADM the brick should now be recorded as complete...
+            done = skyfibers.read_brick_manifest(checkdir)
+            self.assertEqual(done, {self.brickname: len(ss)})
+            # ADM ...so, resuming, it's read from the store, not remade.
+            rs = skyfibers.select_skies(self.survey, numproc=1,
+                                        nskiespersqdeg=self.nskiespersqdeg,
+                                        apertures_arcsec=self.ap_arcsec,
+                                        checkdir=checkdir)
+            self.assertTrue(np.all(rs == ss))
+            self.assertEqual(len(open(os.path.join(
+                checkdir, 'manifest.txt')).readlines()), 1)
+            # ADM a store can't be resumed with different parameters.
+            with self.assertRaises(ValueError):
+                skyfibers.select_skies(self.survey, numproc=1,
+                                       nskiespersqdeg=self.nskiespersqdeg,
+                                       apertures_arcsec=[1.0],
+                                       checkdir=checkdir)
+        finally:
+            shutil.rmtree(checkdir)
+
 
 if __name__ == '__main__':
     unittest.main()
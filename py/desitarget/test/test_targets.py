@@ -0,0 +1,159 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# -*- coding: utf-8 -*-
+"""Test desitarget.targets.finalize and desitarget.targetmask.
+"""
+import unittest
+import os
+import pickle
+import shutil
+import tempfile
+from pkg_resources import resource_filename
+import numpy as np
+import numpy.lib.recfunctions as rfn
+
+from desitarget import io
+from desitarget.targets import finalize, is_unique, encode_targetid
+from desitarget.targets import subpriority_from_targetid
+from desitarget.targetmask import desi_mask, bgs_mask
+from desitarget import targetmask
+from desitarget.sv1 import sv1_targetmask
+
+
+class TestTargets(unittest.TestCase):
+
+    def setUp(self):
+        sweepfile = resource_filename('desitarget.test',
+                                      't/sweep-320m005-330p000.fits')
+        self.objects = io.read_tractor(sweepfile)
+        n = len(self.objects)
+        self.desi_target = np.zeros(n, dtype='i8') | desi_mask.LRG
+        self.desi_target[::2] |= desi_mask.BGS_ANY
+        self.bgs_target = np.zeros(n, dtype='i8')
+        self.bgs_target[::2] = bgs_mask.BGS_BRIGHT
+        self.mws_target = np.zeros(n, dtype='i8')
+
+    def test_is_unique(self):
+        """Test the sort-based check for unique values.
+        """
+        self.assertTrue(is_unique(np.arange(10)[::-1]))
+        self.assertTrue(is_unique(np.array([], dtype='i8')))
+        self.assertFalse(is_unique(np.array([3, 1, 2, 1])))
+
+    def test_finalize(self):
+        """Test the columns and values of finalized targets.
+        """
+        done = finalize(self.objects, self.desi_target, self.bgs_target,
+                        self.mws_target, darkbright=True)
+        # ADM the output starts with the renamed input columns...
+        renamed = rfn.rename_fields(
+            self.objects, {'OBJID': 'BRICK_OBJID', 'TYPE': 'MORPHTYPE'})
+        self.assertEqual(done.dtype.names[:len(renamed.dtype.names)],
+                         renamed.dtype.names)
+        for col in renamed.dtype.names:
+            self.assertTrue(np.all((done[col] == renamed[col]) |
+                                   (done[col] != done[col])))
+        # ADM ...followed by the new columns.
+        self.assertTrue(np.all(done["DESI_TARGET"] == self.desi_target))
+        self.assertTrue(np.all(done["BGS_TARGET"] == self.bgs_target))
+        self.assertTrue(np.all(done["SUBPRIORITY"] == 0))
+        targetid = encode_targetid(objid=self.objects["OBJID"],
+                                   brickid=self.objects["BRICKID"],
+                                   release=self.objects["RELEASE"])
+        self.assertTrue(np.all(done["TARGETID"] == targetid))
+        for col in "PRIORITY_INIT_DARK", "NUMOBS_INIT_DARK", "OBSCONDITIONS":
+            self.assertTrue(np.all(done[col] > 0))
+
+        # ADM a non-contiguous input gives the same result.
+        half = finalize(self.objects[::2], self.desi_target[::2],
+                        self.bgs_target[::2], self.mws_target[::2],
+                        darkbright=True)
+        self.assertEqual(half.dtype, done.dtype)
+        self.assertTrue(np.all(half["TARGETID"] == done["TARGETID"][::2]))
+
+        # ADM duplicated TARGETIDs raise an error.
+        objects = self.objects.copy()
+        objects["OBJID"] = 0
+        with self.assertRaises(AssertionError):
+            finalize(objects, self.desi_target, self.bgs_target,
+                     self.mws_target)
+
+    def test_subpriority(self):
+        """Test SUBPRIORITY values only depend on TARGETID and the seed.
+        """
+        targetid = encode_targetid(objid=self.objects["OBJID"],
+                                   brickid=self.objects["BRICKID"],
+                                   release=self.objects["RELEASE"])
+        subp = subpriority_from_targetid(targetid)
+        self.assertTrue(np.all((subp >= 0) & (subp < 1)))
+        self.assertTrue(is_unique(subp))
+        # ADM the same values for any order or any shard...
+        ii = np.random.permutation(len(targetid))
+        self.assertTrue(np.all(subpriority_from_targetid(targetid[ii]) == subp[ii]))
+        self.assertEqual(subpriority_from_targetid(targetid[3])[0], subp[3])
+        # ADM ...but different values for a different seed.
+        self.assertFalse(np.any(subpriority_from_targetid(targetid, seed=626) == subp))
+        # ADM values for consecutive TARGETIDs look uniformly distributed.
+        subp = subpriority_from_targetid(np.arange(100000))
+        hist, _ = np.histogram(subp, bins=10, range=(0, 1))
+        self.assertTrue(np.all(np.abs(hist - 10000) < 500))
+
+        # ADM the values written to file match.
+        targs = finalize(self.objects, self.desi_target, self.bgs_target,
+                         self.mws_target)
+        testdir = tempfile.mkdtemp()
+        try:
+            fn = os.path.join(testdir, "targets.fits")
+            io.write_targets(fn, targs[::-1], qso_selection="colorcuts")
+            written = io.read_target_files(fn)
+            self.assertTrue(np.all(written["SUBPRIORITY"] ==
+                                   subpriority_from_targetid(written["TARGETID"])))
+        finally:
+            shutil.rmtree(testdir)
+
+    def test_mask_cache(self):
+        """Test the cache of processed bit definitions.
+        """
+        cachedir = tempfile.mkdtemp()
+        cachedir_orig = os.environ.get("XDG_CACHE_HOME")
+        os.environ["XDG_CACHE_HOME"] = cachedir
+        try:
+            for prefix in "", "sv1", "cmx":
+                bitdefs = targetmask.load_mask_bits(prefix, cache=False)
+                for i in range(2):
+                    self.assertEqual(targetmask.load_mask_bits(prefix), bitdefs)
+            self.assertEqual(len(os.listdir(os.path.join(cachedir, "desitarget"))), 3)
+
+            # ADM an out-of-date cache is rebuilt.
+            fn = os.path.join(os.path.dirname(os.path.abspath(
+                targetmask.__file__)), "data", "targetmask.yaml")
+            cachefn = targetmask._mask_cache_file(fn)
+            with open(cachefn, "wb") as f:
+                pickle.dump(([], {}), f)
+            self.assertEqual(targetmask.load_mask_bits(),
+                             targetmask.load_mask_bits(cache=False))
+            with open(cachefn, "rb") as f:
+                self.assertEqual(pickle.load(f)[0], targetmask._mask_cache_key(fn))
+        finally:
+            if cachedir_orig is None:
+                del os.environ["XDG_CACHE_HOME"]
+            else:
+                os.environ["XDG_CACHE_HOME"] = cachedir_orig
+            shutil.rmtree(cachedir)
+
+        # ADM the masks are built once, when first accessed.
+        self.assertIs(sv1_targetmask.desi_mask, sv1_targetmask.desi_mask)
+        self.assertEqual(sv1_targetmask.desi_mask.QSO, 2**2)
+        with self.assertRaises(AttributeError):
+            sv1_targetmask.blat
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+def test_suite():
+    """Allows testing of only this module with the command:
+
+        python setup.py test -m desitarget.test.test_targets
+    """
+    return unittest.defaultTestLoader.loadTestsFromName(__name__)
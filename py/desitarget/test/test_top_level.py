@@ -6,8 +6,11 @@ from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 # The line above will help with 2to3 support.
 import unittest
+import os
 import re
 import sys
+import subprocess
+import desitarget
 from .. import __version__ as theVersion
 
 
@@ -38,6 +41,41 @@ class TestTopLevel(unittest.TestCase):
         else:
             self.assertRegexpMatches(theVersion, self.versionre)
 
+    def test_lazy_imports(self):
+        """Ensure importing the modules used by scripts does no slow set-up.
+        """
+        # ADM check the desitarget imports in a fresh process, which
+        # ADM needs to find this desitarget rather than an installed one.
+        code = "\n".join([
+            "import sys",
+            "import healpy",
+            "mpl = 'matplotlib' in sys.modules",
+            "import desitarget.cuts, desitarget.skyfibers",
+            "import desitarget.secondary, desitarget.brightmask",
+            "import desitarget.randoms, desitarget.mtl",
+            "import desitarget.sv1.sv1_cuts, desitarget.cmx.cmx_cuts",
+            "lazy = ['desimodel' in sys.modules,",
+            "        'matplotlib' in sys.modules and not mpl]",
+            "import desitarget.gfa",
+            "from desitarget.geomask import get_bricks",
+            "print(*lazy, 'requests' in sys.modules,",
+            "      get_bricks.cache_info().currsize)"])
+        pypath = os.path.dirname(os.path.dirname(os.path.abspath(desitarget.__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+            [pypath] + [os.environ.get("PYTHONPATH", "")]))
+        out = subprocess.check_output([sys.executable, "-c", code], env=env,
+                                      stderr=subprocess.DEVNULL)
+        desimodel, mpl, requests, nbricks = out.decode().split()[-4:]
+        # ADM desimodel (which checks for its data on import) and
+        # ADM matplotlib (unless healpy needs it) are only loaded by the
+        # ADM functions that use them, and modules that are only needed
+        # ADM for downloading and bricks look-up tables aren't loaded or
+        # ADM built on import.
+        self.assertEqual(desimodel, "False")
+        self.assertEqual(mpl, "False")
+        self.assertEqual(requests, "False")
+        self.assertEqual(nbricks, "0")
+
 
 if __name__ == '__main__':
     unittest.main()
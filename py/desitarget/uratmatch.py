@@ -12,7 +12,6 @@ Useful `URAT`_ matching and manipulation routines.
 import os
 import numpy as np
 import fitsio
-import requests
 import pickle
 
 from pkg_resources import resource_filename
@@ -22,8 +21,7 @@ from glob import glob
 import healpy as hp
 
 from desitarget.internal import sharedmem
-from desimodel.footprint import radec2pix
-from desitarget.geomask import add_hp_neighbors, radec_match_to
+from desitarget.geomask import add_hp_neighbors, radec_to_xyz, read_hpx_tree
 
 # ADM set up the DESI default logger
 from desiutil.log import get_logger
@@ -110,6 +108,9 @@ def scrape_urat(url="http://cdsarc.u-strasbg.fr/ftp/I/329/URAT1/v12/",
         log.info('Making URAT directory for storing binary files')
         os.makedirs(bindir)
 
+    # ADM pull back the index.html from the url (requests is imported
+    # ADM here as it's only needed for downloads and is slow to import).
+    import requests
     index = requests.get(url)
 
     # ADM retrieve any file name that starts with z.
@@ -216,6 +217,7 @@ def urat_csv_to_fits(numproc=5):
         - if numproc==1, use the serial code instead of the parallel code.
         - Runs in about 10 minutes with numproc=25 for 575 files.
     """
+    from desimodel.footprint import radec2pix
     # ADM the resolution at which the URAT HEALPix files should be stored.
     nside = _get_urat_nside()
 
@@ -344,6 +346,7 @@ def urat_fits_to_healpix(numproc=5):
         - if numproc==1, use the serial code instead of the parallel code.
         - Runs in about 10 minutes with numproc=25.
     """
+    from desimodel.footprint import radec2pix
     # ADM the resolution at which the URAT HEALPix files should be stored.
     nside = _get_urat_nside()
 
@@ -586,6 +589,9 @@ def match_to_urat(objs, matchrad=1., radec=False):
         - Retrieves the CLOSEST match to URAT for each passed object.
         - Because this reads in HEALPixel split files, it's (far) faster
           for objects that are clumped rather than widely distributed.
+        - URAT files are read, and KD-trees built, through the per-process
+          cache in :func:`~desitarget.geomask.read_hpx_tree`, so repeat
+          calls for nearby objects reuse the files.
     """
     # ADM parse whether a structure or coordinate list was passed.
     if radec:
@@ -605,6 +611,10 @@ def match_to_urat(objs, matchrad=1., radec=False):
     uratfiles = find_urat_files([ra, dec], radec=True)
     nfiles = len(uratfiles)
 
+    # ADM the chord length equivalent to the matching radius.
+    chord = 2*np.sin(np.radians(matchrad/3600.)/2.)
+    xyz = radec_to_xyz(ra, dec)
+
     # ADM catch the case of no matches to URAT.
     if nfiles > 0:
         # ADM loop through the URAT files and find matches.
@@ -612,10 +622,16 @@ def match_to_urat(objs, matchrad=1., radec=False):
             if ifn % 500 == 0 and ifn > 0:
                 log.info('{}/{} files; {:.1f} total mins elapsed'
                          .format(ifn, nfiles, (time()-start)/60.))
-            urat = fitsio.read(fn)
-            idurat, idobjs, dist = radec_match_to(
-                [urat["RA"], urat["DEC"]], [ra, dec],
-                sep=matchrad, radec=True, return_sep=True)
+            urat, tree = read_hpx_tree(fn)
+            if len(urat) == 0:
+                continue
+            # ADM the closest URAT object in this file to each object.
+            chords, idurat = tree.query(xyz, distance_upper_bound=chord)
+            idobjs = np.where(np.isfinite(chords))[0]
+            idurat = idurat[idobjs]
+            dist = 3600*np.degrees(2*np.arcsin(chords[idobjs]/2.))
+            keep = dist < matchrad
+            idurat, idobjs, dist = idurat[keep], idobjs[keep], dist[keep]
 
             # ADM update matches whenever we have a CLOSER match.
             ii = (urat_sep[idobjs] == -1) | (urat_sep[idobjs] > dist)